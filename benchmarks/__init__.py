@@ -0,0 +1,17 @@
+"""
+*benchmarks of cometspy on models, layouts and logs of increasing size.*
+
+The time cometspy takes to convert models, write and read layouts and parse
+COMETS' logs grows with the number of reactions, species, grid locations and
+cycles. These benchmarks time each of those paths on synthetic fixtures from
+small to very large, so that slowdowns are found by comparing results
+between versions instead of by users.
+
+No COMETS installation is needed: simulations are run with the fake backend
+(see cometspy.comets.set_backend).
+
+>>> python -m benchmarks --scale small --output bench-0.6.2.json
+>>> python -m benchmarks --scale small --compare bench-0.6.2.json
+
+"""
+from benchmarks.suite import run_benchmarks, compare, SCALES
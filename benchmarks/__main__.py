@@ -0,0 +1,35 @@
+import argparse
+
+from benchmarks.suite import run_benchmarks, compare, SCALES, GROUPS
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog = 'python -m benchmarks',
+        description = 'times cometspy on models, layouts and logs of '
+                      'increasing size')
+    parser.add_argument('--scale', default = 'small', choices = list(SCALES.keys()))
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--groups', nargs = '+', choices = list(GROUPS.keys()))
+    parser.add_argument('--output', help = 'json file to save the results in')
+    parser.add_argument('--directory', help = 'where to write fixtures')
+    parser.add_argument('--compare', metavar = 'BASELINE',
+                        help = 'json file of earlier results to compare with')
+    parser.add_argument('--threshold', type = float, default = 1.2,
+                        help = 'slowdown ratio counted as a regression')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scale, args.repeat, args.groups, args.output,
+                            args.directory)
+    for result in report['results']:
+        print('{:32s} {:60s} {:10.4f} s'.format(
+            result['name'], str(result['case']), result['seconds']['min']))
+    if args.compare is not None:
+        table = compare(args.compare, report, args.threshold)
+        print(table.to_string())
+        if table['regression'].any():
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
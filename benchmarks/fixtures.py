@@ -0,0 +1,270 @@
+'''
+The fixtures module makes models, layouts and logs of a chosen size.
+
+The models are random, but reproducible for a given seed, networks of the
+requested number of reactions, with exchange reactions in the form cometspy
+expects. The logs are written in COMETS' formats directly with pandas, so
+logs of gigabytes can be made in seconds without running a simulation.
+'''
+
+import copy
+import os
+import numpy as np
+import pandas as pd
+import cobra
+
+import cometspy as c
+
+# the fraction of the reactions of random models which are exchanges
+_EXCHANGE_FRACTION = 0.05
+
+
+def cobra_model(n_reactions : int, seed : int = 0,
+                model_id : str = 'bench') -> cobra.Model:
+    """
+    returns a random cobra model with n_reactions reactions
+
+    About 5% of the reactions (at least 2) are exchange reactions of
+    extracellular metabolites named "met<i>_e". The others each convert two
+    to four metabolites into each other; the last is a biomass reaction and
+    the objective.
+
+    Parameters
+    ----------
+
+    n_reactions : int
+        the number of reactions, at least 3
+    seed : int, optional
+        seed of the random number generator. The default is 0.
+    model_id : str, optional
+        the model's id. The default is "bench".
+
+    Returns
+    -------
+
+    cobra.Model
+
+    """
+    rng = np.random.default_rng(seed)
+    n_exchange = max(2, int(n_reactions * _EXCHANGE_FRACTION))
+    n_internal = max(1, int(n_reactions * 0.75))
+    extracellular = [cobra.Metabolite('met' + str(i) + '_e', compartment = 'e')
+                     for i in range(n_exchange)]
+    internal = [cobra.Metabolite('met' + str(i) + '_c', compartment = 'c')
+                for i in range(n_internal)]
+    metabolites = extracellular + internal
+
+    reactions = []
+    for i, met in enumerate(extracellular):
+        rxn = cobra.Reaction('EX_' + met.id, lower_bound = -10.,
+                             upper_bound = 1000.)
+        rxn.add_metabolites({met: -1.})
+        reactions.append(rxn)
+    for i in range(n_reactions - n_exchange - 1):
+        rxn = cobra.Reaction('R' + str(i), lower_bound = -1000.,
+                             upper_bound = 1000.)
+        chosen = rng.choice(len(metabolites), size = rng.integers(2, 5),
+                            replace = False)
+        coefficients = rng.integers(1, 3, size = len(chosen)).astype(float)
+        coefficients[:len(chosen) // 2] *= -1
+        rxn.add_metabolites({metabolites[j]: coef for j, coef in
+                             zip(chosen, coefficients)})
+        reactions.append(rxn)
+    biomass = cobra.Reaction('Biomass', lower_bound = 0., upper_bound = 1000.)
+    biomass.add_metabolites({met: -1. for met in internal[:10]})
+    reactions.append(biomass)
+
+    cobra_m = cobra.Model(model_id)
+    cobra_m.add_reactions(reactions)
+    cobra_m.objective = 'Biomass'
+    return(cobra_m)
+
+
+def comets_model(n_reactions : int, seed : int = 0,
+                 model_id : str = 'bench') -> c.model:
+    """ returns cobra_model(n_reactions, seed, model_id) as a cometspy
+    model """
+    return(c.model(cobra_model(n_reactions, seed, model_id)))
+
+
+def community_layout(n_species : int, grid : tuple, n_reactions : int = 100,
+                     seed : int = 0, max_locations : int = 100,
+                     max_media_locations : int = 10000) -> c.layout:
+    """
+    returns a layout of n_species random models on a grid
+
+    The models are copies of one random model under different ids. Each is
+    placed at up to max_locations random locations, and the first exchanged
+    metabolite is set at up to max_media_locations locations, so that the
+    initial population and local media blocks of the layout grow with the
+    grid.
+
+    Parameters
+    ----------
+
+    n_species : int
+        the number of models
+    grid : tuple(int)
+        the size of the grid, e.g. (100, 100)
+    n_reactions : int, optional
+        the number of reactions of each model. The default is 100.
+    seed : int, optional
+        seed of the random number generator. The default is 0.
+    max_locations : int, optional
+        the most locations with biomass of each model. The default is 100.
+    max_media_locations : int, optional
+        the most locations with local media. The default is 10000.
+
+    Returns
+    -------
+
+    cometspy.layout
+
+    """
+    rng = np.random.default_rng(seed)
+    n_locations = grid[0] * grid[1]
+    template = comets_model(n_reactions, seed)
+    models = []
+    for s in range(n_species):
+        # copied, so that large models are converted from cobra only once
+        m = template if s == 0 else copy.deepcopy(template)
+        m.id = 'bench' + str(s)
+        cells = rng.choice(n_locations, size = min(n_locations, max_locations),
+                           replace = False)
+        m.initial_pop = [[int(cell // grid[1]), int(cell % grid[1]), 1.e-6]
+                         for cell in cells]
+        models.append(m)
+    lyt = c.layout(models)
+    lyt.grid = [int(grid[0]), int(grid[1])]
+    mets = lyt.all_exchanged_mets
+    for met in mets:
+        lyt.set_specific_metabolite(met, 1.)
+    cells = rng.choice(n_locations, size = min(n_locations, max_media_locations),
+                       replace = False)
+    for cell in cells:
+        lyt.set_specific_metabolite_at_location(
+            mets[0], (int(cell // grid[1]), int(cell % grid[1])), 2.)
+    return(lyt)
+
+
+# the most cycles written at once in logs with one line per cycle
+_ROWS_PER_BLOCK = 10000
+
+LOG_KINDS = ['total_biomass', 'biomass', 'media', 'fluxes', 'velocity',
+             'specific_media', 'genotypes']
+
+
+def write_log(kind : str, path : str, target_bytes : int,
+              grid : tuple = (50, 50), n_species : int = 2,
+              n_reactions : int = 100, n_metabolites : int = 20,
+              seed : int = 0) -> dict:
+    """
+    writes a synthetic COMETS log of about target_bytes bytes
+
+    Every location of the grid holds every species (and metabolite) at
+    every cycle; cycles are added until the file reaches target_bytes. The
+    result is at least one cycle long.
+
+    Parameters
+    ----------
+
+    kind : str
+        one of LOG_KINDS
+    path : str
+        the file to write
+    target_bytes : int
+        the size to reach
+    grid : tuple(int), optional
+        the size of the grid. The default is (50, 50).
+    n_species : int, optional
+        the number of species, named bench0, bench1, ... The default is 2.
+    n_reactions : int, optional
+        the number of reactions of each species, for flux logs. The default
+        is 100.
+    n_metabolites : int, optional
+        the number of metabolites, named met0_e, met1_e, ..., for media and
+        specific media logs. The default is 20.
+    seed : int, optional
+        seed of the random number generator. The default is 0.
+
+    Returns
+    -------
+
+    dict
+        "bytes", "rows" and "cycles" of the file, and the arguments a
+        parser needs: "model_ids", "n_reactions" and "metabolites"
+
+    """
+    if kind not in LOG_KINDS:
+        raise ValueError("kind must be one of " + ", ".join(LOG_KINDS))
+    rng = np.random.default_rng(seed)
+    model_ids = ['bench' + str(s) for s in range(n_species)]
+    metabolites = ['met' + str(i) + '_e' for i in range(n_metabolites)]
+    x, y = np.meshgrid(np.arange(1, grid[0] + 1), np.arange(1, grid[1] + 1),
+                       indexing = 'ij')
+    x, y = x.ravel(), y.ravel()
+    # logs with a line per cycle are written many cycles at a time
+    per_block = max(1, min(_ROWS_PER_BLOCK, target_bytes // 1000))
+
+    def block(cycle):
+        """ returns the lines of one cycle, or of many for logs with few
+        lines per cycle, and the number of cycles """
+        if kind == 'total_biomass':
+            frame = pd.DataFrame(rng.random((per_block, n_species)))
+            frame.insert(0, 'cycle', np.arange(cycle, cycle + per_block))
+            return(frame, per_block)
+        if kind == 'biomass' or kind == 'velocity':
+            frame = pd.DataFrame({
+                'cycle': cycle, 'x': np.repeat(x, n_species),
+                'y': np.repeat(y, n_species),
+                'species': np.tile([m + '.cmd' for m in model_ids], len(x))})
+            if kind == 'biomass':
+                frame['biomass'] = rng.random(len(frame))
+                return(frame, 1)
+            frame = frame[['cycle', 'species', 'x', 'y']]
+            frame['vx'] = rng.standard_normal(len(frame))
+            frame['vy'] = rng.standard_normal(len(frame))
+            return(frame, 1)
+        if kind == 'media':
+            return(pd.DataFrame({
+                'metabolite': np.repeat(metabolites, len(x)), 'cycle': cycle,
+                'x': np.tile(x, n_metabolites), 'y': np.tile(y, n_metabolites),
+                'conc': rng.random(len(x) * n_metabolites)}), 1)
+        if kind == 'fluxes':
+            frame = pd.DataFrame({
+                'cycle': cycle, 'x': np.repeat(x, n_species),
+                'y': np.repeat(y, n_species),
+                'model': np.tile(np.arange(1, n_species + 1), len(x))})
+            values = pd.DataFrame(rng.standard_normal((len(frame), n_reactions)))
+            return(pd.concat([frame, values], axis = 1), 1)
+        if kind == 'specific_media':
+            frame = pd.DataFrame({'cycle': cycle, 'x': x, 'y': y})
+            values = pd.DataFrame(rng.random((len(x), n_metabolites)),
+                                  columns = metabolites)
+            return(pd.concat([frame, values], axis = 1), 1)
+        # genotypes: one mutant per species and cycle
+        cycles = np.repeat(np.arange(cycle, cycle + per_block), n_species)
+        ancestors = np.tile(model_ids, per_block)
+        return(pd.DataFrame({
+            'Ancestor': ancestors,
+            'Mutation': ['del_R' + str(i) for i in cycles],
+            'Species': [a + '_' + str(i) for a, i in zip(ancestors, cycles)]}),
+               per_block)
+
+    if os.path.isfile(path):
+        os.remove(path)
+    rows = 0
+    cycle = 0
+    with open(path, 'w') as f:
+        if kind == 'specific_media':
+            f.write('cycle x y ' + ' '.join(metabolites) + '\n')
+        while cycle == 0 or f.tell() < target_bytes:
+            frame, n_cycles = block(cycle)
+            f.write(frame.to_csv(sep = '\t' if kind == 'total_biomass' else ' ',
+                                 header = False, index = False,
+                                 float_format = '%.6E'))
+            rows += len(frame)
+            cycle += n_cycles
+    return({'bytes': os.path.getsize(path), 'rows': rows, 'cycles': cycle,
+            'model_ids': model_ids, 'n_reactions': n_reactions,
+            'metabolites': metabolites})
@@ -0,0 +1,311 @@
+'''
+The suite module times cometspy on fixtures of increasing size.
+
+run_benchmarks() times, for every size of a scale:
+
+* model.load_cobra_model, for each number of reactions
+* model.write_comets_model, for each number of reactions
+* layout.write_layout and layout.read_comets_layout, for each number of
+  species and grid
+* every log parser used by comets.run(), for each log size
+* comets.run() from start to end with the fake backend (see
+  comets.set_backend), for each number of species and grid, with the time
+  of each of its phases (comets.timings)
+
+The results are saved as json with the versions of cometspy and its
+dependencies, and compare() lists the benchmarks which got slower between
+two such files.
+'''
+
+import datetime
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from importlib.metadata import version, PackageNotFoundError
+import pandas as pd
+
+import cometspy as c
+from cometspy import parsers
+from benchmarks import fixtures
+
+# sizes of each scale: reactions of a model, species of a layout, grids and
+# log sizes in bytes. "large" covers the sizes of big simulations and needs
+# several gigabytes of disk and memory.
+SCALES = {
+    'small': {'reactions': [100, 1000], 'species': [1, 10],
+              'grids': [(1, 1), (50, 50)], 'log_bytes': [10 ** 4, 10 ** 6],
+              'log_grid': (20, 20), 'run_cycles': 10},
+    'medium': {'reactions': [100, 1000, 5000], 'species': [1, 10, 50],
+               'grids': [(1, 1), (100, 100), (250, 250)],
+               'log_bytes': [10 ** 4, 10 ** 6, 10 ** 8],
+               'log_grid': (100, 100), 'run_cycles': 20},
+    'large': {'reactions': [100, 1000, 10000], 'species': [1, 20, 200],
+              'grids': [(1, 1), (100, 100), (500, 500)],
+              'log_bytes': [10 ** 4, 10 ** 6, 10 ** 8, 10 ** 9],
+              'log_grid': (500, 500), 'run_cycles': 20},
+}
+
+
+def _time(func, repeat : int, setup = None) -> dict:
+    """ returns the min, median and mean seconds of repeat calls of func.
+    setup, if given, is called untimed before each call and its return
+    value is passed to func. """
+    seconds = []
+    for i in range(repeat):
+        args = () if setup is None else (setup(),)
+        gc.collect()
+        start = time.perf_counter()
+        func(*args)
+        seconds.append(time.perf_counter() - start)
+    return({'min': min(seconds), 'median': statistics.median(seconds),
+            'mean': statistics.mean(seconds), 'repeat': repeat})
+
+
+def _versions() -> dict:
+    versions = {'python': platform.python_version(),
+                'pandas': pd.__version__}
+    for package in ['cometspy', 'numpy', 'cobra']:
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = 'unknown'
+    return(versions)
+
+
+def _bench_models(scale, repeat, results, directory):
+    for n_reactions in scale['reactions']:
+        cobra_m = fixtures.cobra_model(n_reactions)
+        case = {'reactions': n_reactions}
+        results.append({'name': 'model.load_cobra_model', 'case': case,
+                        'seconds': _time(lambda: c.model().load_cobra_model(cobra_m),
+                                         repeat)})
+        m = c.model(cobra_m)
+        results.append({'name': 'model.write_comets_model', 'case': case,
+                        'seconds': _time(lambda: m.write_comets_model(directory),
+                                         repeat)})
+
+
+def _bench_layouts(scale, repeat, results, directory):
+    for n_species, grid in itertools.product(scale['species'], scale['grids']):
+        lyt = fixtures.community_layout(n_species, grid)
+        case = {'species': n_species, 'grid': list(grid)}
+        results.append({'name': 'layout.write_layout', 'case': case,
+                        'seconds': _time(lambda: lyt.write_layout(directory),
+                                         repeat)})
+        # the layout names its model files relative to the current directory
+        for m in lyt.models:
+            m.write_comets_model(directory)
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            results.append({'name': 'layout.read_comets_layout', 'case': case,
+                            'seconds': _time(lambda: c.layout().read_comets_layout(
+                                '.current_layout'), repeat)})
+        finally:
+            os.chdir(cwd)
+
+
+def _parse(kind, path, log):
+    """ parses a log the way comets.run() does """
+    if kind == 'total_biomass':
+        parsers.read_total_biomass(path, log['model_ids'])
+    elif kind == 'biomass':
+        parsers.read_biomass(path)
+    elif kind == 'media':
+        parsers.read_media(path)
+    elif kind == 'fluxes':
+        parsers.read_fluxes(path, log['n_reactions'] + 4)
+    elif kind == 'fluxes_by_species':
+        parsers.read_fluxes_by_species(
+            path, [(model_id, ['R' + str(i) for i in range(log['n_reactions'])])
+                   for model_id in log['model_ids']])
+    elif kind == 'velocity':
+        parsers.read_velocity(path)
+    elif kind == 'specific_media':
+        parsers.read_specific_media(path)
+    elif kind == 'genotypes':
+        parsers.read_genotypes(path)
+
+
+def _bench_parsers(scale, repeat, results, directory):
+    for log_bytes in scale['log_bytes']:
+        for kind in fixtures.LOG_KINDS:
+            path = os.path.join(directory, kind + '_log')
+            log = fixtures.write_log(kind, path, log_bytes,
+                                     grid = scale['log_grid'])
+            parsed = [kind] + (['fluxes_by_species'] if kind == 'fluxes' else [])
+            for parse in parsed:
+                results.append({
+                    'name': 'parsers.read_' + parse,
+                    'case': {'log_bytes': log_bytes},
+                    'bytes': log['bytes'], 'rows': log['rows'],
+                    'seconds': _time(lambda: _parse(parse, path, log), repeat)})
+            os.remove(path)
+
+
+def _bench_runs(scale, repeat, results, directory):
+    for n_species, grid in itertools.product(scale['species'], scale['grids']):
+        lyt = fixtures.community_layout(n_species, grid)
+        p = c.params()
+        p.set_param('maxCycles', scale['run_cycles'])
+        for log in ['writeTotalBiomassLog', 'writeBiomassLog', 'writeMediaLog',
+                    'writeFluxLog', 'writeVelocityMultiConvLog']:
+            p.set_param(log, True)
+        # the fake backend's time to write logs is part of "simulation";
+        # five spatial logs keep it from dominating
+        for rate in ['BiomassLogRate', 'MediaLogRate', 'FluxLogRate',
+                     'velocityMultiConvLogRate']:
+            p.set_param(rate, max(1, scale['run_cycles'] // 5))
+        timings = []
+
+        def setup():
+            sim = c.comets(lyt, p, os.path.relpath(directory) + '/')
+            sim.set_backend('fake')
+            return(sim)
+
+        def run(sim):
+            sim.run()
+            timings.append(sim.timings)
+
+        seconds = _time(run, repeat, setup)
+        phases = {phase: statistics.median([t[phase] for t in timings])
+                  for phase in timings[0] if phase != 'parse'}
+        phases['parse'] = {log: statistics.median([t['parse'][log] for t in timings])
+                           for log in timings[0]['parse']}
+        results.append({'name': 'comets.run', 'case': {'species': n_species,
+                                                       'grid': list(grid),
+                                                       'backend': 'fake'},
+                        'seconds': seconds, 'phases': phases})
+
+
+# the groups of benchmarks, in the order they are run
+GROUPS = {'models': _bench_models, 'layouts': _bench_layouts,
+          'parsers': _bench_parsers, 'runs': _bench_runs}
+
+
+def run_benchmarks(scale : str = 'small', repeat : int = 3,
+                   groups : list = None, output : str = None,
+                   directory : str = None) -> dict:
+    """
+    times cometspy on fixtures of the sizes of a scale
+
+    Parameters
+    ----------
+
+    scale : str, optional
+        "small", "medium" or "large", see SCALES. The default is "small".
+    repeat : int, optional
+        how often each benchmark is timed. The default is 3.
+    groups : list(str), optional
+        which of "models", "layouts", "parsers" and "runs" to run. The
+        default is all.
+    output : str, optional
+        a json file to save the results in. The default is not to save them.
+    directory : str, optional
+        where to write fixtures. The default is a temporary directory, which
+        is deleted afterwards.
+
+    Returns
+    -------
+
+    dict
+        "versions", "scale", "date", "platform" and "results", a list with
+        for each benchmark its "name", "case" (its size) and "seconds"
+        (min, median, mean and repeat)
+
+    Examples
+    --------
+
+    >>> from benchmarks import run_benchmarks, compare
+    >>> run_benchmarks("small", output = "bench-0.6.2.json")
+    >>> # after changing cometspy
+    >>> run_benchmarks("small", output = "bench-new.json")
+    >>> compare("bench-0.6.2.json", "bench-new.json")
+
+    """
+    if scale not in SCALES:
+        raise ValueError("scale must be one of " + ", ".join(SCALES.keys()))
+    if groups is None:
+        groups = list(GROUPS.keys())
+    for group in groups:
+        if group not in GROUPS:
+            raise ValueError("groups must be among " + ", ".join(GROUPS.keys()))
+
+    temporary = directory is None
+    if temporary:
+        directory = tempfile.mkdtemp(prefix = 'cometspy_bench_')
+    else:
+        os.makedirs(directory, exist_ok = True)
+    directory = os.path.abspath(directory) + '/'
+    results = []
+    try:
+        for group in groups:
+            GROUPS[group](SCALES[scale], repeat, results, directory)
+    finally:
+        if temporary:
+            shutil.rmtree(directory, ignore_errors = True)
+
+    report = {'versions': _versions(), 'scale': scale,
+              'date': datetime.datetime.now().isoformat(timespec = 'seconds'),
+              'platform': platform.platform(), 'results': results}
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent = 1)
+    return(report)
+
+
+def _as_table(report) -> pd.DataFrame:
+    if isinstance(report, str):
+        with open(report, 'r') as f:
+            report = json.load(f)
+    return(pd.DataFrame({
+        'name': [r['name'] for r in report['results']],
+        'case': [json.dumps(r['case'], sort_keys = True)
+                 for r in report['results']],
+        'seconds': [r['seconds']['min'] for r in report['results']]}))
+
+
+def compare(baseline, current, threshold : float = 1.2,
+            min_seconds : float = 0.01) -> pd.DataFrame:
+    """
+    compares two sets of results of run_benchmarks()
+
+    Benchmarks are matched by name and case, and compared by their fastest
+    time, which is the least affected by other programs running.
+
+    Parameters
+    ----------
+
+    baseline : str or dict
+        the older results, or the json file they were saved in
+    current : str or dict
+        the newer results, or the json file they were saved in
+    threshold : float, optional
+        the ratio current / baseline above which a benchmark counts as a
+        regression. The default is 1.2.
+    min_seconds : float, optional
+        benchmarks faster than this in both results are too noisy to count
+        as regressions. The default is 0.01.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns name, case, baseline, current (seconds), ratio and
+        regression, slowest ratio first
+
+    """
+    table = _as_table(baseline).merge(_as_table(current), on = ['name', 'case'],
+                                      suffixes = ('_baseline', '_current'))
+    table = table.rename(columns = {'seconds_baseline': 'baseline',
+                                    'seconds_current': 'current'})
+    table['ratio'] = table['current'] / table['baseline']
+    table['regression'] = ((table['ratio'] > threshold) &
+                           (table['current'] >= min_seconds))
+    return(table.sort_values('ratio', ascending = False).reset_index(drop = True))
@@ -0,0 +1,202 @@
+'''
+The cache module stores the results of COMETS simulations on disk.
+
+A result_cache is given to comets.run(cache = ...). Before starting COMETS,
+run() hashes the input files it has just written (layout, params and model
+files) together with the COMETS version and the options of run() which
+change what is read from the logs. If results for an identical
+simulation are already stored, they are returned instead of running COMETS.
+'''
+
+import hashlib
+import json
+import os
+import pickle
+
+# attributes of a finished comets object which are stored in the cache
+_RESULT_ATTRIBUTES = ['run_output', 'total_biomass', 'biomass', 'media',
+                      'fluxes', 'fluxes_by_species', 'velocity',
+                      'specific_media', 'genotypes', 'media_by_cycle',
+                      'fluxes_by_cycle', 'aggregated']
+
+
+class result_cache:
+    """
+    a size-capped on-disk store of simulation results, keyed on content
+
+    Each entry is a pickle file named by the sha256 hash of a simulation's
+    input files and the COMETS version. When the total size of the entries
+    exceeds max_size, the least recently used entries are deleted.
+
+    Parameters
+    ----------
+
+    directory : str
+        the directory where entries are stored. It is created if needed.
+    max_size : int, optional
+        the maximum total size of the entries in bytes. The default is 1 GB.
+
+    Attributes
+    ----------
+
+    directory : str
+        the directory where entries are stored
+    max_size : int
+        the maximum total size of the entries in bytes
+    hits : int
+        number of simulations answered from the cache
+    misses : int
+        number of simulations which had to be run
+
+    Examples
+    --------
+
+    >>> from cometspy.cache import result_cache
+    >>> cache = result_cache("./comets_cache", max_size = 10 * 2**30)
+    >>> sim = c.comets(layout, params)
+    >>> sim.run(cache = cache) # runs COMETS
+    >>> sim2 = c.comets(layout, params)
+    >>> sim2.run(cache = cache) # returns the stored results
+    >>> cache.hits
+    1
+
+    """
+    def __init__(self, directory : str, max_size : int = 2**30):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok = True)
+
+    def key(self, sim, read_options : dict = None) -> str:
+        """
+        returns the hash identifying the simulation whose input files sim
+        has just written
+
+        Log file names are excluded from the params files, since comets
+        objects name their logs uniquely. Model ids are covered by the
+        layout file, which lists the model files.
+
+        Parameters
+        ----------
+
+        sim : comets
+            a comets object whose input files are written in its working_dir
+        read_options : dict, optional
+            the options of run() which change the results read from the
+            logs, e.g. {"where": log_filter(...)}, left out when at their
+            defaults so that unfiltered results keep the same key
+
+        Returns
+        -------
+
+        str
+            the hex digest identifying the simulation
+
+        """
+        digest = hashlib.sha256()
+        digest.update(sim.VERSION.encode())
+        for path in sim._input_file_paths():
+            with open(path, 'rb') as f:
+                for line in f:
+                    if b'LogName' not in line:
+                        digest.update(line)
+        if read_options:
+            digest.update(json.dumps(read_options, sort_keys = True,
+                                     default = _canonical).encode())
+        return(digest.hexdigest())
+
+    def load(self, key : str, sim) -> bool:
+        """
+        copies stored results into sim, returning whether key was found
+
+        Parameters
+        ----------
+
+        key : str
+            a hash returned by key()
+        sim : comets
+            the comets object to receive the results
+
+        Returns
+        -------
+
+        bool
+            True if results were found and copied
+
+        """
+        path = self.__path(key)
+        try:
+            with open(path, 'rb') as f:
+                results = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return(False)
+        os.utime(path)  # mark as recently used
+        for attribute, value in results.items():
+            setattr(sim, attribute, value)
+        self.hits += 1
+        return(True)
+
+    def store(self, key : str, sim):
+        """
+        stores the results of the finished sim under key, then evicts the
+        least recently used entries if the cache is larger than max_size
+
+        Parameters
+        ----------
+
+        key : str
+            a hash returned by key()
+        sim : comets
+            a comets object which has finished running
+
+        """
+        results = {attribute: getattr(sim, attribute)
+                   for attribute in _RESULT_ATTRIBUTES
+                   if hasattr(sim, attribute)}
+        path = self.__path(key)
+        temp_path = path + '.' + str(os.getpid()) + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(results, f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)  # atomic, so readers never see half a file
+        self.evict()
+
+    def evict(self):
+        """
+        deletes the least recently used entries until the total size of
+        the cache is at most max_size
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum([entry[1] for entry in entries])
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        """ deletes every entry in the cache """
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.directory, name))
+
+    def __path(self, key):
+        return(os.path.join(self.directory, key + '.pkl'))
+
+
+def _canonical(value):
+    """ a json-serializable form of a read option, e.g. a log_filter """
+    return({'class': type(value).__name__, 'attributes': vars(value)})
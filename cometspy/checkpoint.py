@@ -0,0 +1,271 @@
+'''
+The checkpoint module continues simulations from their logged final state.
+
+layout_from_results() builds a new layout whose initial biomass and media
+are those logged at the end of a finished simulation, so a following run
+continues where it stopped. run_in_segments() uses it to run a long
+simulation as a series of shorter ones, saving a checkpoint after each
+segment, so an interrupted simulation can be restarted from its last
+finished segment instead of from cycle 0.
+'''
+
+import copy
+import os
+import pickle
+import pandas as pd
+
+from cometspy.comets import comets
+
+# results of each segment which are joined into the results of the whole run
+_SEGMENT_RESULTS = ['total_biomass', 'biomass', 'media']
+
+
+def layout_from_results(sim, cycle : int = None):
+    """
+    returns a copy of a simulation's layout starting from its logged state
+
+    The biomass of each model and the concentration of each exchanged
+    metabolite at every location are taken from the biomass and media logs
+    of the finished sim, at the given cycle. They become the models'
+    initial_pop and the layout's location-specific media. Exchanged
+    metabolites which are not static start at 0 wherever the media log has
+    no value. Everything else (models, grid, refresh, static and diffusion
+    settings, barriers, ...) is copied unchanged, as are the initial amounts
+    of metabolites which no model exchanges.
+
+    The sim must have been run with the biomass and media logs on and
+    without a log_filter, so the logs hold every species, metabolite and
+    location.
+
+    Parameters
+    ----------
+
+    sim : comets
+        a comets object which has finished running
+    cycle : int, optional
+        the cycle whose state to take. The default is the last cycle logged
+        in both the biomass and the media logs.
+
+    Returns
+    -------
+
+    cometspy.layout
+        a new layout. sim.layout and its models are not changed.
+
+    Examples
+    --------
+
+    >>> params.set_param("writeBiomassLog", True)
+    >>> params.set_param("writeMediaLog", True)
+    >>> params.set_param("MediaLogRate", 1)
+    >>> sim = c.comets(layout, params)
+    >>> sim.run()
+    >>> next_layout = layout_from_results(sim)
+    >>> params.set_param("defaultDiffConst", 1.e-5) # change something
+    >>> sim2 = c.comets(next_layout, params)
+    >>> sim2.run()
+
+    """
+    if getattr(sim, 'biomass', None) is None or getattr(sim, 'media', None) is None:
+        raise ValueError("layout_from_results needs the biomass and media "
+                         "logs. set writeBiomassLog and writeMediaLog to True")
+    common = sorted(set(sim.biomass['cycle']) & set(sim.media['cycle']))
+    if cycle is None:
+        if len(common) == 0:
+            raise ValueError("the biomass and media logs have no cycle in "
+                             "common. set BiomassLogRate and MediaLogRate so "
+                             "that both logs are written at the last cycle")
+        cycle = common[-1]
+    elif cycle not in common:
+        raise ValueError('biomass and media were not both saved at the '
+                         'desired cycle. try another.')
+
+    new_layout = copy.deepcopy(sim.layout)
+
+    biomass = sim.biomass.loc[sim.biomass['cycle'] == cycle]
+    biomass = biomass.loc[biomass['biomass'] > 0]
+    for m in new_layout.models:
+        rows = biomass.loc[biomass['species'] == m.id]
+        if len(rows) == 0:
+            m.initial_pop = [[0, 0, 0.0]]
+        else:
+            m.initial_pop = [[x - 1, y - 1, amount] for x, y, amount in
+                             zip(rows['x'].tolist(), rows['y'].tolist(),
+                                 rows['biomass'].tolist())]
+    new_layout.update_models()
+
+    exchanged = set(new_layout.all_exchanged_mets)
+    static = set(new_layout.media.loc[new_layout.media['g_static'] == 1,
+                                      'metabolite'])
+    restart = exchanged - static
+    new_layout.media.loc[new_layout.media['metabolite'].isin(restart),
+                         'init_amount'] = 0.
+    for location in list(new_layout.local_media.keys()):
+        for met in restart & set(new_layout.local_media[location].keys()):
+            del new_layout.local_media[location][met]
+    media = sim.media.loc[(sim.media['cycle'] == cycle) &
+                          sim.media['metabolite'].isin(restart)]
+    # filled directly: a call per row of set_specific_metabolite_at_location
+    # would be too slow for large grids
+    local_media = new_layout.local_media
+    for met, x, y, amount in zip(media['metabolite'].tolist(),
+                                 media['x'].tolist(), media['y'].tolist(),
+                                 media['conc_mmol'].tolist()):
+        local_media.setdefault((x - 1, y - 1), {})[met] = amount
+    if len(media) > 0:
+        # once, so that the layout writes its location-specific media
+        new_layout.set_specific_metabolite_at_location(met, (x - 1, y - 1),
+                                                       amount)
+    return(new_layout)
+
+
+def run_in_segments(layout, params, segment_cycles : int, n_segments : int,
+                    checkpoint_dir : str = None, between_segments = None,
+                    relative_dir : str = '', **run_kwargs):
+    """
+    runs a long simulation as a series of shorter ones
+
+    Each segment runs for segment_cycles cycles, starting from the state
+    logged at the end of the previous segment (see layout_from_results).
+    With a checkpoint_dir, the layout and params of the next segment and the
+    results of the segment are saved there after each segment. Calling
+    run_in_segments again with the same checkpoint_dir and the same
+    segment_cycles and n_segments, e.g. after the process was killed,
+    continues from the last finished segment.
+
+    The biomass and media logs are turned on, and segment_cycles must be a
+    multiple of BiomassLogRate and MediaLogRate so that both are logged at
+    the end of every segment. The base layout and params are not changed.
+
+    Parameters
+    ----------
+
+    layout : cometspy.layout
+        the layout of the first segment
+    params : cometspy.params
+        the params of the first segment. maxCycles is set to segment_cycles.
+    segment_cycles : int
+        the number of cycles of each segment
+    n_segments : int
+        the number of segments
+    checkpoint_dir : str, optional
+        a directory in which to save checkpoints. The default is not to save
+        any.
+    between_segments : callable, optional
+        called as between_segments(segment, sim, next_layout, next_params)
+        after each segment but the last, where segment counts from 0 and sim
+        is the finished comets object. It may inspect the results and
+        change next_layout and next_params, which are checkpointed after it
+        returns.
+    relative_dir : str, optional
+        the directory, relative to the current one, in which to run
+    **run_kwargs
+        passed on to comets.run(), e.g. delete_files
+
+    Returns
+    -------
+
+    comets
+        the comets object of the last segment. Its total_biomass, biomass
+        and media hold the results of all segments, with cycles counted from
+        the start of the first segment.
+
+    Examples
+    --------
+
+    >>> from cometspy.checkpoint import run_in_segments
+    >>> sim = run_in_segments(layout, params, segment_cycles = 500,
+    >>>                       n_segments = 20, checkpoint_dir = "./ckpt")
+    >>> sim.total_biomass.tail()
+
+    """
+    state_path = None
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok = True)
+        state_path = os.path.join(checkpoint_dir, 'checkpoint.pkl')
+
+    if state_path is not None and os.path.isfile(state_path):
+        with open(state_path, 'rb') as f:
+            state = pickle.load(f)
+        for name, value in (('segment_cycles', segment_cycles),
+                            ('n_segments', n_segments)):
+            if state[name] != value:
+                raise ValueError("the checkpoint in " + checkpoint_dir +
+                                 " was made with " + name + " = " +
+                                 str(state[name]) + ", not " + str(value))
+        print('continuing from the checkpoint after segment ' +
+              str(state['segment']))
+    else:
+        params = copy.deepcopy(params)
+        params.set_param('writeBiomassLog', True)
+        params.set_param('writeMediaLog', True)
+        params.set_param('maxCycles', segment_cycles)
+        for rate in ['BiomassLogRate', 'MediaLogRate']:
+            if segment_cycles % params.all_params[rate] != 0:
+                raise ValueError("segment_cycles must be a multiple of " + rate)
+        state = {'segment': -1, 'layout': copy.deepcopy(layout),
+                 'params': params, 'segment_cycles': segment_cycles,
+                 'n_segments': n_segments}
+
+    # the results of each segment, kept in memory or, with a checkpoint_dir,
+    # each saved in its own file once, so saving does not grow with the run
+    results = []
+    for segment in range(state['segment'] + 1):
+        with open(_segment_path(checkpoint_dir, segment), 'rb') as f:
+            results.append(pickle.load(f))
+
+    sim = None
+    for segment in range(state['segment'] + 1, n_segments):
+        sim = comets(state['layout'], state['params'], relative_dir)
+        sim.run(**run_kwargs)
+        if getattr(sim, 'biomass', None) is None:
+            raise RuntimeError("segment " + str(segment) + " did not produce "
+                               "a biomass log. see sim.run_errors")
+        offset = segment * segment_cycles
+        segment_results = {}
+        for name in _SEGMENT_RESULTS:
+            result = getattr(sim, name, None)
+            if result is None:
+                continue  # e.g. the total biomass log is off
+            result = result.copy()
+            if segment > 0:
+                # cycle 0 of a segment repeats the last cycle of the previous
+                result = result.loc[result['cycle'] > 0]
+            result['cycle'] += offset
+            segment_results[name] = result
+        results.append(segment_results)
+
+        if segment < n_segments - 1:
+            next_layout = layout_from_results(sim)
+            next_params = copy.deepcopy(state['params'])
+            if between_segments is not None:
+                between_segments(segment, sim, next_layout, next_params)
+            next_params.set_param('maxCycles', segment_cycles)
+            state['layout'] = next_layout
+            state['params'] = next_params
+        state['segment'] = segment
+        if state_path is not None:
+            # the segment's results first, so the state never points past them
+            _save(_segment_path(checkpoint_dir, segment), segment_results)
+            _save(state_path, state)
+
+    if sim is None:
+        # every segment was already finished
+        sim = comets(state['layout'], state['params'], relative_dir)
+    for name in _SEGMENT_RESULTS:
+        chunks = [r[name] for r in results if name in r]
+        if len(chunks) > 0:
+            setattr(sim, name, pd.concat(chunks, ignore_index = True))
+    return(sim)
+
+
+def _segment_path(checkpoint_dir, segment):
+    return(os.path.join(checkpoint_dir, 'segment_' + str(segment) + '.pkl'))
+
+
+def _save(path, obj):
+    """ pickles obj to path, replacing any previous file only once written """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(obj, f, protocol = pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
@@ -9,13 +9,30 @@ any saved data (e.g. total_biomass) can be accessed from the object.
 
 '''
 
-import re
+import io
+import asyncio
+import atexit
+import contextlib
+import copy
 import subprocess as sp
 import pandas as pd
 import os
+import re
 import glob
+import fnmatch
+import json
+import shutil
+import tempfile
+import threading
+import time
+import weakref
 import numpy as np
 import platform
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from cometspy import parsers
 
 __author__ = "Djordje Bajic, Jean Vila, Jeremy Chacon, Ilija Dukovski"
 __copyright__ = "Copyright 2024, The COMETS Consortium"
@@ -30,11 +47,547 @@ __email__ = "djordje.bajic@yale.edu"
 __status__ = "Beta"
 
 
-def _readlines_file(filename):
-    f = open(filename, 'r')
-    f_lines = f.readlines()
-    f.close()
-    return f_lines
+def _find_classpath_pieces(comets_home : str, version : str) -> dict:
+    """ searches comets_home for the java libraries COMETS needs, returning
+    the classpath pieces as a dict of library name (key) and path (value).
+    COMETS_HOME/lib is walked once and every library is matched against
+    that listing. """
+    lib_files = glob.glob(comets_home + '/lib' + '/**/*', recursive=True)
+
+    def find(pattern, under = '/lib'):
+        # same as glob.glob(comets_home + under + '/**/' + pattern)
+        return([f for f in lib_files
+                if f.startswith(comets_home + under + '/')
+                and fnmatch.fnmatch(os.path.basename(f), pattern)])
+
+    pieces = {}
+    pieces['or_tools_java'] = (comets_home +
+                               '/lib/or-tools/9.4.1874/' + 'ortools-java-9.4.1874.jar')
+
+    pieces['or_tools_linux'] = (comets_home +
+                                '/lib/or-tools/9.4.1874/' + 'ortools-linux-x86-64-9.4.1874.jar')
+
+    pieces['junit'] = find('*junit*', under = '/lib/junit')[0]
+    pieces['hamcrest'] = find('*hamcrest*')[0]
+
+    pieces['jogl_all'] = find('jogl-all.jar')[0]
+    pieces['gluegen_rt'] = find('gluegen-rt.jar')[0]
+    pieces['gluegen'] = find('gluegen.jar')[0]
+    pieces['gluegen_rt_natives'] = find('gluegen-rt-natives-linux-amd64.jar')[0]
+    pieces['jogl_all_natives'] = find('jogl-all-natives-linux-amd64.jar')[0]
+
+    pieces['jmatio'] = find('jmatio.jar')[0]
+    pieces['jmat'] = find('jmatio.jar')[0]
+
+    pieces['concurrent'] = find('concurrent.jar')[0]
+    pieces['colt'] = find('colt.jar')[0]
+
+    lang3 = find('commons-lang3*jar')
+    pieces['lang3'] = [i for i in lang3
+                       if 'test' not in i
+                       and 'sources' not in i][0]
+
+    math3 = find('commons-math3*jar')
+    pieces['math3'] = [i for i in math3
+                       if 'test' not in i
+                       and 'sources' not in i
+                       and 'tools' not in i
+                       and 'javadoc' not in i][0]
+
+    pieces['jdistlib'] = find('*jdistlib*')[0]
+    pieces['bin'] = (comets_home +
+                     '/bin/' + version + '.jar')
+    return(pieces)
+
+
+def _install_stamp(comets_home : str) -> list:
+    """ returns the modification times of comets_home, its bin and lib
+    directories and the directories directly inside lib. Installing,
+    removing or upgrading COMETS or its libraries changes at least one. """
+    dirs = [comets_home, comets_home + '/bin', comets_home + '/lib']
+    try:
+        dirs += sorted([entry.path for entry in os.scandir(comets_home + '/lib')
+                        if entry.is_dir()])
+    except OSError:
+        pass
+    stamp = []
+    for d in dirs:
+        try:
+            stamp.append([d, os.stat(d).st_mtime])
+        except OSError:
+            stamp.append([d, None])
+    return(stamp)
+
+
+# COMETS_HOME -> {'stamp': ..., 'version': ..., 'pieces': ...}, filled by
+# _discover_comets() so that the library search runs once per process
+_COMETS_INSTALLS = {}
+
+
+def _discover_comets(comets_home : str) -> tuple:
+    """
+    returns (VERSION, classpath pieces) of the COMETS installed at
+    comets_home, without the gurobi piece
+
+    Searching COMETS_HOME/lib is slow on network filesystems, so results are
+    kept for the lifetime of the process and, if the environmental variable
+    COMETSPY_CLASSPATH_CACHE names a json file, also on disk. Either cache is
+    used only while the directory modification times (see _install_stamp)
+    are unchanged.
+    """
+    stamp = _install_stamp(comets_home)
+    entry = _COMETS_INSTALLS.get(comets_home)
+    cache_file = os.environ.get('COMETSPY_CLASSPATH_CACHE')
+    if (entry is None or entry['stamp'] != stamp) and cache_file:
+        try:
+            with open(cache_file, 'r') as f:
+                entry = json.load(f).get(comets_home)
+        except (OSError, ValueError):
+            entry = None
+    if entry is not None and entry['stamp'] == stamp:
+        _COMETS_INSTALLS[comets_home] = entry
+        return((entry['version'], dict(entry['pieces'])))
+
+    version = os.path.splitext(os.listdir(comets_home + '/bin')[0])[0]
+    pieces = _find_classpath_pieces(comets_home, version)
+    entry = {'stamp': stamp, 'version': version, 'pieces': pieces}
+    _COMETS_INSTALLS[comets_home] = entry
+    if cache_file:
+        try:
+            with open(cache_file, 'r') as f:
+                on_disk = json.load(f)
+        except (OSError, ValueError):
+            on_disk = {}
+        on_disk[comets_home] = entry
+        try:
+            with open(cache_file, 'w') as f:
+                json.dump(on_disk, f, indent = 1)
+        except OSError:
+            pass  # the cache is only an optimization
+    return((version, dict(pieces)))
+
+
+# logs which comets.run(stream = True) reads while COMETS writes them:
+# name of the result attribute -> (params flag, params log name)
+_STREAMABLE_LOGS = {'total_biomass': ('writeTotalBiomassLog', 'TotalBiomassLogName'),
+                    'biomass': ('writeBiomassLog', 'BiomassLogName'),
+                    'media': ('writeMediaLog', 'MediaLogName')}
+
+
+# logs which COMETS may write: params flag -> params log name
+_LOGS = {'writeTotalBiomassLog': 'TotalBiomassLogName',
+         'writeBiomassLog': 'BiomassLogName',
+         'writeFluxLog': 'FluxLogName',
+         'writeMediaLog': 'MediaLogName',
+         'writeVelocityMultiConvLog': 'velocityMultiConvLogName',
+         'writeSpecificMediaLog': 'SpecificMediaLogName'}
+
+
+class RunLimitExceeded(RuntimeError):
+    """
+    raised by comets.run() when a simulation exceeded one of its limits
+
+    The COMETS process (and anything it started) has been killed by then.
+
+    Attributes
+    ----------
+
+    limit : str
+        "timeout", "max_log_size" or "max_heap"
+    value : object
+        the limit given to run()
+    observed : object
+        what was measured when the limit was exceeded (seconds or bytes), or
+        None for max_heap
+    run_output : str
+        the std_out of COMETS until it was killed
+
+    """
+    def __init__(self, limit : str, value, observed = None,
+                 run_output : str = ''):
+        message = "COMETS simulation exceeded its " + limit + " of " + str(value)
+        if observed is not None:
+            message += " (observed: " + str(observed) + ")"
+        super().__init__(message)
+        self.limit = limit
+        self.value = value
+        self.observed = observed
+        self.run_output = run_output
+
+    def __reduce__(self):
+        # so that the error can be sent back from run_many's worker processes
+        return((RunLimitExceeded, (self.limit, self.value, self.observed,
+                                   self.run_output)))
+
+
+class BatchRunError(RuntimeError):
+    """
+    raised by run_batch() when some of its simulations failed
+
+    The results of the other simulations have been read by then.
+
+    Attributes
+    ----------
+
+    errors : list(tuple(int, Exception))
+        the position in sims and the error of each failed simulation
+
+    """
+    def __init__(self, errors : list):
+        super().__init__(str(len(errors)) + " of the batch's simulations failed: " +
+                         "; ".join(["sim " + str(i) + ": " + str(error)
+                                    for i, error in errors]))
+        self.errors = errors
+
+
+# COMETS processes which are still running. They are killed if python exits
+# first, so no JVM outlives the process that started it.
+_RUNNING_PROCESSES = set()
+
+
+def _start_process(args : list, cwd : str) -> sp.Popen:
+    """ starts COMETS without a shell. On POSIX, it gets its own process
+    group (session), so that it and its children can be killed together. """
+    process = sp.Popen(args, cwd = cwd, stdout = sp.PIPE, stderr = sp.STDOUT,
+                       start_new_session = platform.system() != 'Windows')
+    _RUNNING_PROCESSES.add(process)
+    return(process)
+
+
+def _kill_process_group(process):
+    """ kills a COMETS process started by _start_process() or by
+    run_async(), and any process it started """
+    if isinstance(process, sp.Popen):
+        process.poll()
+    if process.returncode is not None:
+        return
+    try:
+        if platform.system() == 'Windows':
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _kill_running_processes():
+    for process in list(_RUNNING_PROCESSES):
+        _kill_process_group(process)
+
+
+atexit.register(_kill_running_processes)
+
+
+class _run_monitor:
+    """ watches a running COMETS process from a background thread and kills
+    its process group once it has run for more than timeout seconds, or once
+    the files in log_paths together are larger than max_log_size bytes. The
+    limit that was exceeded is then in exceeded, as (limit, value,
+    observed). """
+    def __init__(self, process : sp.Popen, timeout : float = None,
+                 max_log_size : int = None, log_paths : list = (),
+                 interval : float = 0.5):
+        self.process = process
+        self.timeout = timeout
+        self.max_log_size = max_log_size
+        self.log_paths = log_paths
+        self.interval = interval
+        self.exceeded = None
+        self.__started = time.monotonic()
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target = self.__watch, daemon = True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+        self.__thread.join()
+
+    def __watch(self):
+        while not self.__stopped.wait(self.interval):
+            if self.process.poll() is not None:
+                return
+            elapsed = time.monotonic() - self.__started
+            if self.timeout is not None and elapsed > self.timeout:
+                self.exceeded = ('timeout', self.timeout, round(elapsed, 1))
+            elif self.max_log_size is not None:
+                size = 0
+                for path in self.log_paths:
+                    try:
+                        size += os.path.getsize(path)
+                    except OSError:
+                        pass
+                if size > self.max_log_size:
+                    self.exceeded = ('max_log_size', self.max_log_size, size)
+            if self.exceeded is not None:
+                _kill_process_group(self.process)
+                return
+
+
+# a cycle time printed by COMETS when showCycleTime is on, e.g.
+# "Cycle time: 12 ms". The unit is milliseconds unless it says s.
+_CYCLE_TIME = re.compile(r'cycle\s*time\D*?(\d+(?:[.,]\d+)?)\s*(ms|s)?\b',
+                         re.IGNORECASE)
+
+
+class _stdout_reader:
+    """ reads the std_out of a COMETS process line by line, noting when the
+    first line and each "Cycle N" line arrived, and any cycle times COMETS
+    printed (see the showCycleTime parameter). Updates the tqdm progress
+    bar prog, if one is given, once per cycle. """
+    def __init__(self, process, prog = None):
+        self.process = process
+        self.prog = prog
+        self.first_line = None
+        self.ended = None
+        self.lines = []
+        self.cycle_starts = []  # (cycle, monotonic time)
+        self.reported_times = {}  # cycle -> seconds
+
+    def read(self):
+        cycle = None
+        with self.process.stdout:
+            for line in iter(self.process.stdout.readline, b''):
+                arrived = time.monotonic()
+                if self.first_line is None:
+                    self.first_line = arrived
+                line = line.decode('ascii', 'ignore')
+                self.lines.append(line)
+                stripped = line.strip()
+                if stripped.startswith("Cycle ") and stripped[6:].isdigit():
+                    cycle = int(stripped[6:])
+                    self.cycle_starts.append((cycle, arrived))
+                    if self.prog is not None and cycle != 1:
+                        self.prog.update(1)
+                    continue
+                cycle_time = _CYCLE_TIME.search(stripped)
+                if cycle_time is not None and cycle is not None:
+                    value = float(cycle_time.group(1).replace(',', '.'))
+                    if cycle_time.group(2) != 's':
+                        value /= 1000.
+                    self.reported_times[cycle] = value
+        self.ended = time.monotonic()
+
+    def output(self) -> str:
+        return("".join(self.lines))
+
+    def cycle_times(self) -> pd.DataFrame:
+        """ returns the wall time of each cycle, from when its "Cycle N"
+        line arrived until the next one (or the end of std_out), and the
+        cycle time reported by COMETS, if any """
+        cycles = [cycle for cycle, _ in self.cycle_starts]
+        starts = [arrived for _, arrived in self.cycle_starts]
+        ends = starts[1:] + [self.ended if self.ended is not None else time.monotonic()]
+        return(pd.DataFrame({'cycle': pd.Series(cycles, dtype = 'int64'),
+                             'wall_time': np.subtract(ends, starts),
+                             'reported_time': [self.reported_times.get(cycle, np.nan)
+                                               for cycle in cycles]}))
+
+
+@contextlib.contextmanager
+def _timed(timings : dict, name : str):
+    """ adds the seconds spent in the with block to timings[name] """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.) + time.perf_counter() - started
+
+
+class _python_profiler:
+    """ profiles the python side of comets.run() with cProfile and/or
+    tracemalloc. pause() and resume() leave out the time spent waiting for
+    COMETS. """
+    def __init__(self, kinds):
+        if isinstance(kinds, str):
+            kinds = [kinds]
+        for kind in kinds:
+            if kind not in ('cprofile', 'tracemalloc'):
+                raise ValueError("profile must be 'cprofile', 'tracemalloc' " +
+                                 "or a list of them")
+        self.kinds = kinds
+        self.profiler = None
+        self.tracing = False
+        if 'cprofile' in kinds:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if 'tracemalloc' in kinds:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing = True
+            elif hasattr(tracemalloc, 'reset_peak'):
+                # python 3.9+. Before, the peak is that since tracing began
+                tracemalloc.reset_peak()
+
+    def pause(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def resume(self):
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self) -> dict:
+        results = {}
+        if self.profiler is not None:
+            import pstats
+            self.profiler.disable()
+            results['cprofile'] = pstats.Stats(self.profiler)
+        if 'tracemalloc' in self.kinds:
+            import tracemalloc
+            results['tracemalloc'] = {'peak': tracemalloc.get_traced_memory()[1],
+                                      'snapshot': tracemalloc.take_snapshot()}
+            if self.tracing:
+                tracemalloc.stop()
+        return(results)
+
+
+class _log_stream:
+    """ follows one COMETS log file while it is being appended to.
+
+    Each read() returns a DataFrame with all the rows of the cycles which
+    were completed since the previous read, or None. The rows of the most
+    recent cycle are held back until a later cycle appears (or final is
+    True), because COMETS may still be writing them. select() applies where
+    to them. """
+
+    def __init__(self, log : str, path : str, model_ids : list,
+                 where = None):
+        self.log = log
+        self.path = path
+        self.model_ids = model_ids
+        self.where = where
+        self.offset = 0
+        self.partial_line = b''
+        self.held_rows = None
+        self.chunks = []
+        self.parse_time = 0.
+
+    def read(self, final : bool = False):
+        new_rows = [self.held_rows]
+        started = time.perf_counter()
+        lines = self.__read_new_lines()
+        if len(lines) > 0:
+            new_rows.append(self.__parse(lines))
+        self.parse_time += time.perf_counter() - started
+        new_rows = [rows for rows in new_rows if rows is not None]
+        if len(new_rows) == 0:
+            return(None)
+        new_rows = pd.concat(new_rows, ignore_index = True)
+        self.held_rows = None
+        if not final and self.log != 'total_biomass':
+            last_cycle = new_rows['cycle'].max()
+            self.held_rows = new_rows.loc[new_rows['cycle'] == last_cycle]
+            new_rows = new_rows.loc[new_rows['cycle'] < last_cycle]
+            if new_rows.shape[0] == 0:
+                return(None)
+        return(new_rows)
+
+    def select(self, rows : pd.DataFrame) -> pd.DataFrame:
+        """ returns the rows returned by read() which where selects """
+        if self.where is None:
+            return(rows)
+        if self.log == 'total_biomass':
+            return(self.where.apply_total_biomass(rows, self.model_ids))
+        return(self.where.apply(rows).reset_index(drop = True))
+
+    def data(self) -> pd.DataFrame:
+        if len(self.chunks) > 1:
+            self.chunks = [pd.concat(self.chunks, ignore_index = True)]
+        return(self.chunks[0])
+
+    def __read_new_lines(self) -> list:
+        if not os.path.isfile(self.path):
+            return([])
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            new_bytes = f.read()
+        self.offset += len(new_bytes)
+        lines = (self.partial_line + new_bytes).split(b'\n')
+        self.partial_line = lines.pop()  # incomplete until it ends in \n
+        return([line.decode('ascii', 'ignore').replace(",", ".")  # commas as decimals
+                for line in lines if line.strip() != b''])
+
+    def __parse(self, lines : list) -> pd.DataFrame:
+        text = io.StringIO('\n'.join(lines))
+        if self.log == 'total_biomass':
+            return(parsers.read_total_biomass(text, self.model_ids, '.'))
+        elif self.log == 'biomass':
+            return(parsers.read_biomass(text, '.'))
+        return(parsers.read_media(text, '.'))
+
+
+def _drop_partial_line(path : str):
+    """ truncates a log after its last complete line, e.g. after COMETS
+    was killed while writing it """
+    if not os.path.isfile(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            found = f.read(position - start).rfind(b'\n')
+            if found != -1:
+                f.truncate(start + found + 1)
+                return
+            position = start
+        f.truncate(0)
+
+
+def _until_cycle(where, cycle : int):
+    """ returns a log_filter selecting the rows of where up to cycle """
+    where = parsers.log_filter() if where is None else copy.copy(where)
+    first, last = (0, cycle) if where.cycles is None else where.cycles
+    where.cycles = (first, min(last, cycle))
+    return(where)
+
+
+class _pending_log:
+    """ a log left by run(lazy = True) to be read on the first access of
+    one of the attributes names. read() returns their values. path is None
+    for the rows of a log streamed so far, which read() concatenates. """
+    def __init__(self, log : str, names : list, path : str, read,
+                 delete : bool):
+        self.log = log
+        self.names = names
+        self.path = path
+        self.read = read
+        self.delete = delete
+
+
+def _remove_files(paths : list):
+    """ deletes the files at paths which still exist. Called when a comets
+    object with logs left unread by run(lazy = True) is garbage collected,
+    or at exit. """
+    for path in paths:
+        if os.path.isfile(path):
+            os.remove(path)
+    del paths[:]
+
+
+def _lazy_result(name : str, doc : str) -> property:
+    """ returns the property of the comets result attribute name, which
+    reads its log on first access if run(lazy = True) left it unread """
+    def get(self):
+        if name in self.__dict__.get('_comets__pending', {}):
+            self._read_pending(name)
+        try:
+            return(self.__dict__[name])
+        except KeyError:
+            raise AttributeError("'comets' object has no attribute '" +
+                                 name + "'") from None
+
+    def set(self, value):
+        self.__dict__.get('_comets__pending', {}).pop(name, None)
+        self.__dict__[name] = value
+
+    def delete(self):
+        self.__dict__.get('_comets__pending', {}).pop(name, None)
+        self.__dict__.pop(name, None)
+    return(property(get, set, delete, doc))
 
 
 class comets:
@@ -46,11 +599,18 @@ class comets:
     generated output, which could include total_biomass, biomass,
     media, or fluxes, as set in the params object. std_out from the COMETS
     simulation is saved in the attribute run_output and can be useful to
-    examine to debug errors.
+    examine to debug errors. After run(lazy = True), the outputs other than
+    total_biomass are only read from their logs the first time they are
+    used.
 
     When creating a comets object, the optional relative_dir path is useful
     when one is to run multiple simulations simultaneously, otherwise
-    temporary files may overwrite each other.
+    temporary files may overwrite each other. To run many simulations in
+    parallel, see run_many(), which isolates each run automatically.
+
+    The COMETS version and java libraries found at COMETS_HOME are searched
+    for once per process. To also keep them across processes, set the
+    environmental variable COMETSPY_CLASSPATH_CACHE to a json file path.
 
     Parameters
     ----------
@@ -76,11 +636,22 @@ class comets:
     COMETS_HOME : str
         the directory where COMETS exists on the system
     VERSION : str
-        the version of comets, read from the files at COMETS_HOME
+        the version of comets, read from the files at COMETS_HOME, or "fake"
+        if the object was created with the fake backend
     classpath_pieces : dict
         classpath separated into library name (key) and location (value)
     JAVA_CLASSPATH : str
         a generated (overwritable) string containing the java classpath
+    java_options : list(str)
+        options given to java before the classpath, e.g. ["-Xmx4g"]. See
+        set_java_options()
+    cds_archive : str
+        path of a class data sharing archive used to start java faster, or
+        None. See set_java_options()
+    backend : str
+        what runs the simulations, "java" or "fake". See set_backend()
+    backend_options : list(str)
+        options given to the fake backend. See set_backend()
     run_output : str
         generated object containing text from COMETS sim's std_out
     run_errors : str
@@ -99,6 +670,31 @@ class comets:
         generated object containing each species' spatial-explicit fluxes
     genotypes : pandas.DataFrame
         generated object containing genotypes if an evolution sim was run
+    media_by_cycle : pandas.DataFrame
+        the media log aggregated over all locations, with columns
+        metabolite, cycle and conc_mmol, after run(aggregate = ...)
+    fluxes_by_cycle : dict{model_id : pandas.DataFrame}
+        each species' fluxes aggregated over all locations, with columns
+        cycle and one per reaction, after run(aggregate = ...)
+    aggregated : dict
+        the aggregate argument of the last run, e.g. {"media": "sum"}
+    timings : dict
+        seconds spent by the last run() writing input files
+        ("write_input_files"), from starting COMETS until its first output
+        ("startup") and until it ended ("simulation"), reading each log
+        ("parse", a dict by log), in the cache ("cache"), deleting files
+        ("cleanup") and in total ("total")
+    cycle_times : pandas.DataFrame
+        the wall time of each cycle of the last run, measured from COMETS'
+        std_out, and the cycle time COMETS reported if the showCycleTime
+        parameter was on
+    profile : dict
+        the results of run(profile = ...)
+    stopped_at : int
+        the cycle at which the last run was stopped by one of its stop_when
+        conditions, or None if it ran to the end
+    stop_reason : str
+        the stop_when condition which stopped the last run, or None
 
     Examples
     --------
@@ -119,6 +715,20 @@ class comets:
 
     """
 
+    total_biomass = _lazy_result('total_biomass', "the total biomass log")
+    biomass = _lazy_result('biomass', "the spatial biomass log")
+    media = _lazy_result('media', "the spatial media log")
+    fluxes = _lazy_result('fluxes', "the flux log, as written by COMETS")
+    fluxes_by_species = _lazy_result('fluxes_by_species',
+                                     "the flux log of each species, by model id")
+    velocity = _lazy_result('velocity', "the spatial velocity log")
+    specific_media = _lazy_result('specific_media', "the specific media log")
+    genotypes = _lazy_result('genotypes', "the genotypes of an evolution run")
+    media_by_cycle = _lazy_result('media_by_cycle',
+                                  "the media log aggregated over locations")
+    fluxes_by_cycle = _lazy_result('fluxes_by_cycle',
+                                   "the flux log of each species aggregated over locations")
+
     def __init__(self, layout,
                  parameters, relative_dir : str =''):
 
@@ -135,20 +745,31 @@ class comets:
                     self.GUROBI_HOME = os.environ['COMETS_GUROBI_HOME']
                 except:
                     self.GUROBI_HOME = ''
-                    print("could not find environmental variable GUROBI_COMETS_HOME or GUROBI_HOME or COMETS_GUROBI_HOME")
-                    print("COMETS will not work with GUROBI until this is solved. ")
-                    print("Here is a solution:")
-                    print("    1. import os and set os.environ['GUROBI_HOME'] then try to make a comets object again")
-                    print("       e.g.   import os")
-                    print("              os.environ['GUROBI_HOME'] = 'C:\\\\gurobi902\\\\win64'")
-        self.COMETS_HOME = os.environ['COMETS_HOME']
-        self.VERSION = os.path.splitext(os.listdir(os.environ['COMETS_HOME'] +
-                                                   '/bin')[0])[0]
-
-        # set default classpaths, which users may change
-        self.__build_default_classpath_pieces()
-        self.__build_and_set_classpath()
-        self.__test_classpath_pieces()
+                    if os.environ.get('COMETSPY_BACKEND', 'java') != 'fake':
+                        print("could not find environmental variable GUROBI_COMETS_HOME or GUROBI_HOME or COMETS_GUROBI_HOME")
+                        print("COMETS will not work with GUROBI until this is solved. ")
+                        print("Here is a solution:")
+                        print("    1. import os and set os.environ['GUROBI_HOME'] then try to make a comets object again")
+                        print("       e.g.   import os")
+                        print("              os.environ['GUROBI_HOME'] = 'C:\\\\gurobi902\\\\win64'")
+
+        # java launch options, which users may change
+        self.java_options = []
+        self.cds_archive = None
+
+        self.backend = 'java'
+        self.backend_options = []
+        self.set_backend(os.environ.get('COMETSPY_BACKEND', 'java'))
+
+        # model files taken from a model_store by run(), by model id
+        self.__model_store = None
+        self.__model_files = None
+
+        # logs left unread by run(lazy = True), by attribute, and the paths
+        # of those to delete once read or when this object is collected
+        self.__pending = {}
+        self.__unread_files = []
+        self.__unread_finalizer = None
 
         # check to see if user has the libraries where expected
 
@@ -176,72 +797,7 @@ class comets:
         self.classpath_pieces = {}
         self.classpath_pieces['gurobi'] = (self.GUROBI_HOME +
                                            '/lib/gurobi.jar')
-	
-        self.classpath_pieces['or_tools_java'] = (self.COMETS_HOME +
-                                           '/lib/or-tools/9.4.1874/' + 'ortools-java-9.4.1874.jar')
-
-        self.classpath_pieces['or_tools_linux'] = (self.COMETS_HOME +
-                                           '/lib/or-tools/9.4.1874/' + 'ortools-linux-x86-64-9.4.1874.jar')
-
-        self.classpath_pieces['junit'] = glob.glob(self.COMETS_HOME +
-                                                   '/lib/junit' + '/**/*junit*',
-                                                   recursive=True)[0]
-        self.classpath_pieces['hamcrest'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/*hamcrest*',
-                                                      recursive=True)[0]
-
-        self.classpath_pieces['jogl_all'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/jogl-all.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['gluegen_rt'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/gluegen-rt.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['gluegen'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/gluegen.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['gluegen_rt_natives'] = glob.glob(
-            self.COMETS_HOME + '/lib' + '/**/gluegen-rt-natives-linux-amd64.jar',
-            recursive=True)[0]
-        self.classpath_pieces['jogl_all_natives'] = glob.glob(
-            self.COMETS_HOME + '/lib' + '/**/jogl-all-natives-linux-amd64.jar',
-            recursive=True)[0]
-
-        self.classpath_pieces['jmatio'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/jmatio.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['jmat'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/jmatio.jar',
-                                                      recursive=True)[0]
-
-        self.classpath_pieces['concurrent'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/concurrent.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['colt'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/colt.jar',
-                                                      recursive=True)[0]
-
-        __lang3 = glob.glob(self.COMETS_HOME +
-                            '/lib' + '/**/commons-lang3*jar',
-                            recursive=True)
-        self.classpath_pieces['lang3'] = [i for i in __lang3
-                                          if 'test' not in i
-                                          and 'sources' not in i][0]
-
-        __math3 = glob.glob(self.COMETS_HOME +
-                            '/lib' + '/**/commons-math3*jar',
-                            recursive=True)
-        self.classpath_pieces['math3'] = [i for i in __math3
-                                          if 'test' not in i
-                                          and 'sources' not in i
-                                          and 'tools' not in i
-                                          and 'javadoc' not in i][0]
-
-        self.classpath_pieces['jdistlib'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/*jdistlib*',
-                                                      recursive=True)[0]
-        self.classpath_pieces['bin'] = (self.COMETS_HOME +
-                                        '/bin/' + self.VERSION + '.jar')
-
+        self.classpath_pieces.update(self.__comets_pieces)
 
     def __build_and_set_classpath(self):
         ''' builds the JAVA_CLASSPATH from the pieces currently in
@@ -326,7 +882,174 @@ class comets:
         self.classpath_pieces[libraryname] = path
         self.__build_and_set_classpath()
 
-    def run(self, delete_files : bool = True, progress : bool = False):
+    def set_java_options(self, heap : str = None, gc : str = None,
+                         tiered_stop_at_level : int = None,
+                         cds_archive : str = None, options : list = None):
+        """
+        sets how the java virtual machine running COMETS is started
+
+        Startup of the JVM and loading of the COMETS classes can take most
+        of the time of short simulations. A class data sharing (AppCDS)
+        archive stores the loaded classes of a first run, and later runs
+        map it instead of loading the classes again. Stopping tiered
+        compilation early (tiered_stop_at_level = 1) and the serial garbage
+        collector also start faster. Like set_classpath(), this does not
+        work on Windows, where COMETS is started by comets_scr.
+
+        Parameters
+        ----------
+
+        heap : str, optional
+            the maximum heap size, e.g. "4g" (java's -Xmx)
+        gc : str, optional
+            the garbage collector: "serial", "parallel", "g1" or "z"
+        tiered_stop_at_level : int, optional
+            the highest tier of the JIT compiler, 1 to 4. 1 starts fastest,
+            but long simulations run faster with the default 4.
+        cds_archive : str, optional
+            path of a class data sharing archive. If the file does not
+            exist, the next run creates it (this needs java 13 or later;
+            older java ignores the option). Delete the file after changing
+            COMETS or the classpath.
+        options : list(str), optional
+            any further java options, e.g. ["-XX:+UseStringDeduplication"]
+
+        Examples
+        --------
+
+        >>> sim = c.comets(layout, params)
+        >>> sim.set_java_options(heap = "2g", gc = "serial",
+        >>>                      tiered_stop_at_level = 1,
+        >>>                      cds_archive = "/scratch/comets.jsa")
+        >>> sim.run()
+
+        """
+        gcs = {'serial': '-XX:+UseSerialGC', 'parallel': '-XX:+UseParallelGC',
+               'g1': '-XX:+UseG1GC', 'z': '-XX:+UseZGC'}
+        java_options = []
+        if heap is not None:
+            java_options.append('-Xmx' + str(heap))
+        if gc is not None:
+            if gc not in gcs:
+                raise ValueError("gc must be one of " + ", ".join(gcs.keys()))
+            java_options.append(gcs[gc])
+        if tiered_stop_at_level is not None:
+            java_options.append('-XX:TieredStopAtLevel=' +
+                                str(int(tiered_stop_at_level)))
+        if options is not None:
+            java_options += list(options)
+        self.java_options = java_options
+        self.cds_archive = cds_archive
+
+    def set_backend(self, backend : str = 'java', cycle_delay : float = None,
+                    fill : float = None):
+        """
+        sets what runs the simulations of this comets object
+
+        "java" runs COMETS, found at COMETS_HOME. "fake" runs
+        cometspy/fake_comets.py with the python running cometspy instead. It
+        reads the same input files and writes logs and std_out in the same
+        formats, with synthetic values, so that cometspy can be tested and
+        benchmarked on machines without java, gurobi or COMETS. The size of
+        its logs follows the layout and params as for COMETS. Its results
+        are not a simulation of anything.
+
+        The default backend of new comets objects is "java", or the value of
+        the environmental variable COMETSPY_BACKEND. With COMETSPY_BACKEND
+        set to "fake", COMETS_HOME need not be set.
+
+        Parameters
+        ----------
+
+        backend : str, optional
+            "java" or "fake". The default is "java".
+        cycle_delay : float, optional
+            for "fake", seconds to wait every cycle, to imitate slow
+            simulations. The default is not to wait.
+        fill : float, optional
+            for "fake", the fraction of locations given biomass at the
+            start in addition to the initial population, to write dense
+            spatial logs. The default is none.
+
+        Examples
+        --------
+
+        >>> sim = c.comets(layout, params)
+        >>> sim.set_backend("fake", fill = 0.5)
+        >>> sim.run()
+        >>> sim.biomass.head()
+
+        """
+        if backend not in ('java', 'fake'):
+            raise ValueError("backend must be 'java' or 'fake'")
+        if backend == 'fake' and (cycle_delay is not None or fill is not None):
+            self.backend_options = []
+            if cycle_delay is not None:
+                self.backend_options += ['--cycle-delay', str(float(cycle_delay))]
+            if fill is not None:
+                self.backend_options += ['--fill', str(float(fill))]
+        if getattr(self, 'VERSION', 'fake') == 'fake':
+            if backend == 'java':
+                self.COMETS_HOME = os.environ['COMETS_HOME']
+                self.VERSION, self.__comets_pieces = _discover_comets(self.COMETS_HOME)
+            else:
+                self.COMETS_HOME = os.environ.get('COMETS_HOME', '')
+                self.VERSION, self.__comets_pieces = 'fake', {}
+
+            # set default classpaths, which users may change
+            self.__build_default_classpath_pieces()
+            self.__build_and_set_classpath()
+        if backend == 'java':
+            self.__test_classpath_pieces()
+        self.backend = backend
+
+    def _java_options(self, extra_options : list = ()) -> tuple:
+        """ returns the java options of a run, and the path of a lock file
+        taken if this run creates the class data sharing archive (see
+        _release_cds_lock()). Only one run at a time creates it; others run
+        without it in the meantime. """
+        java_options = list(self.java_options) + list(extra_options)
+        if self.backend == 'fake':
+            return((java_options, None))
+        if platform.system() == 'Windows':
+            if java_options or self.cds_archive is not None:
+                print('Warning: java options are ignored on Windows, where ' +
+                      'COMETS is started by comets_scr')
+            return((java_options, None))
+        lock = None
+        if self.cds_archive is not None:
+            if os.path.isfile(self.cds_archive):
+                java_options = ['-XX:SharedArchiveFile=' + self.cds_archive,
+                                '-Xshare:auto'] + java_options
+            else:
+                lock = self.cds_archive + '.lock'
+                try:
+                    # a lock left behind by a killed run expires after 10 min
+                    if time.time() - os.path.getmtime(lock) > 600:
+                        os.remove(lock)
+                except OSError:
+                    pass
+                try:
+                    os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    java_options = ['-XX:ArchiveClassesAtExit=' +
+                                    self.cds_archive] + java_options
+                except OSError:
+                    lock = None  # another run is creating the archive
+            # older java would refuse to start on the archive options
+            java_options = ['-XX:+IgnoreUnrecognizedVMOptions'] + java_options
+        return((java_options, lock))
+
+    def _release_cds_lock(self, lock : str):
+        if lock is not None and os.path.isfile(lock):
+            os.remove(lock)
+
+    def run(self, delete_files : bool = True, progress : bool = False,
+            stream : bool = False, callbacks : list = None,
+            poll_interval : float = 1., cache = None, where = None,
+            raw_fluxes : bool = True, timeout : float = None,
+            max_heap : str = None, max_log_size : int = None,
+            profile = None, stop_when : list = None, model_store = None,
+            lazy : bool = False, aggregate : dict = None):
         """
         run a COMETS simulation
 
@@ -351,6 +1074,114 @@ class comets:
         progress : bool, optional
             Whether to display a progress bar via tqdm. The default is True.
 
+        stream : bool, optional
+            Whether to read the total biomass, biomass and media logs while
+            COMETS is still writing them. total_biomass, biomass and media
+            then grow as the simulation runs. The default is False.
+
+        callbacks : list(callable), optional
+            functions called as callback(sim, log, new_rows) each time new
+            complete cycles are read from a log while streaming, where log
+            is one of "total_biomass", "biomass" or "media" and new_rows is
+            a pandas.DataFrame. Giving callbacks implies stream = True.
+
+        poll_interval : float, optional
+            seconds between reads of the logs while streaming. The default
+            is 1.
+
+        cache : cometspy.cache.result_cache, optional
+            if given, results of a simulation with identical layout, params,
+            models, COMETS version, where, raw_fluxes and aggregate are
+            taken from this cache instead of running COMETS, and new results
+            are stored in it. It is not used with stop_when, since a
+            cached run did not check the conditions.
+
+        where : cometspy.parsers.log_filter, optional
+            if given, only the log rows (and flux reactions) selected by it
+            are kept. Logs are then read in chunks and filtered as they are
+            read, so the full logs never need to fit in memory. It can also
+            keep only every few cycles (cycle_step) and aggregate blocks of
+            locations (block), to load coarse snapshots of large grids.
+
+        raw_fluxes : bool, optional
+            Whether to keep the flux log as read, in the fluxes attribute,
+            where every row is padded to the largest model. With False, the
+            flux log is split while it is read straight into
+            fluxes_by_species, whose tables are sized to each model, and
+            fluxes is None. This saves much memory in communities of models
+            of very different sizes. The default is True.
+
+        timeout : float, optional
+            the maximum number of seconds COMETS may run. The default is no
+            limit.
+
+        max_heap : str, optional
+            the maximum heap size of the java virtual machine, e.g. "4g" or
+            "512m" (passed to java as -Xmx). The default is java's own.
+
+        max_log_size : int, optional
+            the maximum number of bytes all of the logs together may take
+            on disk. The default is no limit.
+
+        profile : str or list(str), optional
+            "cprofile" and/or "tracemalloc", to profile the python side of
+            the run (writing input files and reading logs, but not the time
+            waiting for COMETS). The results are put in the profile
+            attribute, as a pstats.Stats under "cprofile" and as the peak
+            traced memory in bytes and a tracemalloc snapshot under
+            "tracemalloc". If tracemalloc was already tracing, the peak
+            before python 3.9 is that since it started. The default is not
+            to profile.
+
+        stop_when : list(cometspy.stopping.stop_condition), optional
+            conditions on which to stop COMETS before maxCycles, e.g. a
+            steady state of total biomass. The logs they watch are read
+            while COMETS runs, and COMETS is stopped once one of them is
+            met. The results are then cut at the cycle at which it was met,
+            which is put in the stopped_at attribute, with the condition in
+            stop_reason; both are None if COMETS ran to the end. Logs which
+            are not streamed are read once COMETS has stopped, as usual
+            (e.g. with where or aggregate). Conditions see every row of the
+            logs they watch, whatever where keeps. The cache is not used.
+            The default is to run to the end.
+
+        model_store : cometspy.model_store.model_store, optional
+            if given, the model files are not written into working_dir but
+            taken from this store, where each distinct model is written only
+            once for all simulations sharing it. The files are released
+            along with the other input files, so with delete_files = False
+            they stay marked as used. The default is to write them into
+            working_dir.
+
+        lazy : bool, optional
+            Whether to leave the logs other than total biomass unread until
+            the corresponding attribute (biomass, media, fluxes,
+            fluxes_by_species, velocity, specific_media or genotypes) is
+            first used. Their files are kept until then; with delete_files,
+            each is deleted once read, and unread ones when this object is
+            garbage collected, at exit, or at the next run. read_logs()
+            reads them all. A cache reads them all to store them. The
+            default is False, to read every log before returning.
+
+        aggregate : dict, optional
+            logs to read only as a sum, mean or max over all locations at
+            each cycle, by log: "media" and/or "fluxes" to "sum", "mean"
+            or "max". They are reduced while being read, so the spatial
+            tables are never built; the results are put in media_by_cycle
+            and fluxes_by_cycle, and media, fluxes and fluxes_by_species
+            are None. Means are over every location of the grid within
+            the x and y of where, whose blocks are not used. A media log
+            read while streaming is kept in media too. The default is
+            to read the spatial logs.
+
+        Raises
+        ------
+
+        RunLimitExceeded
+            if timeout, max_heap or max_log_size was exceeded. COMETS (and
+            any process it started) has been killed, and, if delete_files,
+            its input files and partial logs deleted.
+
         Examples
         --------
 
@@ -358,210 +1189,667 @@ class comets:
         >>> sim.run(delete_files = True)
         >>> print(sim.run_output)
         >>> print(sim.total_biomass)
+        >>> # watch a long simulation as it runs
+        >>> def report(sim, log, new_rows):
+        >>>     if log == "total_biomass":
+        >>>         print(new_rows.tail(1))
+        >>> sim.run(callbacks = [report], poll_interval = 10.)
+        >>> # give up on runaway simulations
+        >>> sim.run(timeout = 3600, max_heap = "4g", max_log_size = 10 * 2**30)
+        >>> # stop once nothing changes any more
+        >>> from cometspy.stopping import steady_state
+        >>> sim.run(stop_when = [steady_state(window = 100, tolerance = 1e-4)])
+        >>> # only read the logs which are used
+        >>> sim.run(lazy = True)
+        >>> sim.total_biomass.plot(x = "cycle")  # the media log is never read
+        >>> # only whole-plate totals of a large grid
+        >>> sim.run(aggregate = {"media": "sum", "fluxes": "sum"})
+        >>> sim.get_metabolite_time_series()
+        >>> # write the models of many simulations only once
+        >>> from cometspy.model_store import model_store
+        >>> store = model_store("/scratch/comets_models")
+        >>> results = run_many(sims, run_kwargs = {"model_store": store})
+        >>> # where did the time go?
+        >>> sim.timings
+        >>> sim.cycle_times.plot(x = "cycle", y = "wall_time")
 
         """
         print('\nRunning COMETS simulation ...')
         #print('\nDebug Here ...')
 
-        # If evolution is true, write the biomass but not the total biomass log
-        if self.parameters.all_params['evolution']:
-            self.parameters.all_params['writeTotalBiomassLog'] = False
-            self.parameters.all_params['writeBiomassLog'] = True
-
-        to_append = '_' + hex(id(self))
-        # write the files for comets in working_dir
-        c_global = self.working_dir + '.current_global' + to_append
-        c_package = self.working_dir + '.current_package' + to_append
-        c_script = self.working_dir + '.current_script' + to_append
-
-        self.layout.write_necessary_files(self.working_dir, to_append)
-
-        # self.layout.write_layout(self.working_dir + '.current_layout')
-        self.parameters.write_params(c_global, c_package)
-
+        run_started = time.perf_counter()
+        self.__reset_run_state()
+        stop_when = [] if stop_when is None else list(stop_when)
+        for condition in stop_when:
+            flag = _STREAMABLE_LOGS[condition.log][0]
+            if not self.parameters.all_params[flag]:
+                raise ValueError("the stop condition '" + str(condition) +
+                                 "' needs the " + condition.log + " log. " +
+                                 "set " + flag + " to True")
+            condition.validate(self)
+            condition.reset()
+        aggregate = {} if aggregate is None else dict(aggregate)
+        for log, stat in aggregate.items():
+            if log not in ('media', 'fluxes'):
+                raise ValueError("only the media and fluxes logs can be aggregated")
+            if stat not in parsers.STATS:
+                raise ValueError("the " + log + " log can be aggregated by " +
+                                 ", ".join(parsers.STATS))
+        self.aggregated = aggregate
+        if where is not None and where.block is not None and where.grid is None:
+            # so that the means of blocks at the edges are over the grid
+            where = copy.copy(where)
+            where.grid = tuple(self.layout.grid)
+        profiler = None if profile is None else _python_profiler(profile)
+
+        with _timed(self.timings, 'write_input_files'):
+            script_lines = self._write_input_files(model_store)
+
+        if stop_when:
+            # the cached results were not checked against the conditions
+            cache = None
+        if cache is not None:
+            with _timed(self.timings, 'cache'):
+                read_options = {}
+                if where is not None:
+                    read_options['where'] = where
+                if not raw_fluxes:
+                    read_options['raw_fluxes'] = False
+                if aggregate:
+                    read_options['aggregate'] = aggregate
+                cache_key = cache.key(self, read_options)
+                found = cache.load(cache_key, self)
+            if found:
+                if delete_files:
+                    self._delete_input_files()
+                if profiler is not None:
+                    self.profile = profiler.stop()
+                self.timings['total'] = time.perf_counter() - run_started
+                print('Done! (results taken from cache)')
+                return
+
+        c_script = self.working_dir + '.current_script' + '_' + hex(id(self))
         if os.path.isfile(c_script):
             os.remove(c_script)
         with open(c_script, 'a') as f:
-            f.write('load_comets_parameters ' + '.current_global' + to_append + '\n')
-            f.writelines('load_package_parameters ' + '.current_package' + to_append + '\n')
-            f.writelines('load_layout ' + '.current_layout' + to_append)
+            f.write('\n'.join(script_lines))
+
+        java_options, cds_lock = self._java_options(
+            [] if max_heap is None else ['-Xmx' + str(max_heap)])
+        self.cmd = self._build_command_args(c_script, java_options)
+
+        if profiler is not None:
+            profiler.pause()
+        spawned = time.monotonic()
+        process = _start_process(self.cmd, self.working_dir)
+        monitor = None
+        if timeout is not None or max_log_size is not None:
+            monitor = _run_monitor(process, timeout, max_log_size,
+                                   self._log_file_paths())
+        try:
+            streamed, reader = self.__wait_for_process(
+                process, stream, callbacks, poll_interval, progress, where,
+                stop_when)
+        except BaseException:
+            # e.g. KeyboardInterrupt: do not leave COMETS running
+            _kill_process_group(process)
+            raise
+        finally:
+            _RUNNING_PROCESSES.discard(process)
+            self._release_cds_lock(cds_lock)
+            if monitor is not None:
+                monitor.stop()
+        if profiler is not None:
+            profiler.resume()
+
+        self.timings['startup'] = (None if reader.first_line is None
+                                   else reader.first_line - spawned)
+        self.timings['simulation'] = reader.ended - spawned
+        self.cycle_times = reader.cycle_times()
 
-        if platform.system() == 'Windows':
-            self.cmd = ('\"' + self.COMETS_HOME +
-                        '\\comets_scr' + '\" \"' +
-                        c_script +
-                        '\"')
+        if self.run_errors is not None:
+            self.run_errors = self.run_errors.decode('ascii','ignore')
+        else:
+            self.run_errors = "STDERR empty."
+
+        exceeded = None if monitor is None else monitor.exceeded
+        if exceeded is None and max_heap is not None and \
+                'java.lang.OutOfMemoryError' in self.run_output:
+            exceeded = ('max_heap', max_heap, None)
+        if exceeded is not None:
+            if delete_files:
+                self._delete_input_files()
+                for path in self._log_file_paths() + [
+                        c_script, self.working_dir + 'COMETS_manifest.txt']:
+                    if os.path.isfile(path):
+                        os.remove(path)
+            raise RunLimitExceeded(*exceeded, run_output = self.run_output)
+
+        if self.stopped_at is None:
+            # Raise RuntimeError if simulation had nonzero exit
+            self._analyze_run_output()
         else:
-            # simulate
-            self.cmd = ('java -classpath ' + self.JAVA_CLASSPATH +
-                        # ' -Djava.library.path=' + self.D_JAVA_LIB_PATH +
-                        ' edu.bu.segrelab.comets.Comets -loader' +
-                        ' edu.bu.segrelab.comets.fba.FBACometsLoader' +
-                        ' -script "' + c_script + '"')
-
-        process = sp.Popen(self.cmd,
-                     cwd = self.working_dir,
-                     shell=True, stdout=sp.PIPE, stderr=sp.STDOUT)
-
-        # progress bar
+            # COMETS was killed while writing: drop the last, partial, line
+            # of each log and keep only the cycles up to the stop
+            for path in self._log_file_paths():
+                _drop_partial_line(path)
+            # streamed logs are already filtered and down-sampled by where
+            for log in streamed:
+                setattr(self, log, _until_cycle(None, self.stopped_at).apply(
+                    getattr(self, log)).reset_index(drop = True))
+            where = _until_cycle(where, self.stopped_at)
+
+        self.timings['parse'].update(self._read_output(
+            delete_files, skip = streamed, where = where,
+            raw_fluxes = raw_fluxes, lazy = lazy, aggregate = aggregate))
+        if cache is not None:
+            with _timed(self.timings, 'cache'):
+                cache.store(cache_key, self)
+
+        # clean workspace
+        with _timed(self.timings, 'cleanup'):
+            if delete_files:
+                self._delete_input_files()
+                os.remove(c_script)
+                if os.path.isfile(self.working_dir + 'COMETS_manifest.txt'):  # not written if stopped early
+                    os.remove(self.working_dir + 'COMETS_manifest.txt')  # todo: stop writing this in java
+        if profiler is not None:
+            self.profile = profiler.stop()
+        self.timings['total'] = time.perf_counter() - run_started
+        print('Done!')
+
+    def __wait_for_process(self, process, stream, callbacks, poll_interval,
+                           progress, where, stop_when = ()):
+        """ collects the std_out of COMETS until it ends, streaming logs
+        and showing progress if asked by run(). Returns the names of the
+        logs which were streamed, and the _stdout_reader. """
+        prog = None
         if progress:
             from tqdm.auto import tqdm # auto-detects whether to use terminal progress bar or notebook-style one
-            
             prog = tqdm(range(self.parameters.all_params["maxCycles"]),
                         desc = "Progress",
                         unit = "cycle")
+        reader = _stdout_reader(process, prog)
 
-            self.run_output = ""
-            
-            with process.stdout:
-                for line in iter(process.stdout.readline, b''):
-                    line = line.decode("ascii")
-                    self.run_output += line
-                    if(line.strip().startswith("Cycle ") & (line.strip() != "Cycle 1")):
-                        prog.update(1)
+        streamed = []
+        if stream or callbacks or stop_when:
+            streamed = self.__stream_logs(process, reader, callbacks or [],
+                                          poll_interval, where, stop_when,
+                                          keep = bool(stream or callbacks))
+        else:
+            reader.read()
             process.wait()
 
-            self.run_errors = process.stderr
-        
-        else:
-            self.run_output, self.run_errors = process.communicate()
-            self.run_output = self.run_output.decode('ascii','ignore')
+        self.run_output = reader.output()
+        self.run_errors = None
+        return(streamed, reader)
+
+    def __stream_logs(self, process, reader, callbacks, poll_interval,
+                      where = None, stop_when = (), keep = True):
+        """ reads the total biomass, biomass and media logs while COMETS
+        appends to them, until process ends. std_out is collected by reader
+        in a background thread. Once one of the stop conditions stop_when is
+        met, its cycle and reason are saved in stopped_at and stop_reason
+        and process is killed. Without keep, only the logs watched by
+        stop_when are read, and only to check them. Returns the names of the
+        logs that were kept, which are then complete and need not be read
+        again. """
+        watched = set([condition.log for condition in stop_when])
+        streams = []
+        for log, (flag, name) in _STREAMABLE_LOGS.items():
+            if self.parameters.all_params[flag] and (keep or log in watched):
+                streams.append(_log_stream(log,
+                    self.working_dir + self.parameters.all_params[name],
+                    self.layout.get_model_ids(), where))
+
+        reader_thread = threading.Thread(target = reader.read, daemon = True)
+        reader_thread.start()
+
+        def poll(final):
+            for log_stream in streams:
+                all_rows = log_stream.read(final)
+                if all_rows is not None:
+                    if keep:
+                        new_rows = log_stream.select(all_rows)
+                        log_stream.chunks.append(new_rows)
+                        # concatenated only if used before the end, as
+                        # doing so at every poll grows with the square
+                        # of the log
+                        self.__pending[log_stream.log] = _pending_log(
+                            log_stream.log, [log_stream.log], None,
+                            lambda log_stream = log_stream: [log_stream.data()],
+                            False)
+                        for callback in callbacks:
+                            callback(self, log_stream.log, new_rows)
+                    for condition in stop_when:
+                        if self.stopped_at is not None or final:
+                            break
+                        if condition.log != log_stream.log:
+                            continue
+                        # conditions see every row, whatever where keeps
+                        cycle = condition.check(self, all_rows)
+                        if cycle is not None:
+                            self.stopped_at = cycle
+                            self.stop_reason = str(condition)
+                            _kill_process_group(process)
+
+        while process.poll() is None:
+            time.sleep(poll_interval)
+            poll(final = False)
+        reader_thread.join()
+        poll(final = True)
+        for log_stream in streams:
+            if keep and len(log_stream.chunks) > 0:
+                setattr(self, log_stream.log, log_stream.data())
+
+        self.timings['parse'].update({log_stream.log: log_stream.parse_time
+                                      for log_stream in streams})
+        return([log_stream.log for log_stream in streams
+                if len(log_stream.chunks) > 0])
+
+    async def run_async(self, delete_files : bool = True):
+        """
+        run a COMETS simulation as an asyncio coroutine
+
+        This does the same as run(), but COMETS is started with
+        asyncio.create_subprocess_exec and its std_out is read without
+        blocking the event loop. Writing the input files and reading the
+        logs happen in the loop's default executor. Many simulations can
+        therefore be awaited concurrently from a single process, as long as
+        each comets object has its own working_dir (or relative_dir).
+
+        Only delete_files is taken; the other options of run() (where,
+        cache, timeout, stream, stop_when, lazy, aggregate, ...) are not
+        supported. To use them from a coroutine, await run() in an
+        executor instead, e.g. loop.run_in_executor(None, sim.run). Like
+        run(), it replaces the results and timings of a previous run, and
+        if it is cancelled or fails while COMETS runs, COMETS is killed.
 
-        if self.run_errors is not None:
-            self.run_errors = self.run_errors.decode('ascii','ignore')
-        else:
-            self.run_errors = "STDERR empty."
+        Parameters
+        ----------
+
+        delete_files : bool, optional
+            Whether to delete simulation and log files. The default is True.
+
+        Returns
+        -------
+
+        comets
+            this comets object, now holding the simulation outputs
+
+        Examples
+        --------
+
+        >>> import asyncio
+        >>> sims = [c.comets(l, params, relative_dir = str(i) + '/')
+        >>>         for i, l in enumerate(layouts)]
+        >>> async def main():
+        >>>     return await asyncio.gather(*[s.run_async() for s in sims])
+        >>> sims = asyncio.run(main())
+        >>> print(sims[0].total_biomass)
+
+        """
+        loop = asyncio.get_running_loop()
+        print('\nRunning COMETS simulation ...')
+
+        run_started = time.perf_counter()
+        self.__reset_run_state()
+        self.aggregated = {}
+        self.cycle_times = None
+        with _timed(self.timings, 'write_input_files'):
+            script_lines = await loop.run_in_executor(None, self._write_input_files)
+        c_script = self.working_dir + '.current_script' + '_' + hex(id(self))
+        with open(c_script, 'w') as f:
+            f.write('\n'.join(script_lines))
+
+        java_options, cds_lock = self._java_options()
+        self.cmd = self._build_command_args(c_script, java_options)
+        process = None
+        spawned = time.monotonic()
+        try:
+            # in its own process group, like run(), so it can be killed
+            # along with anything it starts
+            process = await asyncio.create_subprocess_exec(
+                *self.cmd, cwd = self.working_dir,
+                stdout = asyncio.subprocess.PIPE, stderr = asyncio.subprocess.STDOUT,
+                start_new_session = platform.system() != 'Windows')
+            _RUNNING_PROCESSES.add(process)
+
+            output = []
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                output.append(line)
+            await process.wait()
+        except BaseException:
+            # e.g. cancelled by asyncio.wait_for: do not leave COMETS running
+            if process is not None:
+                _kill_process_group(process)
+                await process.wait()  # reap it while the loop runs
+            raise
+        finally:
+            _RUNNING_PROCESSES.discard(process)
+            self._release_cds_lock(cds_lock)
+        self.timings['simulation'] = time.monotonic() - spawned
+        self.run_output = b''.join(output).decode('ascii', 'ignore')
+        self.run_errors = "STDERR empty."
 
         # Raise RuntimeError if simulation had nonzero exit
-        self.__analyze_run_output()
+        self._analyze_run_output()
+
+        self.timings['parse'].update(await loop.run_in_executor(
+            None, self._read_output, delete_files))
+
+        # clean workspace
+        if delete_files:
+            self._delete_input_files()
+            os.remove(c_script)
+            if os.path.isfile(self.working_dir + 'COMETS_manifest.txt'):
+                os.remove(self.working_dir + 'COMETS_manifest.txt')
+        self.timings['total'] = time.perf_counter() - run_started
+        print('Done!')
+        return(self)
+
+    def _write_input_files(self, model_store = None) -> list:
+        """ writes the layout, model and params files needed by COMETS into
+        working_dir, and returns the script lines which load them. With a
+        model_store, the model files are taken from it instead. """
+        # If evolution is true, write the biomass but not the total biomass log
+        if self.parameters.all_params['evolution']:
+            self.parameters.all_params['writeTotalBiomassLog'] = False
+            self.parameters.all_params['writeBiomassLog'] = True
+
+        to_append = '_' + hex(id(self))
+        # write the files for comets in working_dir
+        c_global = self.working_dir + '.current_global' + to_append
+        c_package = self.working_dir + '.current_package' + to_append
 
+        self.__model_store = model_store
+        self.__model_files = None
+        if model_store is not None:
+            from cometspy.model_store import owner_name
+            owner = owner_name(self)
+            self.__model_files = {m.id: model_store.acquire(m, owner)
+                                  for m in self.layout.models}
+        self.layout.write_necessary_files(self.working_dir, to_append,
+                                          self.__model_files)
+
+        # self.layout.write_layout(self.working_dir + '.current_layout')
+        self.parameters.write_params(c_global, c_package)
+
+        return(['load_comets_parameters ' + '.current_global' + to_append,
+                'load_package_parameters ' + '.current_package' + to_append,
+                'load_layout ' + '.current_layout' + to_append])
+
+    def _build_command_args(self, c_script : str,
+                            java_options : list = ()) -> list:
+        """ returns the argument list which runs COMETS on the given script,
+        for launching COMETS without a shell. java_options (e.g. -Xmx4g)
+        are passed to java; they cannot be on Windows. The fake backend
+        (see set_backend()) ignores them. """
+        if self.backend == 'fake':
+            return([sys.executable,
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'fake_comets.py'),
+                    '-script', c_script] + self.backend_options)
+        if platform.system() == 'Windows':
+            return([self.COMETS_HOME + '\\comets_scr', c_script])
+        return(['java'] + list(java_options) +
+               ['-classpath', self.JAVA_CLASSPATH,
+                'edu.bu.segrelab.comets.Comets',
+                '-loader', 'edu.bu.segrelab.comets.fba.FBACometsLoader',
+                '-script', c_script])
+
+    def _input_file_paths(self) -> list:
+        """ returns the paths of the params, layout and model files written
+        by _write_input_files() """
+        to_append = '_' + hex(id(self))
+        return([self.working_dir + '.current_global' + to_append,
+                self.working_dir + '.current_package' + to_append,
+                self.working_dir + '.current_layout' + to_append] +
+               [self.working_dir + model_id + '.cmd'
+                if self.__model_files is None else self.__model_files[model_id]
+                for model_id in self.layout.get_model_ids()])
+
+    def _log_file_paths(self) -> list:
+        """ returns the paths of the logs the params ask COMETS to write """
+        paths = [self.working_dir + self.parameters.all_params[name]
+                 for flag, name in _LOGS.items()
+                 if self.parameters.all_params.get(flag)]
+        if self.parameters.all_params.get('evolution'):
+            paths.append(self.working_dir + 'GENOTYPES_' +
+                         self.parameters.all_params['BiomassLogName'])
+        return(paths)
+
+    def _delete_input_files(self):
+        """ deletes the layout, model and params files written by
+        _write_input_files() """
+        to_append = '_' + hex(id(self))
+        if self.__model_files is None:
+            self.layout.delete_model_files(self.working_dir)
+        else:
+            from cometspy.model_store import owner_name
+            owner = owner_name(self)
+            for path in self.__model_files.values():
+                self.__model_store.release(path, owner)
+            self.__model_files = None
+        os.remove(self.working_dir + '.current_global' + to_append)
+        os.remove(self.working_dir + '.current_package' + to_append)
+        os.remove(self.working_dir + '.current_layout' + to_append)
+
+    def _read_output(self, delete_files : bool = True, skip : list = (),
+                     where = None, raw_fluxes : bool = True,
+                     lazy : bool = False, aggregate : dict = None):
+        """ reads every log the params asked COMETS to write into the
+        corresponding attributes, deleting the log files if requested. Logs
+        named in skip (e.g. "media") were already read while streaming. Only
+        rows selected by the log_filter where are kept, if one is given.
+        Without raw_fluxes, the flux log is read only into
+        fluxes_by_species. With lazy, the logs other than total biomass are
+        left to be read on first access. Logs in aggregate are read as the
+        given stat over locations into media_by_cycle and fluxes_by_cycle.
+        Returns the seconds spent reading each log. """
         # '''----------- READ OUTPUT ---------------------------------------'''
+        parse_times = {}
+        aggregate = {} if aggregate is None else aggregate
+        grid = tuple(self.layout.grid)
+        n_locations = (grid[0] * grid[1] if where is None
+                       else where.locations(grid))
+        # logs read while streaming only need their files removed, but the
+        # totals of an aggregated one are still read from its file
+        if delete_files:
+            for log in skip:
+                if log in aggregate:
+                    continue
+                os.remove(self.working_dir +
+                          self.parameters.all_params[_STREAMABLE_LOGS[log][1]])
+
         # Read total biomass output
-        if self.parameters.all_params['writeTotalBiomassLog']:
-            tbmf = _readlines_file(
-                self.working_dir + self.parameters.all_params['TotalBiomassLogName'])
-            tbmf = [x.replace(",",".") for x in tbmf] # for systems that use commas as decimal place
-            self.total_biomass = pd.DataFrame([re.split(r'\t+', x.strip())
-                                               for x in tbmf],
-                                              columns=['cycle'] +
-                                              self.layout.get_model_ids())
-            self.total_biomass = self.total_biomass.astype('float')
-            self.total_biomass.cycle = self.total_biomass.cycle.astype('int')
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['TotalBiomassLogName'])
+        if self.parameters.all_params['writeTotalBiomassLog'] and 'total_biomass' not in skip:
+            tbmf = self.working_dir + self.parameters.all_params['TotalBiomassLogName']
+            self.__read_log('total_biomass', ['total_biomass'], tbmf,
+                            lambda: [parsers.read_total_biomass(
+                                tbmf, self.layout.get_model_ids(), where = where)],
+                            delete_files, parse_times)
 
         # Read flux
         if self.parameters.all_params['writeFluxLog']:
 
-            max_rows = 4 + max([len(m.reactions) for m in self.layout.models])
-
-            self.fluxes = pd.read_csv(self.working_dir + self.parameters.all_params['FluxLogName'],
-                                      sep="\\s+",
-                                      header=None, names=range(max_rows))
-            # deal with commas-as-decimals
-            if any([isinstance(self.fluxes.iloc[0,i], str) for i in range(self.fluxes.shape[1])]):
-                self.fluxes = pd.read_csv(self.working_dir + self.parameters.all_params['FluxLogName'],
-                                      decimal = ",", sep="\\s+",
-                                      header=None, names=range(max_rows))
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['FluxLogName'])
-            self.__build_readable_flux_object()
+            flux_file = self.working_dir + self.parameters.all_params['FluxLogName']
+            if 'fluxes' in aggregate:
+                self.fluxes = None
+                self.fluxes_by_species = None
+                species = [(m.id, list(m.reactions.REACTION_NAMES))
+                           for m in self.layout.models]
+                self.__read_log('fluxes', ['fluxes_by_cycle'], flux_file,
+                                lambda: [parsers.read_flux_totals(
+                                    flux_file, species, aggregate['fluxes'],
+                                    n_locations, where = where)],
+                                delete_files, parse_times, lazy)
+            elif raw_fluxes:
+                max_rows = 4 + max([len(m.reactions) for m in self.layout.models])
+
+                def read_fluxes():
+                    fluxes = parsers.read_fluxes(flux_file, max_rows, where = where,
+                                                 model_ids = self.layout.get_model_ids())
+                    return([fluxes, self.__build_readable_flux_object(fluxes, where)])
+                self.__read_log('fluxes', ['fluxes', 'fluxes_by_species'],
+                                flux_file, read_fluxes, delete_files,
+                                parse_times, lazy)
+            else:
+                self.fluxes = None
+                species = [(m.id, list(m.reactions.REACTION_NAMES))
+                           for m in self.layout.models]
+                self.__read_log('fluxes', ['fluxes_by_species'], flux_file,
+                                lambda: [parsers.read_fluxes_by_species(
+                                    flux_file, species, where = where)],
+                                delete_files, parse_times, lazy)
 
         # Read media logs
-        if self.parameters.all_params['writeMediaLog']:
-            self.media = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'MediaLogName'], sep="\\s+", names=('metabolite',
-                                                               'cycle', 'x',
-                                                               'y',
-                                                               'conc_mmol'))
-            # deal with commas-as-decimals
-            if isinstance(self.media.loc[0, "conc_mmol"], str):
-                self.media = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'MediaLogName'],
-                    decimal = ",", sep="\\s+", names=('metabolite',
-                                                               'cycle', 'x',
-                                                               'y',
-                                                               'conc_mmol'))
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['MediaLogName'])
+        if self.parameters.all_params['writeMediaLog'] and 'media' in aggregate:
+            if 'media' not in skip:
+                self.media = None
+            media_file = self.working_dir + self.parameters.all_params['MediaLogName']
+            self.__read_log('media', ['media_by_cycle'], media_file,
+                            lambda: [parsers.read_media_totals(
+                                media_file, aggregate['media'], n_locations,
+                                where = where)],
+                            delete_files, parse_times, lazy)
+        elif self.parameters.all_params['writeMediaLog'] and 'media' not in skip:
+            media_file = self.working_dir + self.parameters.all_params['MediaLogName']
+            self.__read_log('media', ['media'], media_file,
+                            lambda: [parsers.read_media(media_file, where = where)],
+                            delete_files, parse_times, lazy)
 
         # Read spatial biomass log
-        if self.parameters.all_params['writeBiomassLog']:
-            self.biomass = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'BiomassLogName'], header=None, delimiter=r'\s+', names=['cycle', 'x', 'y',
-                                                                         'species', 'biomass'])
-            # deal with commas-as-decimals
-            if isinstance(self.biomass.loc[0,"biomass"], str):
-                self.biomass = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'BiomassLogName'], header=None,
-                    decimal = ",",
-                    delimiter=r'\s+', names=['cycle', 'x', 'y','species', 'biomass'])
-
-            # cut off extension added by toolbox
-            self.biomass['species'] = [sp[:-4] if '.cmd' in sp else sp for sp in self.biomass.species]
-
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['BiomassLogName'])
+        if self.parameters.all_params['writeBiomassLog'] and 'biomass' not in skip:
+            biomass_file = self.working_dir + self.parameters.all_params['BiomassLogName']
+            self.__read_log('biomass', ['biomass'], biomass_file,
+                            lambda: [parsers.read_biomass(biomass_file, where = where)],
+                            delete_files, parse_times, lazy)
 
         # Read spatial velocity log
         if self.parameters.all_params['writeVelocityMultiConvLog']:
-            self.velocity = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'velocityMultiConvLogName'], header=None, delimiter=r'\s+', names=['cycle', 'species', 'x', 'y',
-                                                                            'velocityX','velocityY'])
-            # deal with commas-as-decimals
-            #if isinstance(self.velocity.loc[0,"velocity"], str):
-            #    self.velocity = pd.read_csv(self.working_dir + self.parameters.all_params[
-            #    'velocityMultiConvLogName'], header=None,
-            #        decimal = ",",
-            #        delimiter=r'\s+', names=['cycle', 'x', 'y','species', 'velocityX','velocityY'])
-
-            # cut off extension added by toolbox
-            self.velocity['species'] = [sp[:-4] if '.cmd' in sp else sp for sp in self.velocity.species]
-
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['velocityMultiConvLogName'])
+            velocity_file = self.working_dir + self.parameters.all_params['velocityMultiConvLogName']
+            self.__read_log('velocity', ['velocity'], velocity_file,
+                            lambda: [parsers.read_velocity(velocity_file, where = where)],
+                            delete_files, parse_times, lazy)
 
         # Read evolution-related logs
         if 'evolution' in list(self.parameters.all_params.keys()):
             if self.parameters.all_params['evolution']:
-                genotypes_out_file = 'GENOTYPES_' + self.parameters.all_params[
-                    'BiomassLogName']
-                self.genotypes = pd.read_csv(genotypes_out_file,
-                                             header=None, delimiter=r'\s+',
-                                             names=['Ancestor',
-                                                    'Mutation',
-                                                    'Species'])
-                if delete_files:
-                    os.remove(self.working_dir + genotypes_out_file)
+                genotypes_out_file = self.working_dir + 'GENOTYPES_' + \
+                    self.parameters.all_params['BiomassLogName']
+                self.__read_log('genotypes', ['genotypes'], genotypes_out_file,
+                                lambda: [parsers.read_genotypes(genotypes_out_file)],
+                                delete_files, parse_times, lazy)
 
         # Read specific media output
         if self.parameters.all_params['writeSpecificMediaLog']:
             spec_med_file = self.working_dir + self.parameters.all_params['SpecificMediaLogName']
-            self.specific_media = pd.read_csv(spec_med_file, delimiter=r'\s+')
-            # deal with commas-as-decimals
-            if any([isinstance(self.specific_media.iloc[0,i], str) for i in range(3, self.specific_media.shape[1])]):
-                self.specific_media = pd.read_csv(spec_med_file, decimal = ",",delimiter=r'\s+')
-
+            stopped_at = getattr(self, 'stopped_at', None)
+
+            def read_specific_media():
+                specific_media = parsers.read_specific_media(spec_med_file)
+                if stopped_at is not None:
+                    # cut like the other logs of a run stopped early
+                    specific_media = specific_media.loc[
+                        specific_media['cycle'] <= stopped_at]
+                return([specific_media])
+            self.__read_log('specific_media', ['specific_media'], spec_med_file,
+                            read_specific_media, delete_files, parse_times, lazy)
+        return(parse_times)
+
+    def __read_log(self, log, names, path, read, delete_files, parse_times,
+                   lazy = False):
+        """ sets the attributes names to the values returned by read(),
+        which reads the log at path, timed in parse_times under log. With
+        lazy, this is left to the first access of one of them. """
+        if lazy:
+            pending = _pending_log(log, names, path, read, delete_files)
+            for name in names:
+                self.__pending[name] = pending
             if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['SpecificMediaLogName'])
-
-        # clean workspace
+                self.__unread_files.append(path)
+                if self.__unread_finalizer is None:
+                    self.__unread_finalizer = weakref.finalize(
+                        self, _remove_files, self.__unread_files)
+            return
+        with _timed(parse_times, log):
+            values = read()
+        for name, value in zip(names, values):
+            setattr(self, name, value)
         if delete_files:
-            self.layout.delete_model_files(self.working_dir)
-            os.remove(c_global)
-            os.remove(c_package)
-            os.remove(c_script)
-            os.remove(self.working_dir + '.current_layout' + to_append)
-            os.remove(self.working_dir + 'COMETS_manifest.txt')  # todo: stop writing this in java
-        print('Done!')
+            os.remove(path)
+
+    def _read_pending(self, name : str):
+        """ reads the log left unread by run(lazy = True) which holds the
+        attribute name """
+        pending = self.__pending[name]
+        if pending.path is None:
+            values = pending.read()
+        else:
+            parse_times = getattr(self, 'timings', {}).setdefault('parse', {})
+            with _timed(parse_times, pending.log):
+                values = pending.read()
+        for attribute, value in zip(pending.names, values):
+            # attributes set since the run keep their value
+            if self.__pending.get(attribute) is pending:
+                setattr(self, attribute, value)
+        if pending.delete:
+            if os.path.isfile(pending.path):
+                os.remove(pending.path)
+            self.__unread_files.remove(pending.path)
+
+    def read_logs(self):
+        """
+        reads every log left unread by run(lazy = True)
+
+        Examples
+        --------
 
-    def __build_readable_flux_object(self):
+        >>> sim.run(lazy = True)
+        >>> sim.read_logs()  # e.g. before the working directory is removed
+
+        """
+        for name in list(self.__pending.keys()):
+            if name in self.__pending:
+                self._read_pending(name)
+
+    def __reset_run_state(self):
+        """ forgets the timings, stop and pending logs of a previous run,
+        before a new one """
+        self.__discard_pending()
+        self.timings = {'parse': {}}
+        self.stopped_at = None
+        self.stop_reason = None
+
+    def __discard_pending(self):
+        """ forgets the logs left unread by a previous run(lazy = True),
+        deleting their files, which the next run overwrites """
+        self.__pending.clear()
+        if self.__unread_finalizer is not None:
+            self.__unread_finalizer()
+            self.__unread_finalizer = None
+
+    def __getstate__(self):
+        """ reads the logs left unread by run(lazy = True) first, so that
+        pickles and copies hold every result """
+        self.read_logs()
+        state = self.__dict__.copy()
+        state['_comets__unread_finalizer'] = None
+        state.pop('_comets__image_indexes', None)  # holds weak references
+        return(state)
+
+    def __build_readable_flux_object(self, fluxes, where = None):
         """ comets.fluxes is an odd beast, where the column position has a
         different meaning depending on what model the row is about. Therefore,
-        this function creates separate dataframes, stored in a dictionary with
-        model_id as a key, that are much more human-readable."""
+        this function returns separate dataframes, in a dictionary with
+        model_id as a key, that are much more human-readable. If a log_filter
+        selecting species or reactions is given, only those are kept."""
 
-        self.fluxes_by_species = {}
+        fluxes_by_species = {}
         for i in range(len(self.layout.models)):
             model_num = i + 1
 
@@ -570,16 +1858,22 @@ class comets:
                 model_num - 1].reactions.REACTION_NAMES)
             model_rxn_len = len(model_rxn_names)
 
-            sub_df = self.fluxes.loc[self.fluxes[3] == model_num]
+            sub_df = fluxes.loc[fluxes[3] == model_num]
 
             # this tosses extraneous columns and the model num column
             sub_df = sub_df.drop(sub_df.columns[model_rxn_len+4: len(sub_df.columns)],
                                  axis=1)
             sub_df = sub_df.drop(sub_df.columns[3], axis=1)
             sub_df.columns = ["cycle", "x", "y"] + model_rxn_names
-            self.fluxes_by_species[model_id] = sub_df
-
-    def __analyze_run_output(self):
+            if where is not None and where.species is not None and model_id not in where.species:
+                continue
+            if where is not None and where.reactions is not None:
+                sub_df = sub_df[["cycle", "x", "y"] +
+                                [r for r in model_rxn_names if r in where.reactions]]
+            fluxes_by_species[model_id] = sub_df
+        return(fluxes_by_species)
+
+    def _analyze_run_output(self):
         if "End of simulation" in self.run_output:
             return
         else:
@@ -622,6 +1916,186 @@ class comets:
             raise RuntimeError(f"COMETS simulation did not complete:\n {message}")
 
 
+    def save_results(self, path : str, overwrite : bool = False):
+        """
+        saves the simulation results as Parquet files in a directory
+
+        total_biomass, biomass, media, fluxes_by_species, velocity,
+        specific_media and genotypes are written, whichever exist. Spatial
+        tables are partitioned by species or metabolite. Requires pyarrow.
+        See cometspy.storage for the layout of the directory.
+
+        Parameters
+        ----------
+
+        path : str
+            the directory to write into
+        overwrite : bool, optional
+            Whether to replace an existing directory at path. The default is
+            False.
+
+        Examples
+        --------
+
+        >>> sim.run()
+        >>> sim.save_results("./results/run_001")
+        >>> from cometspy.storage import load_results
+        >>> results = load_results("./results/run_001")
+        >>> results.total_biomass
+
+        """
+        from cometspy import storage
+        storage.save_results(self, path, overwrite)
+
+    def __ordered_keys(self, log, column, order):
+        present = set(pd.unique(log[column]))
+        return([key for key in order if key in present] +
+               [key for key in pd.unique(log[column]) if key not in order])
+
+    def get_biomass_cube(self, path : str = None):
+        """
+        returns the biomass log as a dense (cycle, species, x, y) array
+
+        Requires the biomass log, i.e. params.set_param("writeBiomassLog",
+        True). See cometspy.cube.result_cube.
+
+        Parameters
+        ----------
+
+        path : str, optional
+            a .npy file to build the cube in as a memory map, for large
+            grids. The default is to build it in memory.
+
+        Returns
+        -------
+
+        cometspy.cube.result_cube
+            the cube, with keys in the order of the layout's models
+
+        Examples
+        --------
+
+        >>> cube = sim.get_biomass_cube()
+        >>> im = cube.sel(cycle = 500, key = "iJO1366")
+        >>> colony = cube.data[:, 0] > 1e-8  # occupied locations over time
+
+        """
+        from cometspy import cube
+        if getattr(self, 'biomass', None) is None:
+            raise ValueError("biomass log was not recorded during simulation")
+        keys = self.__ordered_keys(self.biomass, 'species',
+                                   self.layout.get_model_ids())
+        return(cube.build_cube(self.biomass, 'species', 'biomass',
+                               self.layout.grid, keys = keys, path = path))
+
+    def get_media_cube(self, metabolites : list = None, path : str = None):
+        """
+        returns the media log as a dense (cycle, metabolite, x, y) array
+
+        Requires the media log, i.e. params.set_param("writeMediaLog", True).
+        See cometspy.cube.result_cube.
+
+        Parameters
+        ----------
+
+        metabolites : list(str), optional
+            the metabolites to include. The default is all in the log.
+        path : str, optional
+            a .npy file to build the cube in as a memory map, for large
+            grids. The default is to build it in memory.
+
+        Returns
+        -------
+
+        cometspy.cube.result_cube
+
+        Examples
+        --------
+
+        >>> cube = sim.get_media_cube(["glc__D_e", "ac_e"])
+        >>> gradient = np.gradient(cube.sel(cycle = 500, key = "ac_e"))
+
+        """
+        from cometspy import cube
+        if getattr(self, 'media', None) is None:
+            raise ValueError("media log was not recorded during simulation")
+        if metabolites is None:
+            metabolites = self.__ordered_keys(self.media, 'metabolite',
+                                              list(self.layout.media.metabolite))
+        return(cube.build_cube(self.media, 'metabolite', 'conc_mmol',
+                               self.layout.grid, keys = metabolites, path = path))
+
+    def get_velocity_cube(self, component : str = 'velocityX',
+                          path : str = None):
+        """
+        returns one velocity component as a dense (cycle, species, x, y) array
+
+        Requires the velocity log of the convection model. See
+        cometspy.cube.result_cube.
+
+        Parameters
+        ----------
+
+        component : str, optional
+            "velocityX" or "velocityY". The default is "velocityX".
+        path : str, optional
+            a .npy file to build the cube in as a memory map, for large
+            grids. The default is to build it in memory.
+
+        Returns
+        -------
+
+        cometspy.cube.result_cube
+
+        """
+        from cometspy import cube
+        if getattr(self, 'velocity', None) is None:
+            raise ValueError("velocity log was not recorded during simulation")
+        keys = self.__ordered_keys(self.velocity, 'species',
+                                   self.layout.get_model_ids())
+        return(cube.build_cube(self.velocity, 'species', component,
+                               self.layout.grid, keys = keys, path = path))
+
+    def get_flux_cube(self, model_id : str, reactions : list = None,
+                      path : str = None):
+        """
+        returns a species' fluxes as a dense (cycle, reaction, x, y) array
+
+        Requires the flux log, i.e. params.set_param("writeFluxLog", True).
+        See cometspy.cube.result_cube.
+
+        Parameters
+        ----------
+
+        model_id : str
+            the id of the model
+        reactions : list(str), optional
+            the reactions to include. The default is all of the model's.
+        path : str, optional
+            a .npy file to build the cube in as a memory map, for large
+            grids. The default is to build it in memory.
+
+        Returns
+        -------
+
+        cometspy.cube.result_cube
+
+        Examples
+        --------
+
+        >>> cube = sim.get_flux_cube("iJO1366", ["EX_glc__D_e", "EX_ac_e"])
+        >>> im = cube.sel(cycle = 500, key = "EX_ac_e")
+
+        """
+        from cometspy import cube
+        if getattr(self, 'fluxes_by_species', None) is None:
+            raise ValueError("flux log was not recorded during simulation")
+        if model_id not in self.fluxes_by_species:
+            raise NameError("model " + model_id + " is not one of the model ids")
+        return(cube.build_flux_cube(self.fluxes_by_species[model_id],
+                                    self.layout.grid, reactions = reactions,
+                                    path = path))
+
     def get_metabolite_image(self, met : str, cycle : int) -> np.array:
         """
         returns an image of metabolite concentrations at a given cycle
@@ -667,14 +2141,11 @@ class comets:
             raise ValueError("media log was not recorded during simulation")
         if met not in list(self.layout.media.metabolite):
             raise NameError("met " + met + " is not in layout.media.metabolite")
-        if cycle not in list(np.unique(self.media['cycle'])):
+        groups, cycles = self.__image_index('media', self.media, 'metabolite')
+        if cycle not in cycles:
             raise ValueError('media was not saved at the desired cycle. try another.')
-        im = np.zeros((self.layout.grid[0], self.layout.grid[1]))
-        aux = self.media.loc[np.logical_and(self.media['cycle'] == cycle,
-                                            self.media['metabolite'] == met)]
-        for index, row in aux.iterrows():
-            im[int(row['x']-1), int(row['y']-1)] = row['conc_mmol']
-        return(im)
+        return(self.__fill_image(self.media, groups.get((cycle, met)),
+                                 'conc_mmol'))
 
     def get_biomass_image(self, model_id : str, cycle : int) -> np.array:
         """
@@ -712,16 +2183,13 @@ class comets:
         """
         if not self.parameters.all_params['writeBiomassLog']:
             raise ValueError("biomass log was not recorded during simulation")
-        if model_id not in list(np.unique(self.biomass['species'])):
+        groups, cycles = self.__image_index('biomass', self.biomass, 'species')
+        if model_id not in set([key[1] for key in groups]):
             raise NameError("model " + model_id + " is not one of the model ids")
-        if cycle not in list(np.unique(self.biomass['cycle'])):
+        if cycle not in cycles:
             raise ValueError('biomass was not saved at the desired cycle. try another.')
-        im = np.zeros((self.layout.grid[0], self.layout.grid[1]))
-        aux = self.biomass.loc[np.logical_and(self.biomass['cycle'] == cycle,
-                                    self.biomass['species'] == model_id), :]
-        for index, row in aux.iterrows():
-            im[int(row['x']-1), int(row['y']-1)] = row['biomass']
-        return(im)
+        return(self.__fill_image(self.biomass, groups.get((cycle, model_id)),
+                                 'biomass'))
 
     def get_flux_image(self, model_id : str,
                        reaction_id : str, cycle : int) -> np.array:
@@ -764,18 +2232,135 @@ class comets:
             raise ValueError("flux log was not recorded during simulation")
         if model_id not in [m.id for m in self.layout.models]:
             raise NameError("model " + model_id + " is not one of the model ids")
-        im = np.zeros((self.layout.grid[0], self.layout.grid[1]))
         temp_fluxes = self.fluxes_by_species[model_id]
-        if cycle not in list(np.unique(temp_fluxes['cycle'])):
+        groups, cycles = self.__image_index(('fluxes', model_id), temp_fluxes)
+        if cycle not in cycles:
             raise ValueError('flux was not saved at the desired cycle. try another.')
-        if reaction_id not in list(temp_fluxes.columns):
+        if reaction_id not in temp_fluxes.columns:
             raise NameError("reaction_id " + reaction_id +
                             " is not a reaction in the desired model")
-        aux = temp_fluxes.loc[temp_fluxes['cycle'] == cycle, :]
-        for index, row in aux.iterrows():
-            im[int(row['x']-1), int(row['y']-1)] = row[reaction_id]
+        return(self.__fill_image(temp_fluxes, groups.get(cycle), reaction_id))
+
+    def __image_index(self, name, log, key_column = None):
+        """ returns the row positions of each (cycle, key) group of log, or
+        of each cycle if key_column is None, and the set of logged cycles.
+        The grouping is computed once per log and kept, under name (e.g.
+        "media"), until the log of that name is replaced. """
+        if '_comets__image_indexes' not in self.__dict__:
+            self.__image_indexes = {}
+        cached = self.__image_indexes.get(name)
+        if cached is None or cached[0]() is not log:
+            by = 'cycle' if key_column is None else ['cycle', key_column]
+            groups = log.groupby(by, sort = False).indices
+            cycles = set(pd.unique(log['cycle']))
+            # a weak reference, so that a replaced log can be freed
+            cached = (weakref.ref(log), groups, cycles)
+            self.__image_indexes[name] = cached
+        return(cached[1], cached[2])
+
+    def __fill_image(self, log, rows, value_column):
+        """ scatters the values of the given rows of log into a grid """
+        im = np.zeros((self.layout.grid[0], self.layout.grid[1]))
+        if rows is not None:
+            im[log['x'].to_numpy()[rows] - 1,
+               log['y'].to_numpy()[rows] - 1] = log[value_column].to_numpy()[rows]
         return(im)
 
+    def get_metabolite_images(self, met : str) -> np.array:
+        """
+        returns images of a metabolite's concentration at every logged cycle
+
+        Like get_metabolite_image, but for all cycles at once.
+
+        Parameters
+        ----------
+
+        met : str
+            the name of the metabolite
+
+        Returns
+        -------
+
+            A 3d numpy array whose first dimension is the cycles of the media
+            log, in increasing order (see np.unique(sim.media['cycle'])).
+
+        Examples
+        --------
+
+        >>> ims = sim.get_metabolite_images("ac_e")
+        >>> ims.shape # (number of logged cycles, grid x, grid y)
+
+        """
+        from cometspy import cube
+        if not self.parameters.all_params['writeMediaLog']:
+            raise ValueError("media log was not recorded during simulation")
+        if met not in list(self.layout.media.metabolite):
+            raise NameError("met " + met + " is not in layout.media.metabolite")
+        return(cube.build_cube(self.media, 'metabolite', 'conc_mmol',
+                               self.layout.grid, keys = [met]).data[:, 0])
+
+    def get_biomass_images(self, model_id : str) -> np.array:
+        """
+        returns images of a model's biomass at every logged cycle
+
+        Like get_biomass_image, but for all cycles at once.
+
+        Parameters
+        ----------
+
+        model_id : str
+            the id of the model to get biomass data on
+
+        Returns
+        -------
+
+            A 3d numpy array whose first dimension is the cycles of the
+            biomass log, in increasing order (see
+            np.unique(sim.biomass['cycle'])).
+
+        """
+        from cometspy import cube
+        if not self.parameters.all_params['writeBiomassLog']:
+            raise ValueError("biomass log was not recorded during simulation")
+        if model_id not in self.layout.get_model_ids():
+            raise NameError("model " + model_id + " is not one of the model ids")
+        return(cube.build_cube(self.biomass, 'species', 'biomass',
+                               self.layout.grid, keys = [model_id]).data[:, 0])
+
+    def get_flux_images(self, model_id : str, reaction_id : str) -> np.array:
+        """
+        returns images of a reaction's flux at every logged cycle
+
+        Like get_flux_image, but for all cycles at once.
+
+        Parameters
+        ----------
+
+        model_id : str
+            the id of the model about which to get fluxes
+        reaction_id : str
+            the id of the reaction about which to get fluxes
+
+        Returns
+        -------
+
+            A 3d numpy array whose first dimension is the cycles of the
+            model's fluxes, in increasing order (see
+            np.unique(sim.fluxes_by_species[model_id]['cycle'])).
+
+        """
+        from cometspy import cube
+        if not self.parameters.all_params['writeFluxLog']:
+            raise ValueError("flux log was not recorded during simulation")
+        if model_id not in [m.id for m in self.layout.models]:
+            raise NameError("model " + model_id + " is not one of the model ids")
+        temp_fluxes = self.fluxes_by_species[model_id]
+        if reaction_id not in temp_fluxes.columns:
+            raise NameError("reaction_id " + reaction_id +
+                            " is not a reaction in the desired model")
+        return(cube.build_flux_cube(temp_fluxes, self.layout.grid,
+                                    reactions = [reaction_id]).data[:, 0])
+
     def get_metabolite_time_series(self, upper_threshold : float = 1000.) -> pd.DataFrame:
         """
         returns a pandas DataFrame containing extracellular metabolite time series
@@ -785,8 +2370,17 @@ class comets:
 
         upper_threshold : float (optional)
             metabolites ever above this are not returned
+
+        After run(aggregate = {"media": "sum"}), the totals read then are
+        used, without the spatial media log.
         """
-        total_media = self.media.groupby(by = ["metabolite", "cycle"]).agg(func = sum).reset_index().drop(columns = ["x", "y"])
+        if getattr(self, 'aggregated', {}).get('media') == 'sum':
+            total_media = self.media_by_cycle
+        elif getattr(self, 'media', None) is None:
+            raise ValueError("the media log was not read. run with writeMediaLog, "
+                             "and aggregate = {'media': 'sum'} or without aggregate")
+        else:
+            total_media = self.media.groupby(by = ["metabolite", "cycle"]).agg(func = sum).reset_index().drop(columns = ["x", "y"])
         total_media = total_media.pivot(columns = "metabolite", values = "conc_mmol", index = ["cycle"]).reset_index().fillna(0.)
         exceeded_threshold = [x for x in total_media.min().index[total_media.min() > upper_threshold] if x != "cycle"]
         total_media = total_media.drop(columns = exceeded_threshold)
@@ -803,15 +2397,287 @@ class comets:
             id of the model
         threshold : float (optional)
             abs(flux) must exceed this to be returned
+
+        After run(aggregate = {"fluxes": "sum"}), the totals read then are
+        used, without the spatial flux log.
         """
-        fluxes = self.fluxes_by_species[model_id].copy()
-        fluxes = fluxes.groupby(by = "cycle").agg(func = sum).reset_index().drop(columns = ["x", "y"])
+        if getattr(self, 'aggregated', {}).get('fluxes') == 'sum':
+            fluxes = self.fluxes_by_cycle[model_id].copy()
+        elif getattr(self, 'fluxes_by_species', None) is None:
+            raise ValueError("the flux log was not read. run with writeFluxLog, "
+                             "and aggregate = {'fluxes': 'sum'} or without aggregate")
+        else:
+            fluxes = self.fluxes_by_species[model_id].copy()
+            fluxes = fluxes.groupby(by = "cycle").agg(func = sum).reset_index().drop(columns = ["x", "y"])
         not_exch = [x for x in fluxes.columns if "EX_" not in x and x != "cycle"]
         fluxes = fluxes.drop(columns =not_exch)
         didnt_exceed_threshold = [x for x in np.abs(fluxes).max().index[np.abs(fluxes).max() < threshold] if x != "cycle"]
         fluxes = fluxes.drop(columns = didnt_exceed_threshold)
         return(fluxes)
 
+
+def _run_isolated(sim, delete_files = True, run_kwargs = None):
+    """ runs one comets object inside its own fresh subdirectory of its
+    working_dir, so that concurrent runs never share temporary files. Used as
+    the worker function of run_many(). """
+    base_dir = sim.working_dir
+    run_dir = tempfile.mkdtemp(prefix = "comets_run_", dir = base_dir)
+    sim.working_dir = run_dir + '/'
+    try:
+        # the run directory is removed and the object sent back to the
+        # parent process, so its logs are read here
+        sim.run(delete_files = delete_files, **dict(run_kwargs or {}, lazy = False))
+    finally:
+        if delete_files:
+            shutil.rmtree(run_dir, ignore_errors = True)
+            sim.working_dir = base_dir
+    return(sim)
+
+
+def iter_run_many(sims, max_workers : int = None,
+                  delete_files : bool = True, run_kwargs : dict = None):
+    """
+    runs comets objects in a process pool, yielding them as they finish
+
+    This is the generator behind run_many(). Simulations are submitted
+    lazily, with at most twice max_workers in flight, so sims may be any
+    iterable (e.g. a generator building comets objects on demand) and
+    finished results can be consumed and discarded one at a time.
+
+    Parameters
+    ----------
+
+    sims : iterable(comets)
+        the comets objects to run
+    max_workers : int, optional
+        number of worker processes. The default is os.cpu_count().
+    delete_files : bool, optional
+        Whether to delete simulation and log files. The default is True.
+    run_kwargs : dict, optional
+        further arguments of comets.run(), e.g. {"timeout": 3600}
+
+    Yields
+    ------
+
+    tuple (int, comets)
+        the position of the simulation in sims and the finished comets object
+
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    sims = iter(sims)
+    with ProcessPoolExecutor(max_workers = max_workers) as pool:
+        pending = {}
+        submitted = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * max_workers:
+                try:
+                    sim = next(sims)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = pool.submit(_run_isolated, sim, delete_files,
+                                     run_kwargs)
+                pending[future] = submitted
+                submitted += 1
+            if len(pending) == 0:
+                break
+            done, _ = wait(list(pending.keys()), return_when = FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                yield((i, future.result()))
+
+
+def run_many(sims : list, max_workers : int = None,
+             delete_files : bool = True, progress : bool = True,
+             run_kwargs : dict = None) -> list:
+    """
+    runs many COMETS simulations at once in a pool of processes
+
+    Each simulation is run in its own process and inside its own temporary
+    subdirectory of its working_dir, so that simulations sharing a
+    working_dir do not overwrite each other's layout, model or log files.
+    The finished comets objects are returned in the same order as given,
+    with their outputs (e.g. total_biomass) filled in as by comets.run().
+
+    Parameters
+    ----------
+
+    sims : list(comets)
+        the comets objects to run
+    max_workers : int, optional
+        number of worker processes. The default is os.cpu_count().
+    delete_files : bool, optional
+        Whether to delete simulation and log files. The default is True. If
+        False, each sim's working_dir is left pointing at its subdirectory.
+    progress : bool, optional
+        Whether to display a progress bar over all runs via tqdm. The default
+        is True.
+    run_kwargs : dict, optional
+        further arguments of comets.run() for every simulation, e.g.
+        {"timeout": 3600, "max_log_size": 2**30}. A simulation which
+        exceeds a limit raises RunLimitExceeded here.
+
+    Returns
+    -------
+
+    list(comets)
+        the finished comets objects, in the order of sims
+
+    Examples
+    --------
+
+    >>> # assume layouts is a list of layouts and params has been created
+    >>> from cometspy.comets import run_many
+    >>> sims = [c.comets(l, params) for l in layouts]
+    >>> sims = run_many(sims, max_workers = 8)
+    >>> sims[0].total_biomass
+
+    """
+    sims = list(sims)
+    if progress:
+        from tqdm.auto import tqdm
+        prog = tqdm(total = len(sims), desc = "Simulations", unit = "sim")
+    results = [None] * len(sims)
+    for i, sim in iter_run_many(sims, max_workers, delete_files, run_kwargs):
+        results[i] = sim
+        if progress:
+            prog.update(1)
+    if progress:
+        prog.close()
+    return(results)
+
+
+def run_batch(sims : list, delete_files : bool = True,
+              progress : bool = False) -> list:
+    """
+    runs many COMETS simulations one after the other in a single JVM
+
+    All simulations are written into one COMETS script, which is executed
+    by one java process. This avoids paying JVM startup and class loading
+    for every simulation, which dominates the runtime of short (e.g.
+    well-mixed) simulations. Afterwards, std_out is split at each
+    "End of simulation" and each simulation's own logs are read into its
+    comets object, as comets.run() would do.
+
+    The simulations share a temporary subdirectory of the first sim's
+    working_dir. Models are written there by id, so models sharing an id
+    across the simulations must be identical; otherwise a ValueError is
+    raised and run_many() should be used instead.
+
+    Parameters
+    ----------
+
+    sims : list(comets)
+        the comets objects to run
+    delete_files : bool, optional
+        Whether to delete simulation and log files. The default is True.
+    progress : bool, optional
+        Whether to display a progress bar over the simulations via tqdm.
+        The default is False.
+
+    Returns
+    -------
+
+    list(comets)
+        the same comets objects, now holding their outputs
+
+    Raises
+    ------
+
+    BatchRunError
+        if some simulations did not complete. The outputs of the others
+        are read first, and the batch's files cleaned up as asked.
+
+    Examples
+    --------
+
+    >>> from cometspy.comets import run_batch
+    >>> sims = [c.comets(l, params) for l in layouts]
+    >>> run_batch(sims)
+    >>> sims[0].total_biomass
+
+    """
+    sims = list(sims)
+    print('\nRunning ' + str(len(sims)) + ' COMETS simulations in one batch ...')
+    base_dirs = [sim.working_dir for sim in sims]
+    batch_dir = tempfile.mkdtemp(prefix = "comets_batch_", dir = base_dirs[0]) + '/'
+
+    script_lines = []
+    written_models = {}
+    for sim in sims:
+        sim.working_dir = batch_dir
+        script_lines.extend(sim._write_input_files())
+        for model_id in sim.layout.get_model_ids():
+            with open(batch_dir + model_id + '.cmd', 'rb') as f:
+                contents = f.read()
+            if written_models.setdefault(model_id, contents) != contents:
+                shutil.rmtree(batch_dir, ignore_errors = True)
+                for s, base_dir in zip(sims, base_dirs):
+                    s.working_dir = base_dir
+                raise ValueError("different models share the id " + model_id +
+                                 "; use run_many() or give them unique ids")
+
+    c_script = batch_dir + '.current_script_batch'
+    with open(c_script, 'w') as f:
+        f.write('\n'.join(script_lines))
+    java_options, cds_lock = sims[0]._java_options()
+    cmd = sims[0]._build_command_args(c_script, java_options)
+
+    process = _start_process(cmd, batch_dir)
+    try:
+        if progress:
+            from tqdm.auto import tqdm
+            prog = tqdm(total = len(sims), desc = "Simulations", unit = "sim")
+            run_output = ""
+            with process.stdout:
+                for line in iter(process.stdout.readline, b''):
+                    line = line.decode('ascii', 'ignore')
+                    run_output += line
+                    if "End of simulation" in line:
+                        prog.update(1)
+            process.wait()
+            prog.close()
+        else:
+            run_output, _ = process.communicate()
+            run_output = run_output.decode('ascii', 'ignore')
+    except BaseException:
+        _kill_process_group(process)
+        raise
+    finally:
+        _RUNNING_PROCESSES.discard(process)
+        sims[0]._release_cds_lock(cds_lock)
+
+    # split std_out so that each sim gets the part up to its own end marker
+    marker = "End of simulation"
+    pieces = run_output.split(marker)
+    errors = []
+    try:
+        for i, sim in enumerate(sims):
+            sim.cmd = cmd
+            if i < len(pieces) - 1:
+                sim.run_output = pieces[i] + marker
+            elif i == len(pieces) - 1:
+                sim.run_output = pieces[i]  # this sim did not finish
+            else:
+                sim.run_output = ""  # the JVM stopped before reaching this sim
+            sim.run_errors = "STDERR empty."
+            try:
+                sim._analyze_run_output()
+                sim._read_output(delete_files)
+            except Exception as error:
+                errors.append((i, error))
+    finally:
+        if delete_files:
+            shutil.rmtree(batch_dir, ignore_errors = True)
+            for sim, base_dir in zip(sims, base_dirs):
+                sim.working_dir = base_dir
+    if len(errors) > 0:
+        raise BatchRunError(errors)
+    print('Done!')
+    return(sims)
+
 # TODO: check for manual changes within layout that may not have triggered flags. See layout.write_layout for details
 # TODO: fix read_comets_layout to always expect text addresses of comets model files
 # TODO: remove comets manifest (preferably, dont write it)
@@ -0,0 +1,291 @@
+'''
+The cube module turns spatial COMETS results into dense arrays.
+
+The biomass, media, velocity and flux logs are long tables with one row per
+cycle, location and species (or metabolite). A result_cube holds the same
+values in an array with dimensions (cycle, key, x, y), where key is a
+species, metabolite or reaction, so a frame or a time series at a location
+is a slice instead of a search through the table. Cubes can be built
+directly into a memory-mapped .npy file, so grids larger than memory can be
+used, and can be saved compressed.
+
+Usually cubes are made with comets.get_biomass_cube(), get_media_cube(),
+get_velocity_cube() and get_flux_cube().
+'''
+
+import json
+import numpy as np
+import pandas as pd
+
+
+class result_cube:
+    """
+    a dense (cycle, key, x, y) array of a spatial COMETS result
+
+    Parameters
+    ----------
+
+    data : numpy.ndarray
+        the values, with shape (len(cycles), len(keys), grid x, grid y). It
+        may be a numpy.memmap.
+    cycles : list(int)
+        the cycles along the first dimension, in increasing order
+    keys : list(str)
+        the species, metabolites or reactions along the second dimension
+    name : str, optional
+        what the values are, e.g. "biomass" or "conc_mmol"
+
+    Attributes
+    ----------
+
+    data : numpy.ndarray
+        the values. data[i, j] is the image of keys[j] at cycles[i], indexed
+        from 0, so the log location (x, y) is data[i, j, x - 1, y - 1]
+    cycles : numpy.ndarray
+        the cycles along the first dimension
+    keys : list(str)
+        the keys along the second dimension
+    name : str
+        what the values are
+
+    Examples
+    --------
+
+    >>> cube = sim.get_media_cube()
+    >>> im = cube.sel(cycle = 500, key = "ac_e")  # a 2d image
+    >>> series = cube.sel(key = "ac_e")[:, 10, 10]  # one location over time
+    >>> cube.save("media.npz", compressed = True)
+
+    """
+    def __init__(self, data : np.ndarray, cycles : list, keys : list,
+                 name : str = ''):
+        self.data = data
+        self.cycles = np.asarray(cycles, dtype = 'int64')
+        self.keys = list(keys)
+        self.name = name
+        self.__cycle_index = {int(cycle): i for i, cycle in enumerate(self.cycles)}
+        self.__key_index = {key: i for i, key in enumerate(self.keys)}
+
+    @property
+    def shape(self) -> tuple:
+        return(self.data.shape)
+
+    def cycle_index(self, cycle : int) -> int:
+        """ returns the position of cycle along the first dimension """
+        try:
+            return(self.__cycle_index[int(cycle)])
+        except KeyError:
+            raise ValueError("cycle " + str(cycle) + " is not in the cube")
+
+    def key_index(self, key : str) -> int:
+        """ returns the position of key along the second dimension """
+        try:
+            return(self.__key_index[key])
+        except KeyError:
+            raise NameError(str(key) + " is not one of the cube's keys")
+
+    def sel(self, cycle : int = None, key : str = None) -> np.ndarray:
+        """
+        returns the values at a cycle and/or key, without copying
+
+        Parameters
+        ----------
+
+        cycle : int, optional
+            the cycle to select. The default is all cycles.
+        key : str, optional
+            the species, metabolite or reaction to select. The default is
+            all keys.
+
+        Returns
+        -------
+
+        numpy.ndarray
+            a view of data with the selected dimensions removed
+
+        """
+        index = [slice(None), slice(None)]
+        if cycle is not None:
+            index[0] = self.cycle_index(cycle)
+        if key is not None:
+            index[1] = self.key_index(key)
+        return(self.data[tuple(index)])
+
+    def save(self, path : str, compressed : bool = False):
+        """
+        writes the cube to disk, to be read again with load_cube()
+
+        Parameters
+        ----------
+
+        path : str
+            the file to write. With compressed = False, a .npy file is
+            written, with the cycles and keys in path + ".json". Otherwise a
+            compressed .npz file is written.
+        compressed : bool, optional
+            whether to write a compressed .npz file. The default is False.
+
+        """
+        if compressed:
+            np.savez_compressed(path, data = self.data, cycles = self.cycles,
+                                keys = np.array(self.keys, dtype = 'str'),
+                                name = np.array(self.name))
+        else:
+            np.save(path, self.data)
+            _write_index(path, self.cycles, self.keys, self.name)
+
+
+def _write_index(path, cycles, keys, name):
+    with open(path + '.json', 'w') as f:
+        json.dump({'cycles': [int(cycle) for cycle in cycles],
+                   'keys': list(keys), 'name': name}, f)
+
+
+def load_cube(path : str, mmap_mode : str = 'r') -> result_cube:
+    """
+    reads a cube written by result_cube.save() or built with a path
+
+    Parameters
+    ----------
+
+    path : str
+        the .npy or .npz file
+    mmap_mode : str, optional
+        how to memory-map a .npy file, see numpy.load. The default is "r",
+        which reads values from disk only when they are used. None reads the
+        whole array into memory.
+
+    Returns
+    -------
+
+    result_cube
+
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as stored:
+            return(result_cube(stored['data'], stored['cycles'],
+                               [str(key) for key in stored['keys']],
+                               str(stored['name'])))
+    with open(path + '.json', 'r') as f:
+        index = json.load(f)
+    return(result_cube(np.load(path, mmap_mode = mmap_mode), index['cycles'],
+                       index['keys'], index['name']))
+
+
+def _allocate(shape, dtype, path, fill):
+    if path is None:
+        return(np.full(shape, fill, dtype = dtype))
+    data = np.lib.format.open_memmap(path, mode = 'w+', dtype = dtype,
+                                     shape = shape)
+    data[...] = fill
+    return(data)
+
+
+def _cycle_positions(log_cycles, cycles):
+    """ returns the position of each log cycle in cycles, or -1 """
+    positions = np.searchsorted(cycles, log_cycles)
+    positions[positions == len(cycles)] = 0
+    positions[cycles[positions] != log_cycles] = -1
+    return(positions)
+
+
+def build_cube(log : pd.DataFrame, key_column : str, value_column : str,
+               grid : list, keys : list = None, cycles : list = None,
+               path : str = None, dtype : str = 'float64',
+               fill : float = 0.) -> result_cube:
+    """
+    builds a result_cube from a long spatial table such as comets.media
+
+    Parameters
+    ----------
+
+    log : pandas.DataFrame
+        a table with columns cycle, x and y (starting at 1), key_column and
+        value_column
+    key_column : str
+        the column giving the second dimension, e.g. "metabolite"
+    value_column : str
+        the column holding the values, e.g. "conc_mmol"
+    grid : list(int)
+        the size of the layout, e.g. layout.grid
+    keys : list(str), optional
+        the keys to include, in order. The default is every key in the log,
+        in order of appearance.
+    cycles : list(int), optional
+        the cycles to include. The default is every cycle in the log.
+    path : str, optional
+        a .npy file to build the cube in as a memory map, for cubes larger
+        than memory. The default is to build it in memory.
+    dtype : str, optional
+        the dtype of the cube. The default is "float64".
+    fill : float, optional
+        the value of locations missing from the log. The default is 0.
+
+    Returns
+    -------
+
+    result_cube
+
+    """
+    if keys is None:
+        keys = list(pd.unique(log[key_column]))
+    cycles = np.unique(log['cycle'] if cycles is None else cycles)
+    shape = (len(cycles), len(keys), int(grid[0]), int(grid[1]))
+    data = _allocate(shape, dtype, path, fill)
+
+    key_positions = pd.Categorical(log[key_column], categories = keys).codes
+    cycle_positions = _cycle_positions(log['cycle'].to_numpy(), cycles)
+    keep = (key_positions >= 0) & (cycle_positions >= 0)
+    data[cycle_positions[keep], key_positions[keep],
+         log['x'].to_numpy()[keep] - 1,
+         log['y'].to_numpy()[keep] - 1] = log[value_column].to_numpy()[keep]
+    if path is not None:
+        data.flush()
+        _write_index(path, cycles, keys, value_column)
+    return(result_cube(data, cycles, keys, value_column))
+
+
+def build_flux_cube(fluxes : pd.DataFrame, grid : list,
+                    reactions : list = None, cycles : list = None,
+                    path : str = None, dtype : str = 'float64',
+                    fill : float = 0.) -> result_cube:
+    """
+    builds a result_cube of reactions from one species' flux table
+
+    Parameters
+    ----------
+
+    fluxes : pandas.DataFrame
+        a table from comets.fluxes_by_species, with columns cycle, x, y and
+        one column per reaction
+    grid : list(int)
+        the size of the layout, e.g. layout.grid
+    reactions : list(str), optional
+        the reactions to include, in order. The default is all.
+    cycles, path, dtype, fill
+        as in build_cube()
+
+    Returns
+    -------
+
+    result_cube
+
+    """
+    if reactions is None:
+        reactions = [column for column in fluxes.columns
+                     if column not in ('cycle', 'x', 'y')]
+    cycles = np.unique(fluxes['cycle'] if cycles is None else cycles)
+    shape = (len(cycles), len(reactions), int(grid[0]), int(grid[1]))
+    data = _allocate(shape, dtype, path, fill)
+
+    cycle_positions = _cycle_positions(fluxes['cycle'].to_numpy(), cycles)
+    keep = cycle_positions >= 0
+    rows = cycle_positions[keep][:, None]
+    x = fluxes['x'].to_numpy()[keep][:, None] - 1
+    y = fluxes['y'].to_numpy()[keep][:, None] - 1
+    data[rows, np.arange(len(reactions))[None, :], x, y] = \
+        fluxes[reactions].to_numpy()[keep]
+    if path is not None:
+        data.flush()
+        _write_index(path, cycles, reactions, 'flux')
+    return(result_cube(data, cycles, reactions, 'flux'))
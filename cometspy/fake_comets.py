@@ -0,0 +1,322 @@
+'''
+The fake_comets module is a stand-in for the COMETS java program.
+
+It reads the script, params, layout and model files written by
+comets.run() and writes total biomass, biomass, media, flux, velocity and
+specific media logs in the formats COMETS uses, with simple synthetic
+dynamics: each model grows on the metabolites it exchanges, with Monod
+kinetics, consumes them, secretes into exchanged metabolites absent from the
+media, and spreads to neighbouring locations. A nonzero randomSeed
+parameter adds noise to growth, so replicates with different seeds differ.
+Its std_out mimics that of COMETS, including the "End of simulation" line.
+
+It needs neither java, gurobi nor or-tools, so the python side of cometspy
+(writing files, launching, reading logs) can be tested and benchmarked
+anywhere. The size of the logs follows the layout (grid, models,
+metabolites) and params (maxCycles, log rates) as with COMETS. The numbers
+are not a simulation of anything; never use them for science.
+
+Select it with comets.set_backend("fake") or by setting the environmental
+variable COMETSPY_BACKEND=fake before creating comets objects. It can also be
+run directly:
+
+    python fake_comets.py -script .current_script [--cycle-delay 0.01] [--fill 0.5]
+
+--cycle-delay
+    seconds to sleep every cycle, to imitate slow simulations
+--fill
+    fraction of locations given biomass at the start, in addition to the
+    initial_pop, to produce dense spatial logs
+'''
+
+import os
+import sys
+import time
+import numpy as np
+
+
+def _read_params(path):
+    params = {}
+    with open(path, 'r') as f:
+        for line in f:
+            if ' = ' in line:
+                key, value = line.split(' = ', 1)
+                params[key.strip()] = value.strip()
+    return(params)
+
+
+def _read_blocks(lines, start):
+    """ returns the lines from start up to the next line which is // """
+    block = []
+    for line in lines[start:]:
+        if line.strip() == '//':
+            break
+        block.append(line)
+    return(block)
+
+
+def _read_model(path):
+    """ returns the reaction names of a COMETS model file and, for each
+    exchange reaction, its position and the metabolite it exchanges """
+    with open(path, 'r') as f:
+        lines = f.read().split('\n')
+    headers = {line.split()[0]: i for i, line in enumerate(lines)
+               if line.strip() != '' and not line.startswith(' ')}
+    reactions = [line.strip() for line in
+                 _read_blocks(lines, headers['REACTION_NAMES'] + 1)]
+    metabolites = [line.strip() for line in
+                   _read_blocks(lines, headers['METABOLITE_NAMES'] + 1)]
+    exchange = []
+    if 'EXCHANGE_REACTIONS' in headers:
+        for line in _read_blocks(lines, headers['EXCHANGE_REACTIONS'] + 1):
+            exchange += [int(i) for i in line.split()]
+    reaction_met = {}
+    for line in _read_blocks(lines, headers['SMATRIX'] + 1):
+        met, rxn, coef = line.split()
+        reaction_met.setdefault(int(rxn), metabolites[int(met) - 1])
+    exchanges = [(rxn - 1, reaction_met.get(rxn)) for rxn in exchange]
+    return(reactions, exchanges)
+
+
+def _read_layout(path):
+    with open(path, 'r') as f:
+        lines = f.read().split('\n')
+    model_files = lines[0].split()[1:]
+    grid = [1, 1]
+    media = []
+    local_media = []
+    initial_pop = []
+    for i, line in enumerate(lines):
+        words = line.split()
+        if len(words) == 0:
+            continue
+        if words[0] == 'grid_size':
+            grid = [int(words[1]), int(words[2])]
+        elif words[0] == 'world_media':
+            media = [(l.split()[0], float(l.split()[1]))
+                     for l in _read_blocks(lines, i + 1)]
+        elif words[0] == 'media' and len(words) == 1:
+            local_media = [[float(x) for x in l.split()]
+                           for l in _read_blocks(lines, i + 1)]
+        elif words[0] == 'initial_pop':
+            initial_pop = [[float(x) for x in l.split()]
+                           for l in _read_blocks(lines, i + 1)]
+    return(model_files, grid, media, local_media, initial_pop)
+
+
+def _flag(params, name):
+    return(params.get(name, 'false') == 'true')
+
+
+class _simulation:
+    """ one simulation of a script, i.e. one params/layout triplet """
+    def __init__(self, global_file, package_file, layout_file, fill = 0.):
+        self.params = _read_params(global_file)
+        self.params.update(_read_params(package_file))
+        (model_files, self.grid, media, local_media,
+         initial_pop) = _read_layout(layout_file)
+        self.model_names = [os.path.basename(m) for m in model_files]
+        self.models = [_read_model(m) for m in model_files]
+        self.mets = [met for met, _ in media]
+        nx, ny = self.grid
+
+        self.media = np.zeros((len(self.mets), nx, ny))
+        for k, (_, amount) in enumerate(media):
+            self.media[k] = amount
+        for row in local_media:
+            x, y = int(row[0]), int(row[1])
+            for k, amount in enumerate(row[2:len(self.mets) + 2]):
+                self.media[k, x, y] = amount
+
+        self.biomass = np.zeros((len(self.models), nx, ny))
+        for row in initial_pop:
+            x, y = int(row[0]), int(row[1])
+            self.biomass[:, x, y] += row[2:len(self.models) + 2]
+        if fill > 0:
+            rng = np.random.default_rng(0)
+            seeded = rng.random((nx, ny)) < fill
+            start = self.biomass.sum(axis = (1, 2)).max() or 1e-6
+            for m in range(len(self.models)):
+                self.biomass[m, seeded] += start / max(seeded.sum(), 1)
+
+        # which metabolites each model takes up (present at the start) and
+        # secretes (absent at the start)
+        met_index = {met: k for k, met in enumerate(self.mets)}
+        self.exchange = []
+        for reactions, exchanges in self.models:
+            uptake, secretion = [], []
+            for rxn, met in exchanges:
+                if met not in met_index:
+                    continue
+                k = met_index[met]
+                if self.media[k].max() > 0:
+                    uptake.append((rxn, k))
+                else:
+                    secretion.append((rxn, k))
+            self.exchange.append((uptake, secretion))
+        self.flux = [np.zeros((nx, ny, len(reactions)))
+                     for reactions, _ in self.models]
+        self.velocity = np.zeros((len(self.models), nx, ny, 2))
+        # a nonzero randomSeed adds noise to growth, so that replicates differ
+        self.seed = int(float(self.params.get('randomSeed', 0)))
+        self.rng = np.random.default_rng(self.seed)
+
+    def step(self):
+        dt = float(self.params.get('timeStep', 0.1))
+        vmax = float(self.params.get('defaultVmax', 10.))
+        km = float(self.params.get('defaultKm', 0.01))
+        death = float(self.params.get('deathRate', 0.))
+        spread = min(0.2, float(self.params.get('defaultDiffConst', 1e-5)) * 1e4)
+        for m, (uptake, secretion) in enumerate(self.exchange):
+            flux = self.flux[m]
+            flux[:] = 0.
+            growth = np.zeros(self.grid)
+            for rxn, k in uptake:
+                rate = vmax * self.media[k] / (km + self.media[k])
+                taken = np.minimum(rate * self.biomass[m] * dt, self.media[k])
+                self.media[k] -= taken
+                growth += 0.05 * taken
+                with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                    flux[:, :, rxn] = -np.where(self.biomass[m] > 0,
+                                                taken / (self.biomass[m] * dt), 0.)
+            for rxn, k in secretion:
+                made = 0.1 * growth
+                self.media[k] += made
+                with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                    flux[:, :, rxn] = np.where(self.biomass[m] > 0,
+                                               made / (self.biomass[m] * dt), 0.)
+            # internal reactions follow growth, so flux logs vary in space
+            mu = np.where(self.biomass[m] > 0, growth / np.maximum(self.biomass[m], 1e-300), 0.)
+            internal = np.ones(flux.shape[2], dtype = bool)
+            internal[[rxn for rxn, _ in uptake + secretion]] = False
+            flux[:, :, internal] = mu[:, :, None] * np.linspace(-1., 1., internal.sum())
+            if self.seed != 0:
+                growth *= np.maximum(1. + 0.1 * self.rng.standard_normal(self.grid), 0.)
+            self.biomass[m] = (self.biomass[m] + growth) * (1. - death)
+        if spread > 0 and self.grid[0] > 1 and self.grid[1] > 1:
+            self.velocity[..., 0] = -np.gradient(self.biomass, axis = 1)
+            self.velocity[..., 1] = -np.gradient(self.biomass, axis = 2)
+            for field in (self.biomass, self.media):
+                padded = np.pad(field, ((0, 0), (1, 1), (1, 1)), mode = 'edge')
+                neighbours = (padded[:, :-2, 1:-1] + padded[:, 2:, 1:-1] +
+                              padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:]) / 4.
+                field += spread * (neighbours - field)
+
+    def open_logs(self):
+        logs = {}
+        for flag, name in (('writeTotalBiomassLog', 'TotalBiomassLogName'),
+                           ('writeBiomassLog', 'BiomassLogName'),
+                           ('writeMediaLog', 'MediaLogName'),
+                           ('writeFluxLog', 'FluxLogName'),
+                           ('writeVelocityMultiConvLog', 'velocityMultiConvLogName'),
+                           ('writeSpecificMediaLog', 'SpecificMediaLogName')):
+            if _flag(self.params, flag):
+                logs[flag] = open(self.params[name], 'w')
+        if 'writeSpecificMediaLog' in logs:
+            self.specific = [self.mets.index(met) for met in
+                             self.params.get('specificMedia', '').split(',')
+                             if met in self.mets]
+            logs['writeSpecificMediaLog'].write(
+                'cycle x y ' + ' '.join([self.mets[k] for k in self.specific]) + '\n')
+        return(logs)
+
+    def write_logs(self, logs, cycle):
+        def due(flag, rate):
+            return(flag in logs and cycle % max(int(self.params.get(rate, 1)), 1) == 0)
+
+        occupied = np.argwhere(self.biomass.sum(axis = 0) > 0)
+        if due('writeTotalBiomassLog', 'totalBiomassLogRate'):
+            logs['writeTotalBiomassLog'].write(
+                str(cycle) + '\t' + '\t'.join(['%.6E' % b for b in
+                                              self.biomass.sum(axis = (1, 2))]) + '\n')
+        if due('writeBiomassLog', 'BiomassLogRate'):
+            lines = []
+            for x, y in occupied:
+                for m, name in enumerate(self.model_names):
+                    if self.biomass[m, x, y] > 0:
+                        lines.append('%d %d %d %s %.6E\n' % (
+                            cycle, x + 1, y + 1, name, self.biomass[m, x, y]))
+            logs['writeBiomassLog'].write(''.join(lines))
+        if due('writeMediaLog', 'MediaLogRate'):
+            lines = []
+            for k, met in enumerate(self.mets):
+                for x, y in np.argwhere(self.media[k] > 0):
+                    lines.append('%s %d %d %d %.6E\n' % (
+                        met, cycle, x + 1, y + 1, self.media[k, x, y]))
+            logs['writeMediaLog'].write(''.join(lines))
+        if due('writeFluxLog', 'FluxLogRate'):
+            lines = []
+            for x, y in occupied:
+                for m in range(len(self.models)):
+                    if self.biomass[m, x, y] > 0:
+                        lines.append('%d %d %d %d ' % (cycle, x + 1, y + 1, m + 1) +
+                                     ' '.join(['%.6E' % v for v in self.flux[m][x, y]]) + '\n')
+            logs['writeFluxLog'].write(''.join(lines))
+        if due('writeVelocityMultiConvLog', 'velocityMultiConvLogRate'):
+            lines = []
+            for x, y in occupied:
+                for m, name in enumerate(self.model_names):
+                    lines.append('%d %s %d %d %.6E %.6E\n' % (
+                        cycle, name, x + 1, y + 1, self.velocity[m, x, y, 0],
+                        self.velocity[m, x, y, 1]))
+            logs['writeVelocityMultiConvLog'].write(''.join(lines))
+        if due('writeSpecificMediaLog', 'specificMediaLogRate'):
+            lines = []
+            for x in range(self.grid[0]):
+                for y in range(self.grid[1]):
+                    lines.append('%d %d %d ' % (cycle, x + 1, y + 1) +
+                                 ' '.join(['%.6E' % self.media[k, x, y]
+                                           for k in self.specific]) + '\n')
+            logs['writeSpecificMediaLog'].write(''.join(lines))
+        for log in logs.values():
+            log.flush()
+
+    def run(self, cycle_delay = 0.):
+        print('Loading layout file')
+        print('Found ' + str(len(self.models)) + ' model files!')
+        sys.stdout.flush()
+        logs = self.open_logs()
+        show_time = _flag(self.params, 'showCycleTime')
+        self.write_logs(logs, 0)
+        for cycle in range(1, int(self.params.get('maxCycles', 100)) + 1):
+            started = time.perf_counter()
+            print('Cycle ' + str(cycle))
+            self.step()
+            if cycle_delay > 0:
+                time.sleep(cycle_delay)
+            print('Total biomass:')
+            for m, total in enumerate(self.biomass.sum(axis = (1, 2))):
+                print('Model #' + str(m + 1) + ': ' + str(total))
+            self.write_logs(logs, cycle)
+            if show_time:
+                print('Cycle time: ' +
+                      str(int((time.perf_counter() - started) * 1000)) + ' ms')
+            sys.stdout.flush()
+        for log in logs.values():
+            log.close()
+        print('End of simulation')
+        sys.stdout.flush()
+
+
+def main(argv):
+    script = argv[argv.index('-script') + 1]
+    cycle_delay = float(argv[argv.index('--cycle-delay') + 1]) \
+        if '--cycle-delay' in argv else 0.
+    fill = float(argv[argv.index('--fill') + 1]) if '--fill' in argv else 0.
+
+    with open(script, 'r') as f:
+        commands = [line.split(None, 1) for line in f if line.strip() != '']
+    files = {}
+    for command, path in commands:
+        files[command] = path.strip()
+        if command == 'load_layout':
+            _simulation(files['load_comets_parameters'],
+                        files['load_package_parameters'],
+                        files['load_layout'], fill).run(cycle_delay)
+            files = {}
+    with open('COMETS_manifest.txt', 'w') as f:
+        f.write('written by cometspy.fake_comets\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -682,7 +682,8 @@ class layout:
         ids = [x.id for x in self.models]
         return(ids)
 
-    def write_necessary_files(self, working_dir : str, to_append = ""):
+    def write_necessary_files(self, working_dir : str, to_append = "",
+                              model_files : dict = None):
         """
         writes the layout and the model files to file
         
@@ -700,11 +701,20 @@ class layout:
             The directory where the files will be written.
         to_append : str, 
             String to append to written filenames
+        model_files : dict, optional
+            paths of already written model files, by model id, for the
+            layout to refer to (see cometspy.model_store). Only the models
+            not in it are written to working_dir.
 
         """
         self.__check_if_initial_pops_in_range()
-        self.write_layout(working_dir, to_append)
-        self.write_model_files(working_dir)
+        self.write_layout(working_dir, to_append, model_files)
+        if model_files is None:
+            self.write_model_files(working_dir)
+        else:
+            for m in self.models:
+                if m.id not in model_files:
+                    m.write_comets_model(working_dir)
 
     def write_model_files(self, working_dir=""):
         '''writes each model file'''
@@ -937,7 +947,7 @@ class layout:
         if met not in self.all_exchanged_mets:
             raise Exception('met is not in the list of exchangeable mets')
         self.__local_media_flag = True
-        if location not in list(self.local_media.keys()):
+        if location not in self.local_media:
             self.local_media[location] = {}
         self.local_media[location][met] = amount
 
@@ -1139,7 +1149,8 @@ class layout:
                                        axis=0, sort=False)
         self.media = self.media.reset_index(drop=True)
 
-    def write_layout(self, working_dir : str, to_append = ""):
+    def write_layout(self, working_dir : str, to_append = "",
+                     model_files : dict = None):
         """
         writes just the COMETS layout file to the supplied path
 
@@ -1147,6 +1158,9 @@ class layout:
         ----------
         working_dir : str
             the path to the directory where .current_layout will be written
+        model_files : dict, optional
+            paths of the model files, by model id. The default, also for
+            models not in it, is ./<model id>.cmd
 
 
         """
@@ -1159,7 +1173,7 @@ class layout:
             os.remove(outfile)
 
         lyt = open(outfile, 'a')
-        self.__write_models_and_world_grid_chunk(lyt)
+        self.__write_models_and_world_grid_chunk(lyt, model_files)
         self.__write_media_chunk(lyt)
         self.__write_diffusion_chunk(lyt)
         self.__write_local_media_chunk(lyt)
@@ -1176,11 +1190,13 @@ class layout:
         self.__write_ext_rxns_chunk(lyt)
         lyt.close()
 
-    def __write_models_and_world_grid_chunk(self, lyt):
+    def __write_models_and_world_grid_chunk(self, lyt, model_files = None):
         """ writes the top 3 lines  to the open lyt file"""
 
-        model_file_line = "{}.cmd".format(".cmd ".join(self.get_model_ids())).split(" ")
-        model_file_line = "".join(["./" + _ + " " for _ in model_file_line])
+        if model_files is None:
+            model_files = {}
+        model_file_line = "".join([model_files.get(model_id, "./" + model_id + ".cmd") + " "
+                                   for model_id in self.get_model_ids()])
         model_file_line = "model_file " + model_file_line + "\n"
         lyt.write(model_file_line)
         lyt.write('  model_world\n')
@@ -906,7 +906,7 @@ class model:
                                  how='left')
             self.default_vmax = float(m_f_lines[lin_vmax-1].split()[1])
         else:
-            reactions['V_MAX'] = np.NaN
+            reactions['V_MAX'] = np.nan
 
         # '''----------- VMAX VALUES --------------------------'''
         if 'KM_VALUES' in m_filedata_string:
@@ -927,7 +927,7 @@ class model:
                                  how='left')
             self.default_km = float(m_f_lines[lin_km-1].split()[1])
         else:
-            reactions['KM'] = np.NaN
+            reactions['KM'] = np.nan
 
         # '''----------- VMAX VALUES --------------------------'''
         if 'HILL_COEFFICIENTS' in m_filedata_string:
@@ -948,7 +948,7 @@ class model:
                                  how='left')
             self.default_hill = float(m_f_lines[lin_hill-1].split()[1])
         else:
-            reactions['HILL'] = np.NaN
+            reactions['HILL'] = np.nan
 
         # '''----------- OBJECTIVE -----------------------------'''
         lin_obj = re.split('OBJECTIVE',
@@ -0,0 +1,224 @@
+'''
+The model_store module shares model files between simulations.
+
+comets.run() normally writes the file of every model into the working
+directory and deletes it afterwards, so a sweep over thousands of
+simulations of the same genome-scale models writes the same multi-megabyte
+file thousands of times. With comets.run(model_store = ...), each distinct
+model is instead written once into a shared directory, under a name given
+by the hash of its contents, and layouts point COMETS at that file. Every
+simulation using a file leaves a marker file next to it while it runs; when
+the last marker is removed the file is deleted, unless the store keeps its
+files.
+'''
+
+import glob
+import hashlib
+import os
+import pickle
+import shutil
+import socket
+import time
+
+# changed when model.write_comets_model writes different files for the same
+# model, so that files written by older versions are not reused
+_FORMAT = b'1'
+
+
+class model_store:
+    """
+    a directory of model files shared by simulations, each written once
+
+    Each model is stored as <directory>/<hash>/<model id>.cmd, where hash is
+    the sha256 of the model's contents (everything but its initial
+    population, which goes into the layout). The store may be shared by
+    simulations in different processes, e.g. with run_many() or sweep(),
+    and by different machines on a shared filesystem.
+
+    Parameters
+    ----------
+
+    directory : str
+        the directory of the store. It is created if needed. Its absolute
+        path must not contain whitespace, since layouts list model files
+        on one whitespace-separated line.
+    keep : bool, optional
+        Whether to keep files no simulation uses any more, so that later
+        simulations can reuse them. Use clear() to delete them. The default
+        is False, which deletes a file once its last simulation is done.
+
+    Attributes
+    ----------
+
+    directory : str
+        the absolute path of the store
+    keep : bool
+        whether unused files are kept
+    writes : int
+        model files written by this object
+    reuses : int
+        model files this object found already written
+
+    Examples
+    --------
+
+    >>> from cometspy.model_store import model_store
+    >>> store = model_store("/scratch/comets_models", keep = True)
+    >>> results = sweep(layout, params, axes,
+    >>>                 run_kwargs = {"model_store": store})
+    >>> store.clear()
+
+    """
+    def __init__(self, directory : str, keep : bool = False):
+        self.directory = os.path.abspath(directory)
+        if len(self.directory.split()) != 1:
+            raise ValueError("the model store directory " + self.directory +
+                             " contains whitespace, which COMETS cannot "
+                             "read in the model_file line of a layout")
+        self.keep = keep
+        self.writes = 0
+        self.reuses = 0
+        os.makedirs(self.directory, exist_ok = True)
+
+    def key(self, m) -> str:
+        """ returns the hash of the contents of the cometspy model m """
+        contents = {name: value for name, value in m.__dict__.items()
+                    if name != 'initial_pop'}
+        digest = hashlib.sha256(_FORMAT)
+        digest.update(pickle.dumps(contents, protocol = 4))
+        return(digest.hexdigest())
+
+    def acquire(self, m, owner : str) -> str:
+        """
+        returns the path of the stored file of model m, writing it if it is
+        not stored yet, and marks it as used by owner
+
+        Parameters
+        ----------
+
+        m : cometspy.model
+            the model
+        owner : str
+            a name of the user of the file, unique among simultaneous users,
+            to be given to release()
+
+        Returns
+        -------
+
+        str
+            the absolute path of the model file
+
+        """
+        folder = os.path.join(self.directory, self.key(m))
+        os.makedirs(folder, exist_ok = True)
+        path = os.path.join(folder, m.id + '.cmd')
+        with _lock(folder):
+            open(_marker(path, owner), 'w').close()
+            if os.path.isfile(path):
+                self.reuses += 1
+            else:
+                m.write_comets_model(folder + '/')
+                self.writes += 1
+        return(path)
+
+    def release(self, path : str, owner : str):
+        """
+        marks the file at path as no longer used by owner. If no one uses it
+        any more and the store does not keep files, it is deleted.
+
+        Parameters
+        ----------
+
+        path : str
+            a path returned by acquire()
+        owner : str
+            the owner given to acquire()
+
+        """
+        folder = os.path.dirname(path)
+        with _lock(folder):
+            marker = _marker(path, owner)
+            if os.path.isfile(marker):
+                os.remove(marker)
+            if not self.keep and self.references(path) == 0 \
+                    and os.path.isfile(path):
+                os.remove(path)
+        if not self.keep:
+            try:
+                os.rmdir(folder)  # only if no other model file is in it
+            except OSError:
+                pass
+
+    def references(self, path : str) -> int:
+        """ returns the number of users of the file at path """
+        return(len(glob.glob(glob.escape(path) + '.*.ref')))
+
+    def prune(self):
+        """
+        removes the markers left by processes of this machine which have
+        ended without releasing their files, e.g. because they were killed,
+        then deletes unused files unless the store keeps them
+        """
+        host = socket.gethostname()
+        for marker in glob.glob(os.path.join(self.directory, '*', '*.cmd.*.ref')):
+            end = marker.rindex('.cmd.') + len('.cmd')
+            path, owner = marker[:end], marker[end + 1:-len('.ref')]
+            owner_host, pid, _ = (owner.rsplit('-', 2) + ['', ''])[:3]
+            if owner_host != host or not pid.isdigit() or _alive(int(pid)):
+                continue
+            self.release(path, owner)
+
+    def clear(self):
+        """ deletes every stored file, whether used or not """
+        for folder in glob.glob(os.path.join(self.directory, '*')):
+            shutil.rmtree(folder, ignore_errors = True)
+
+
+def owner_name(obj) -> str:
+    """ returns an owner name for acquire() which is unique to obj among
+    the objects of all processes on all machines using a store """
+    return(socket.gethostname() + '-' + str(os.getpid()) + '-' + hex(id(obj)))
+
+
+def _marker(path, owner):
+    return(path + '.' + owner + '.ref')
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return(False)
+    except OSError:
+        pass  # e.g. not permitted: the process exists
+    return(True)
+
+
+class _lock:
+    """ a lock on a store folder, shared between processes, taken by
+    creating a lock file. A lock left by a killed process expires after a
+    minute. """
+    def __init__(self, folder):
+        self.path = os.path.join(folder, '.lock')
+
+    def __enter__(self):
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return(self)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > 60:
+                        os.remove(self.path)
+                except OSError:
+                    pass
+                time.sleep(0.01)
+            except FileNotFoundError:
+                # the folder was removed by a release; make it again
+                os.makedirs(os.path.dirname(self.path), exist_ok = True)
+
+    def __exit__(self, *args):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
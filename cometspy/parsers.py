@@ -0,0 +1,793 @@
+'''
+The parsers module reads the text logs written by COMETS.
+
+comets.run() uses these functions to read its logs, but they can also be
+used directly on logs kept with comets.run(delete_files = False).
+
+Every reader looks at a small sample of the file once to decide whether
+numbers use a comma or a point as the decimal separator, and then reads the
+whole file in a single pass with pandas' C parser and fixed column dtypes,
+so no type inference or second read is needed.
+
+read_media_totals and read_flux_totals reduce the media and flux logs to a
+sum, mean or maximum over all locations at each cycle while reading them,
+so the spatial tables are never built.
+'''
+
+import copy
+import io
+import re
+import numpy as np
+import pandas as pd
+
+# a number written with a comma as the decimal separator, e.g. 1,5E-6
+_COMMA_DECIMAL = re.compile(r'^[-+]?\d*,\d+([eE][-+]?\d+)?$')
+
+BIOMASS_COLUMNS = ['cycle', 'x', 'y', 'species', 'biomass']
+MEDIA_COLUMNS = ['metabolite', 'cycle', 'x', 'y', 'conc_mmol']
+VELOCITY_COLUMNS = ['cycle', 'species', 'x', 'y', 'velocityX', 'velocityY']
+GENOTYPES_COLUMNS = ['Ancestor', 'Mutation', 'Species']
+
+# how the locations of a cycle can be aggregated
+STATS = ['sum', 'mean', 'max']
+
+
+def detect_decimal(path, sample_size : int = 65536) -> str:
+    """
+    returns the decimal separator used in a COMETS log
+
+    Some locales make COMETS write numbers such as 1,5E-6. Only the first
+    sample_size bytes of the file are examined.
+
+    Parameters
+    ----------
+
+    path : str or file-like
+        the log file
+    sample_size : int, optional
+        number of bytes to examine. The default is 65536.
+
+    Returns
+    -------
+
+    str
+        either "," or "."
+
+    """
+    if hasattr(path, 'read'):
+        return('.')
+    with open(path, 'r') as f:
+        sample = f.read(sample_size)
+    for token in sample.split():
+        if _COMMA_DECIMAL.match(token):
+            return(',')
+    return('.')
+
+
+class log_filter:
+    """
+    a selection of log rows to keep while reading COMETS logs
+
+    A log_filter given to comets.run(where = ...) or to the read functions
+    in this module is applied to each chunk of a log as it is read, so rows
+    outside of the selection are never held in memory all at once. Every
+    criterion is optional; None keeps everything.
+
+    Parameters
+    ----------
+
+    metabolites : list(str), optional
+        metabolites to keep in the media log
+    species : list(str), optional
+        model ids to keep in the biomass, flux, velocity and total biomass
+        logs
+    reactions : list(str), optional
+        reaction names to keep in comets.fluxes_by_species
+    cycles : tuple(int, int), optional
+        the first and last cycle to keep (inclusive)
+    x : tuple(int, int), optional
+        the first and last x to keep (inclusive), as written in the logs,
+        i.e. starting at 1
+    y : tuple(int, int), optional
+        the first and last y to keep (inclusive), as written in the logs
+    cycle_step : int, optional
+        keep only every cycle_step-th cycle, counted from the first cycle
+        of cycles (or 0), i.e. the cycles whose distance to it is a
+        multiple of cycle_step. It should be a multiple of the log rates.
+    block : int or tuple(int, int), optional
+        the width and height of blocks of locations to aggregate the
+        biomass, media, velocity and flux logs over. x and y are then
+        block numbers, starting at 1, and each block has one row per cycle
+        (and species or metabolite). An int makes square blocks.
+    block_agg : str, optional
+        how blocks are aggregated: "sum", "mean" or "max". Means are over
+        the block's locations within x, y and grid, including those not
+        logged (e.g. without biomass). The default is "sum".
+    grid : tuple(int, int), optional
+        the width and height of the grid, so that blocks at its edges which
+        it cuts off are averaged over their locations in it. comets.run()
+        sets it from the layout.
+
+    Examples
+    --------
+
+    >>> from cometspy.parsers import log_filter
+    >>> where = log_filter(metabolites = ["glc__D_e", "ac_e", "o2_e"],
+    >>>                    cycles = (0, 500), x = (1, 50), y = (1, 50))
+    >>> sim.run(where = where)
+    >>> # coarse snapshots of a 400x400 grid logged every cycle
+    >>> sim.run(where = log_filter(cycle_step = 100, block = 4,
+    >>>                            block_agg = "mean"))
+
+    """
+    def __init__(self, metabolites : list = None, species : list = None,
+                 reactions : list = None, cycles : tuple = None,
+                 x : tuple = None, y : tuple = None, cycle_step : int = None,
+                 block = None, block_agg : str = 'sum', grid : tuple = None):
+        self.metabolites = metabolites
+        self.species = species
+        self.reactions = reactions
+        self.cycles = cycles
+        self.x = x
+        self.y = y
+        if cycle_step is not None and cycle_step < 1:
+            raise ValueError("cycle_step must be at least 1")
+        self.cycle_step = cycle_step
+        if isinstance(block, int):
+            block = (block, block)
+        if block is not None and min(block) < 1:
+            raise ValueError("block must be at least 1 by 1")
+        self.block = None if block is None else tuple(block)
+        _check_stat(block_agg)
+        self.block_agg = block_agg
+        self.grid = None if grid is None else tuple(grid)
+
+    def mask(self, cycle : pd.Series = None, x : pd.Series = None,
+             y : pd.Series = None) -> np.ndarray:
+        """ returns a boolean array, True where the given cycle, x and y
+        columns are within the selected ranges """
+        keep = None
+        for values, bounds in ((cycle, self.cycles), (x, self.x), (y, self.y)):
+            if values is None or bounds is None:
+                continue
+            in_range = ((values >= bounds[0]) & (values <= bounds[1])).to_numpy()
+            keep = in_range if keep is None else keep & in_range
+        if cycle is not None and self.cycle_step is not None:
+            first = 0 if self.cycles is None else self.cycles[0]
+            on_step = ((cycle - first) % self.cycle_step == 0).to_numpy()
+            keep = on_step if keep is None else keep & on_step
+        return(keep)
+
+    def locations(self, grid : tuple) -> int:
+        """ returns the number of locations of a grid of the given width
+        and height within the x and y ranges """
+        lows, highs = self.__bounds(grid)
+        return(int(np.prod([max(high - low + 1, 0)
+                            for low, high in zip(lows, highs)])))
+
+    def __bounds(self, grid):
+        # the first and last x and y selected, within the grid if known
+        lows, highs = [], []
+        for bounds, size in zip((self.x, self.y), grid or (None, None)):
+            low, high = (1, np.inf) if bounds is None else bounds
+            lows.append(max(low, 1))
+            highs.append(high if size is None else min(high, size))
+        return(lows, highs)
+
+    def apply(self, log : pd.DataFrame) -> pd.DataFrame:
+        """ returns the rows of a parsed log chunk which pass the filter,
+        aggregated over blocks if block is set """
+        keep = self.mask(log.get('cycle'), log.get('x'), log.get('y'))
+        for column, wanted in (('metabolite', self.metabolites),
+                               ('species', self.species)):
+            if wanted is not None and column in log.columns:
+                in_set = log[column].isin(wanted).to_numpy()
+                keep = in_set if keep is None else keep & in_set
+        if keep is not None:
+            log = log.loc[keep]
+        return(self.blocks(log))
+
+    def apply_total_biomass(self, total_biomass : pd.DataFrame,
+                            model_ids : list) -> pd.DataFrame:
+        """ returns the rows and species columns of a parsed total biomass
+        log, whose species are the columns model_ids, which pass the
+        filter """
+        keep = self.mask(total_biomass['cycle'])
+        if keep is not None:
+            total_biomass = total_biomass.loc[keep].reset_index(drop = True)
+        if self.species is not None:
+            total_biomass = total_biomass[['cycle'] + [m for m in model_ids
+                                                       if m in self.species]]
+        return(total_biomass)
+
+    def blocks(self, log : pd.DataFrame, keys : list = None, x = 'x',
+               y = 'y') -> pd.DataFrame:
+        """ returns a parsed log chunk aggregated over blocks of locations,
+        or the chunk itself if block is not set. Rows are grouped by the
+        columns keys, by default those of cycle, x, y, species and
+        metabolite; x and y name the location columns. """
+        if self.block is None or x not in log.columns:
+            return(log)
+        log = log.copy()
+        log[x] = (log[x] - 1) // self.block[0] + 1
+        log[y] = (log[y] - 1) // self.block[1] + 1
+        log = self.__aggregate(log, keys)
+        if self.block_agg == 'mean':
+            # linear, so the means of chunks of a block still add up
+            values = [c for c in log.columns if c not in self.__keys(log, keys)]
+            log[values] = log[values].div(self.__block_areas(log[x], log[y]),
+                                          axis = 0)
+        return(log)
+
+    def __block_areas(self, x, y):
+        # the number of selected locations of each block, which is less
+        # than width * height where x, y or the grid cut it off
+        area = 1
+        for numbers, size, low, high in zip((x, y), self.block,
+                                            *self.__bounds(self.grid)):
+            first = np.maximum((numbers - 1) * size + 1, low)
+            last = np.minimum(numbers * size, high)
+            area = area * (last - first + 1).clip(lower = 0)
+        return(area)
+
+    def combine(self, log : pd.DataFrame, keys : list = None) -> pd.DataFrame:
+        """ merges the rows of blocks which were split between chunks of
+        a log, after the chunks returned by apply() or blocks() were
+        concatenated """
+        if self.block is None or len(log) == 0:
+            return(log)
+        return(self.__aggregate(log, keys).reset_index(drop = True))
+
+    def __keys(self, log, keys):
+        if keys is not None:
+            return(list(keys))
+        return([c for c in log.columns
+                if c in ('cycle', 'x', 'y', 'species', 'metabolite')])
+
+    def __aggregate(self, log, keys):
+        keys = self.__keys(log, keys)
+        # in order of first appearance, which is the order of the log
+        grouped = log.groupby(keys, sort = False)
+        if self.block_agg == 'max':
+            aggregated = grouped.max()
+        else:
+            aggregated = grouped.sum(min_count = 1)
+        return(aggregated.reset_index()[list(log.columns)])
+
+
+def _read_log(path, names : list, dtype : dict, decimal : str = None,
+              header = None, select = None, prepare = None,
+              chunksize : int = 1000000, reduce = None) -> pd.DataFrame:
+    """ reads a whitespace-separated COMETS log in one pass. sep = r'\\s+' is
+    handled by pandas' C tokenizer, not by the regex-based python engine.
+
+    prepare, if given, is applied to the parsed rows (e.g. to clean species
+    names). With a select function (e.g. log_filter.apply), the log is read
+    in chunks of chunksize rows and only select(chunk) of each is kept. With
+    a reduce function, the log is read in chunks too, and the list of
+    reduce(chunk) of each is returned. """
+    if decimal is None:
+        decimal = detect_decimal(path)
+    if select is None and reduce is None:
+        log = pd.read_csv(path, sep = r'\s+', header = header, names = names,
+                          dtype = dtype, decimal = decimal, engine = 'c')
+        return(log if prepare is None else prepare(log))
+    chunks = []
+    # not a context manager before pandas 1.2
+    reader = pd.read_csv(path, sep = r'\s+', header = header, names = names,
+                         dtype = dtype, decimal = decimal, engine = 'c',
+                         chunksize = chunksize)
+    try:
+        for chunk in reader:
+            if prepare is not None:
+                chunk = prepare(chunk)
+            if select is not None:
+                chunk = select(chunk)
+            chunks.append(chunk if reduce is None else reduce(chunk))
+    finally:
+        reader.close()
+    if reduce is not None:
+        return(chunks)
+    return(pd.concat(chunks, ignore_index = True))
+
+
+def _without_blocks(where : log_filter) -> log_filter:
+    """ returns where without its blocks, for totals over locations """
+    if where is None or where.block is None:
+        return(where)
+    where = copy.copy(where)
+    where.block = None
+    return(where)
+
+
+def _check_stat(stat : str):
+    if stat not in STATS:
+        raise ValueError("stat must be one of " + ", ".join(STATS))
+
+
+def _partial_stat(chunk : pd.DataFrame, by : list, stat : str) -> tuple:
+    """ aggregates the locations of a chunk of a log for _combine_stats().
+    Returns the sums or maxima by the columns by, and, for means, the
+    number of locations. """
+    grouped = chunk.drop(columns = ['x', 'y']).groupby(by, sort = False)
+    if stat == 'max':
+        return((grouped.max(), None))
+    return((grouped.sum(), grouped.size() if stat == 'mean' else None))
+
+
+def _combine_stats(partials : list, by : list, stat : str,
+                   n_locations : int = None) -> pd.DataFrame:
+    """ combines the _partial_stat() of each chunk of a log """
+    grouped = pd.concat([part for part, _ in partials]).groupby(level = by)
+    if stat == 'max':
+        return(grouped.max().reset_index())
+    total = grouped.sum()
+    if stat == 'mean':
+        if n_locations is None:
+            counts = pd.concat([count for _, count in partials])
+            total = total.div(counts.groupby(level = by).sum(), axis = 0)
+        else:
+            total = total / n_locations
+    return(total.reset_index())
+
+
+def aggregate_locations(log : pd.DataFrame, stat : str = 'sum',
+                        n_locations : int = None) -> pd.DataFrame:
+    """
+    aggregates an already read spatial log over its locations
+
+    This gives the same result as read_media_totals or read_flux_totals
+    for a log which is already in memory.
+
+    Parameters
+    ----------
+
+    log : pandas.DataFrame
+        a media, biomass or velocity log, or a table of fluxes_by_species
+    stat : str, optional
+        "sum", "mean" or "max". The default is "sum".
+    n_locations : int, optional
+        the number of locations of the grid, which means are taken over.
+        The default is the number of locations logged at each cycle.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        the log without its x and y columns, with one row per cycle (and
+        metabolite or species)
+
+    """
+    _check_stat(stat)
+    by = [column for column in ('metabolite', 'species', 'cycle')
+          if column in log.columns]
+    return(_combine_stats([_partial_stat(log, by, stat)], by, stat, n_locations))
+
+
+def _strip_model_extension(log : pd.DataFrame) -> pd.DataFrame:
+    """ cuts off the .cmd extension which COMETS keeps in species names """
+    log['species'] = log['species'].str.replace(r'\.cmd$', '', regex = True)
+    return(log)
+
+
+def read_total_biomass(path, model_ids : list,
+                       decimal : str = None,
+                       where : log_filter = None) -> pd.DataFrame:
+    """
+    reads a total biomass log
+
+    Parameters
+    ----------
+
+    path : str or file-like
+        the log file
+    model_ids : list(str)
+        the ids of the models, in layout order
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        cycles and species to keep. The default is to keep all.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns cycle and one column per model id
+
+    """
+    dtype = {model_id: 'float64' for model_id in model_ids}
+    dtype['cycle'] = 'int64'
+    total_biomass = _read_log(path, ['cycle'] + list(model_ids), dtype, decimal)
+    if where is not None:
+        total_biomass = where.apply_total_biomass(total_biomass, model_ids)
+    return(total_biomass)
+
+
+def read_biomass(path, decimal : str = None,
+                 where : log_filter = None) -> pd.DataFrame:
+    """
+    reads a spatial biomass log
+
+    Parameters
+    ----------
+
+    path : str or file-like
+        the log file
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        rows to keep. The default is to keep all.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns cycle, x, y, species and biomass
+
+    """
+    biomass = _read_log(path, BIOMASS_COLUMNS,
+                        {'cycle': 'int64', 'x': 'int64', 'y': 'int64',
+                         'species': 'str', 'biomass': 'float64'}, decimal,
+                        select = None if where is None else where.apply,
+                        prepare = _strip_model_extension)
+    return(biomass if where is None else where.combine(biomass))
+
+
+def read_media(path, decimal : str = None,
+               where : log_filter = None) -> pd.DataFrame:
+    """
+    reads a spatial media log
+
+    Parameters
+    ----------
+
+    path : str or file-like
+        the log file
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        rows to keep. The default is to keep all.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns metabolite, cycle, x, y and conc_mmol
+
+    """
+    media = _read_log(path, MEDIA_COLUMNS,
+                      {'metabolite': 'str', 'cycle': 'int64', 'x': 'int64',
+                       'y': 'int64', 'conc_mmol': 'float64'}, decimal,
+                      select = None if where is None else where.apply)
+    return(media if where is None else where.combine(media))
+
+
+def read_media_totals(path, stat : str = 'sum', n_locations : int = None,
+                      decimal : str = None, where : log_filter = None,
+                      chunksize : int = 1000000) -> pd.DataFrame:
+    """
+    reads a spatial media log aggregated over its locations
+
+    The log is read in chunks, each reduced to its sum or maximum by
+    metabolite and cycle, so only one chunk and these small tables are in
+    memory at once.
+
+    Parameters
+    ----------
+
+    path : str or file-like
+        the log file
+    stat : str, optional
+        "sum", "mean" or "max" of the locations. The default is "sum".
+    n_locations : int, optional
+        the number of locations which means are taken over, e.g.
+        where.locations(grid). COMETS only logs locations where a
+        metabolite is present, so the default, the number of logged
+        locations, ignores locations without it.
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        rows to aggregate. The default is all. Its blocks are ignored, as
+        every location is aggregated.
+    chunksize : int, optional
+        the number of rows read at once. The default is 1000000.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns metabolite, cycle and conc_mmol
+
+    Examples
+    --------
+
+    >>> from cometspy.parsers import read_media_totals
+    >>> totals = read_media_totals("medialog.txt")
+    >>> peaks = read_media_totals("medialog.txt", "max")
+
+    """
+    _check_stat(stat)
+    by = ['metabolite', 'cycle']
+    where = _without_blocks(where)
+    partials = _read_log(path, MEDIA_COLUMNS,
+                         {'metabolite': 'str', 'cycle': 'int64', 'x': 'int64',
+                          'y': 'int64', 'conc_mmol': 'float64'}, decimal,
+                         select = None if where is None else where.apply,
+                         chunksize = chunksize,
+                         reduce = lambda chunk: _partial_stat(chunk, by, stat))
+    return(_combine_stats(partials, by, stat, n_locations))
+
+
+def read_fluxes(path, n_columns : int, decimal : str = None,
+                where : log_filter = None,
+                model_ids : list = None) -> pd.DataFrame:
+    """
+    reads a flux log into one DataFrame padded to n_columns
+
+    Rows are cycle, x, y, model number (starting at 1) and then that
+    model's fluxes, so rows of models with fewer reactions end in NaN.
+
+    Parameters
+    ----------
+
+    path : str or file-like
+        the log file
+    n_columns : int
+        4 + the number of reactions of the largest model
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        cycles, locations and species to keep. The default is to keep all.
+    model_ids : list(str), optional
+        the ids of the models, in layout order. Needed to select species.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns numbered from 0 to n_columns - 1
+
+    """
+    dtype = {i: 'float64' for i in range(n_columns)}
+    for i in range(4):
+        dtype[i] = 'int64'
+    select = None
+    if where is not None:
+        model_numbers = None
+        if where.species is not None and model_ids is not None:
+            model_numbers = [i + 1 for i, model_id in enumerate(model_ids)
+                             if model_id in where.species]
+
+        def select(chunk):
+            keep = where.mask(chunk[0], chunk[1], chunk[2])
+            if model_numbers is not None:
+                in_set = chunk[3].isin(model_numbers).to_numpy()
+                keep = in_set if keep is None else keep & in_set
+            if keep is not None:
+                chunk = chunk.loc[keep]
+            return(where.blocks(chunk, [0, 1, 2, 3], 1, 2))
+    fluxes = _read_log(path, list(range(n_columns)), dtype, decimal,
+                       select = select)
+    return(fluxes if where is None else where.combine(fluxes, [0, 1, 2, 3]))
+
+
+def _read_flux_chunks(path, models : list, decimal : str, where : log_filter,
+                      chunksize : int, reduce) -> dict:
+    """ reads a flux log line by line into per-model buffers, and parses
+    full buffers with the C parser into columns sized to their model.
+    Returns, for each model id, the list of reduce(chunk) of its chunks.
+    Lines of models or reactions which where excludes are never parsed. """
+    if decimal is None:
+        decimal = detect_decimal(path)
+    buffers = {}
+    parsed = {}
+    for i, (model_id, reaction_names) in enumerate(models):
+        if where is not None and where.species is not None and \
+                model_id not in where.species:
+            continue
+        names = ['cycle', 'x', 'y', 'model'] + list(reaction_names)
+        if where is not None and where.reactions is not None:
+            usecols = ['cycle', 'x', 'y'] + [r for r in reaction_names
+                                             if r in where.reactions]
+        else:
+            usecols = ['cycle', 'x', 'y'] + list(reaction_names)
+        dtype = {r: 'float64' for r in reaction_names}
+        dtype.update({'cycle': 'int64', 'x': 'int64', 'y': 'int64',
+                      'model': 'int64'})
+        buffers[str(i + 1)] = (model_id, names, usecols, dtype, [])
+        parsed[model_id] = []
+
+    def parse(buffer):
+        model_id, names, usecols, dtype, lines = buffer
+        if not lines:
+            parsed[model_id].append(reduce(pd.DataFrame(
+                {column: pd.Series(dtype = dtype[column]) for column in usecols})))
+            return
+        chunk = pd.read_csv(io.StringIO(''.join(lines)), sep = r'\s+',
+                            header = None, names = names, usecols = usecols,
+                            dtype = dtype, decimal = decimal, engine = 'c')
+        del lines[:]
+        if where is not None:
+            keep = where.mask(chunk['cycle'], chunk['x'], chunk['y'])
+            if keep is not None:
+                chunk = chunk.loc[keep]
+            chunk = where.blocks(chunk)
+        parsed[model_id].append(reduce(chunk))
+
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.split(None, 4)
+            if len(fields) < 4:
+                continue
+            buffer = buffers.get(fields[3])
+            if buffer is None:
+                continue
+            buffer[4].append(line)
+            if len(buffer[4]) >= chunksize:
+                parse(buffer)
+    for buffer in buffers.values():
+        if buffer[4] or not parsed[buffer[0]]:
+            parse(buffer)
+    return(parsed)
+
+
+def read_fluxes_by_species(path, models : list, decimal : str = None,
+                           where : log_filter = None,
+                           chunksize : int = 100000) -> dict:
+    """
+    reads a flux log directly into one DataFrame per model
+
+    Unlike read_fluxes, rows are not padded to the largest model. The log is
+    read once, line by line; each line is put in its model's buffer
+    according to its model number, and full buffers are parsed with the C
+    parser into columns sized to that model. Lines of models or reactions
+    which the where filter excludes are never parsed.
+
+    Parameters
+    ----------
+
+    path : str
+        the log file
+    models : list(tuple(str, list(str)))
+        the id and reaction names of each model, in layout order
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        cycles, locations, species and reactions to keep. The default is to
+        keep all.
+    chunksize : int, optional
+        the number of lines of one model parsed at once. The default is
+        100000.
+
+    Returns
+    -------
+
+    dict(str, pandas.DataFrame)
+        for each model id, columns cycle, x, y and one per reaction
+
+    """
+    parsed = _read_flux_chunks(path, models, decimal, where, chunksize,
+                               lambda chunk: chunk)
+    fluxes = {model_id: pd.concat(chunks, ignore_index = True)
+              for model_id, chunks in parsed.items()}
+    if where is not None:
+        fluxes = {model_id: where.combine(log) for model_id, log in fluxes.items()}
+    return(fluxes)
+
+
+def read_flux_totals(path, models : list, stat : str = 'sum',
+                     n_locations : int = None, decimal : str = None,
+                     where : log_filter = None,
+                     chunksize : int = 100000) -> dict:
+    """
+    reads a flux log aggregated over its locations, per model
+
+    The log is read as by read_fluxes_by_species, but each parsed chunk is
+    reduced to its sum or maximum by cycle, so the spatial tables are never
+    built.
+
+    Parameters
+    ----------
+
+    path : str
+        the log file
+    models : list(tuple(str, list(str)))
+        the id and reaction names of each model, in layout order
+    stat : str, optional
+        "sum", "mean" or "max" of the locations. The default is "sum".
+    n_locations : int, optional
+        the number of locations which means are taken over, e.g.
+        where.locations(grid). COMETS only logs the fluxes of locations
+        where a species is, so the default, the number of logged
+        locations, ignores the others.
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        cycles, locations, species and reactions to aggregate. The default
+        is all. Its blocks are ignored, as every location is aggregated.
+    chunksize : int, optional
+        the number of lines of one model parsed at once. The default is
+        100000.
+
+    Returns
+    -------
+
+    dict(str, pandas.DataFrame)
+        for each model id, columns cycle and one per reaction
+
+    Examples
+    --------
+
+    >>> from cometspy.parsers import read_flux_totals
+    >>> models = [(m.id, list(m.reactions.REACTION_NAMES)) for m in layout.models]
+    >>> totals = read_flux_totals("fluxlog.txt", models)
+    >>> totals["iJO1366"][["cycle", "EX_glc__D_e"]]
+
+    """
+    _check_stat(stat)
+    where = _without_blocks(where)
+    parsed = _read_flux_chunks(path, models, decimal, where, chunksize,
+                               lambda chunk: _partial_stat(chunk, ['cycle'], stat))
+    return({model_id: _combine_stats(partials, ['cycle'], stat, n_locations)
+            for model_id, partials in parsed.items()})
+
+
+def read_velocity(path, decimal : str = None,
+                  where : log_filter = None) -> pd.DataFrame:
+    """
+    reads a multispecies convection velocity log
+
+    Parameters
+    ----------
+
+    path : str or file-like
+        the log file
+    decimal : str, optional
+        the decimal separator. The default is to detect it.
+    where : log_filter, optional
+        rows to keep. The default is to keep all.
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns cycle, species, x, y, velocityX and velocityY
+
+    """
+    velocity = _read_log(path, VELOCITY_COLUMNS,
+                         {'cycle': 'int64', 'species': 'str', 'x': 'int64',
+                          'y': 'int64', 'velocityX': 'float64',
+                          'velocityY': 'float64'}, decimal,
+                         select = None if where is None else where.apply,
+                         prepare = _strip_model_extension)
+    return(velocity if where is None else where.combine(velocity))
+
+
+def read_specific_media(path, decimal : str = None) -> pd.DataFrame:
+    """
+    reads a specific media log, which has a header naming its columns
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns as named in the log's header
+
+    """
+    if decimal is None:
+        decimal = detect_decimal(path)
+    return(pd.read_csv(path, sep = r'\s+', decimal = decimal, engine = 'c'))
+
+
+def read_genotypes(path) -> pd.DataFrame:
+    """
+    reads the genotypes log of an evolution simulation
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        columns Ancestor, Mutation and Species
+
+    """
+    return(_read_log(path, GENOTYPES_COLUMNS, None, '.'))
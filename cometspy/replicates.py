@@ -0,0 +1,395 @@
+'''
+The replicates module runs a simulation many times with different seeds.
+
+Simulations with demographic noise (model.add_noise_variance_parameter) or
+neutral drift (model.add_neutral_drift_parameter) give different results
+for each value of the randomSeed parameter. run_replicates() runs one
+replicate per seed in parallel with cometspy.comets.iter_run_many, and
+summarizes the total biomass and, optionally, the spatial biomass and media
+of the replicates as they finish. Each replicate is added to running
+statistics (Welford's mean and variance, minimum and maximum) and to a
+fixed-size random sample of replicates from which quantiles are taken, then
+discarded, so memory does not grow with the number of replicates.
+'''
+
+import copy
+import numpy as np
+import pandas as pd
+
+from cometspy.comets import comets, iter_run_many
+from cometspy import cube
+
+# the spatial results which can be summarized, and the log each needs
+_SPATIAL_LOGS = {'biomass': 'writeBiomassLog', 'media': 'writeMediaLog'}
+
+
+class running_stats:
+    """
+    the count, mean, variance, minimum and maximum of arrays added one at a
+    time
+
+    Uses Welford's algorithm, which is numerically stable and keeps only a
+    few arrays of the given shape. NaN values are skipped, so each element
+    has its own count.
+
+    Parameters
+    ----------
+
+    shape : tuple(int)
+        the shape of the arrays to add
+
+    Attributes
+    ----------
+
+    count : numpy.ndarray
+        how many non-NaN values each element has seen
+    mean : numpy.ndarray
+        the mean of each element, NaN where count is 0
+    min : numpy.ndarray
+        the minimum of each element
+    max : numpy.ndarray
+        the maximum of each element
+
+    Examples
+    --------
+
+    >>> stats = running_stats((3,))
+    >>> for values in ([1., 2., 3.], [3., 2., 1.]):
+    >>>     stats.add(np.array(values))
+    >>> stats.mean, stats.variance
+
+    """
+    def __init__(self, shape : tuple):
+        self.count = np.zeros(shape, dtype = 'int64')
+        self.mean = np.full(shape, np.nan)
+        self.min = np.full(shape, np.nan)
+        self.max = np.full(shape, np.nan)
+        self.__m2 = np.zeros(shape)
+
+    def add(self, values : np.ndarray):
+        """ adds one array of values """
+        values = np.asarray(values, dtype = 'float64')
+        valid = ~np.isnan(values)
+        self.count += valid
+        first = valid & (self.count == 1)
+        self.mean[first] = 0.
+        delta = np.where(valid, values - self.mean, 0.)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            self.mean += np.where(valid, delta / self.count, 0.)
+        self.__m2 += np.where(valid, delta * (values - self.mean), 0.)
+        self.min = np.where(valid, np.fmin(self.min, values), self.min)
+        self.max = np.where(valid, np.fmax(self.max, values), self.max)
+
+    @property
+    def variance(self) -> np.ndarray:
+        """ the sample variance (ddof = 1), NaN where count is below 2 """
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return(np.where(self.count > 1, self.__m2 / (self.count - 1), np.nan))
+
+    @property
+    def std(self) -> np.ndarray:
+        """ the sample standard deviation """
+        return(np.sqrt(self.variance))
+
+
+class quantile_reservoir:
+    """
+    a uniform random sample of at most size of the arrays added, from which
+    quantiles are estimated
+
+    Reservoir sampling keeps every added array with equal probability, so
+    the quantiles are those of a random subset of the arrays. They are exact
+    while no more than size arrays were added. Memory is size arrays of the
+    given shape.
+
+    Parameters
+    ----------
+
+    shape : tuple(int)
+        the shape of the arrays to add
+    size : int, optional
+        the most arrays kept. The default is 100.
+    seed : int, optional
+        seed of the random number generator
+
+    """
+    def __init__(self, shape : tuple, size : int = 100, seed : int = None):
+        self.size = size
+        self.n = 0
+        self.__sample = np.full((size,) + tuple(shape), np.nan)
+        self.__rng = np.random.default_rng(seed)
+
+    def add(self, values : np.ndarray):
+        """ adds one array of values """
+        if self.n < self.size:
+            self.__sample[self.n] = values
+        else:
+            slot = self.__rng.integers(0, self.n + 1)
+            if slot < self.size:
+                self.__sample[slot] = values
+        self.n += 1
+
+    @property
+    def exact(self) -> bool:
+        """ whether every added array is in the sample """
+        return(self.n <= self.size)
+
+    def quantiles(self, q : list) -> np.ndarray:
+        """ returns the quantiles q of each element, with shape
+        (len(q),) + shape, ignoring NaN """
+        kept = self.__sample[:min(self.n, self.size)]
+        with np.errstate(invalid = 'ignore'):
+            return(np.nanquantile(kept, q, axis = 0))
+
+
+class _summary:
+    """ running statistics and a quantile reservoir of arrays of one shape """
+    def __init__(self, shape, reservoir_size, seed):
+        self.stats = running_stats(shape)
+        self.reservoir = None
+        if reservoir_size is not None:
+            self.reservoir = quantile_reservoir(shape, reservoir_size, seed)
+
+    def add(self, values):
+        self.stats.add(values)
+        if self.reservoir is not None:
+            self.reservoir.add(values)
+
+    def get(self, stat):
+        if stat in ('count', 'mean', 'min', 'max', 'variance', 'std'):
+            return(getattr(self.stats, stat))
+        if self.reservoir is None:
+            raise ValueError("quantiles were not kept for this result")
+        return(self.reservoir.quantiles([float(stat)])[0])
+
+
+class replicate_results:
+    """
+    the summary of the replicates of a simulation, made by run_replicates()
+
+    Attributes
+    ----------
+
+    seeds : list(int)
+        the randomSeed of each replicate, in the order they were started
+    n : int
+        the number of replicates summarized
+    quantiles : list(float)
+        the quantiles in total_biomass
+    total_biomass : pandas.DataFrame
+        one row per cycle and species, with columns cycle, species, n, mean,
+        std, min, max and one column per quantile, e.g. q0.5. Cycles are
+        those logged by the first replicate to finish; a replicate missing a
+        cycle does not count towards its n.
+    exact_quantiles : bool
+        whether quantiles were taken from every replicate, i.e. n was not
+        larger than reservoir_size
+
+    Examples
+    --------
+
+    >>> reps = run_replicates(layout, params, n = 200, spatial = ["biomass"])
+    >>> reps.total_biomass.plot(x = "cycle", y = ["mean", "q0.05", "q0.95"])
+    >>> sd = reps.cube("biomass", "std").sel(cycle = 100, key = "e_coli_core")
+
+    """
+    def __init__(self, seeds, quantiles):
+        self.seeds = list(seeds)
+        self.n = 0
+        self.quantiles = list(quantiles)
+        self.total_biomass = None
+        self.exact_quantiles = True
+        self.__cubes = {}
+
+    def cube(self, field : str, stat : str = 'mean') -> cube.result_cube:
+        """
+        returns a statistic of a spatial result over the replicates
+
+        Parameters
+        ----------
+
+        field : str
+            "biomass" or "media", as given to run_replicates(spatial = ...)
+        stat : str or float, optional
+            "mean", "std", "variance", "min", "max", "count", or a quantile
+            such as 0.5, which needs run_replicates(spatial_quantiles =
+            True). The default is "mean".
+
+        Returns
+        -------
+
+        cometspy.cube.result_cube
+            a (cycle, key, x, y) cube of the statistic
+
+        """
+        if field not in self.__cubes:
+            raise ValueError(field + " was not summarized. use "
+                             "run_replicates(spatial = [\"" + field + "\"])")
+        summary, cycles, keys = self.__cubes[field]
+        return(cube.result_cube(summary.get(stat), cycles, keys,
+                                field + ' ' + str(stat)))
+
+    def _add_cube(self, field, result_cube, reservoir_size, seed):
+        """ adds one replicate's cube of field """
+        if field not in self.__cubes:
+            self.__cubes[field] = (_summary(result_cube.shape, reservoir_size,
+                                            seed),
+                                   result_cube.cycles, result_cube.keys)
+        self.__cubes[field][0].add(result_cube.data)
+
+    def _cycles(self, field):
+        """ the cycles of field's cubes, or None before the first """
+        if field not in self.__cubes:
+            return(None)
+        return(self.__cubes[field][1])
+
+
+def _biomass_cube(sim, cycles):
+    return(cube.build_cube(sim.biomass, 'species', 'biomass',
+                           sim.layout.grid, keys = sim.layout.get_model_ids(),
+                           cycles = cycles))
+
+
+def _media_cube(sim, cycles, metabolites):
+    return(cube.build_cube(sim.media, 'metabolite', 'conc_mmol',
+                           sim.layout.grid, keys = metabolites, cycles = cycles))
+
+
+def run_replicates(layout, params, n : int = None, seeds : list = None,
+                   seed : int = None, spatial : list = None,
+                   metabolites : list = None,
+                   quantiles : list = (0.05, 0.5, 0.95),
+                   spatial_quantiles : bool = False,
+                   reservoir_size : int = 100, max_workers : int = None,
+                   relative_dir : str = '', delete_files : bool = True,
+                   progress : bool = True,
+                   run_kwargs : dict = None) -> replicate_results:
+    """
+    runs replicates of a simulation which differ only in randomSeed, and
+    summarizes them as they finish
+
+    Replicates are run in parallel with iter_run_many. Each finished
+    replicate is added to the summary and discarded, so at most a few
+    replicates (twice max_workers) are in memory at a time, however many
+    are run.
+
+    Parameters
+    ----------
+
+    layout : cometspy.layout
+        the layout of every replicate
+    params : cometspy.params
+        the params of every replicate. randomSeed is set per replicate; the
+        object itself is not changed.
+    n : int, optional
+        the number of replicates, if seeds are not given
+    seeds : list(int), optional
+        the randomSeed of each replicate. The default is n distinct seeds
+        drawn with seed.
+    seed : int, optional
+        seed of the generator of seeds and of the quantile reservoirs, for
+        reproducible summaries
+    spatial : list(str), optional
+        spatial results to summarize as well: "biomass" and/or "media".
+        Their logs are turned on. Each needs memory for a few (cycle, key,
+        x, y) arrays, so consider the log rates on large grids.
+    metabolites : list(str), optional
+        the metabolites of the media summary. The default is every
+        metabolite of the layout.
+    quantiles : list(float), optional
+        the quantiles of total biomass to estimate. The default is
+        (0.05, 0.5, 0.95).
+    spatial_quantiles : bool, optional
+        whether to also keep a reservoir for quantiles of spatial results,
+        which needs reservoir_size arrays per result. The default is False.
+    reservoir_size : int, optional
+        the number of replicates kept to estimate quantiles. Quantiles are
+        exact up to this many replicates. The default is 100.
+    max_workers : int, optional
+        number of worker processes. The default is os.cpu_count().
+    relative_dir : str, optional
+        the directory, relative to the current one, in which to run
+    delete_files : bool, optional
+        Whether to delete simulation and log files. The default is True.
+    progress : bool, optional
+        Whether to display a progress bar via tqdm. The default is True.
+    run_kwargs : dict, optional
+        further arguments of comets.run(), e.g. {"timeout": 3600}
+
+    Returns
+    -------
+
+    replicate_results
+
+    Examples
+    --------
+
+    >>> from cometspy.replicates import run_replicates
+    >>> model.add_noise_variance_parameter(0.01)
+    >>> reps = run_replicates(layout, params, n = 500, seed = 1)
+    >>> reps.total_biomass.head()
+
+    """
+    if seeds is None:
+        if n is None:
+            raise ValueError("run_replicates needs n or seeds")
+        rng = np.random.default_rng(seed)
+        # randomSeed 0 would make COMETS pick its own seed
+        seeds = rng.choice(2 ** 31 - 2, size = n, replace = False) + 1
+    seeds = [int(s) for s in seeds]
+    spatial = [] if spatial is None else list(spatial)
+    for field in spatial:
+        if field not in _SPATIAL_LOGS:
+            raise ValueError("spatial may only contain " +
+                             ", ".join(_SPATIAL_LOGS.keys()))
+    if metabolites is None:
+        metabolites = list(layout.media.metabolite)
+
+    base_params = copy.deepcopy(params)
+    for field in spatial:
+        base_params.set_param(_SPATIAL_LOGS[field], True)
+
+    def build():
+        for replicate_seed in seeds:
+            run_params = copy.deepcopy(base_params)
+            run_params.set_param('randomSeed', replicate_seed)
+            yield(comets(layout, run_params, relative_dir))
+
+    results = replicate_results(seeds, quantiles)
+    total = None
+    model_ids = layout.get_model_ids()
+    if progress:
+        from tqdm.auto import tqdm
+        prog = tqdm(total = len(seeds), desc = "Replicates", unit = "sim")
+    for i, sim in iter_run_many(build(), max_workers, delete_files, run_kwargs):
+        total_biomass = sim.total_biomass.set_index('cycle')[model_ids]
+        if total is None:
+            cycles = total_biomass.index
+            total = _summary((len(cycles), len(model_ids)), reservoir_size, seed)
+        total.add(total_biomass.reindex(cycles).to_numpy())
+        for field in spatial:
+            if field == 'biomass':
+                result_cube = _biomass_cube(sim, results._cycles(field))
+            else:
+                result_cube = _media_cube(sim, results._cycles(field),
+                                          metabolites)
+            results._add_cube(field, result_cube,
+                              reservoir_size if spatial_quantiles else None,
+                              seed)
+        results.n += 1
+        del sim
+        if progress:
+            prog.update(1)
+    if progress:
+        prog.close()
+
+    if total is not None:
+        table = {'cycle': np.repeat(cycles.to_numpy(), len(model_ids)),
+                 'species': np.tile(model_ids, len(cycles))}
+        for stat in ['count', 'mean', 'std', 'min', 'max']:
+            table['n' if stat == 'count' else stat] = total.get(stat).ravel()
+        for q, values in zip(quantiles, total.reservoir.quantiles(list(quantiles))):
+            table['q' + format(q, 'g')] = values.ravel()
+        results.total_biomass = pd.DataFrame(table)
+        results.exact_quantiles = total.reservoir.exact
+    return(results)
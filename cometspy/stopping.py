@@ -0,0 +1,266 @@
+'''
+The stopping module ends simulations early once a condition is met.
+
+A stop condition given to comets.run(stop_when = [...]) watches a log while
+COMETS writes it, and when it is met COMETS is stopped and the results up
+to that cycle are kept, instead of running until maxCycles. There are
+conditions for a steady state of total biomass (steady_state), the
+extinction of a species (extinction) and the depletion of a metabolite
+(depletion). Other conditions can be made by subclassing stop_condition.
+'''
+
+import abc
+import numpy as np
+import pandas as pd
+
+
+class stop_condition(abc.ABC):
+    """
+    a condition on which comets.run(stop_when = ...) stops COMETS
+
+    Subclasses set log to the log they watch ("total_biomass", "biomass" or
+    "media"), which must be written, and must implement check(). The logs are
+    read while COMETS runs, every poll_interval seconds of comets.run(), so
+    COMETS stops a little after the cycle at which the condition is met; the
+    results are cut at that cycle. check() is given every row of the log,
+    including those a log_filter given to comets.run(where = ...) drops.
+
+    Examples
+    --------
+
+    >>> class biomass_above(stop_condition):
+    >>>     log = "total_biomass"
+    >>>     def __init__(self, amount):
+    >>>         self.amount = amount
+    >>>     def check(self, sim, new_rows):
+    >>>         reached = new_rows.loc[new_rows.iloc[:, 1:].sum(axis = 1) > self.amount]
+    >>>         return(None if len(reached) == 0 else int(reached['cycle'].iloc[0]))
+    >>>     def __str__(self):
+    >>>         return("total biomass above " + str(self.amount))
+
+    """
+    log = 'total_biomass'
+
+    def validate(self, sim):
+        """ raises ValueError if the condition does not fit the simulation
+        of sim, e.g. because it watches something sim does not have.
+        Called by comets.run() before COMETS starts. """
+        pass
+
+    def reset(self):
+        """ forgets what was seen in a previous run. Called by comets.run()
+        before COMETS starts. """
+        pass
+
+    @abc.abstractmethod
+    def check(self, sim, new_rows : pd.DataFrame):
+        """
+        looks at newly logged rows
+
+        Parameters
+        ----------
+
+        sim : comets
+            the running comets object
+        new_rows : pandas.DataFrame
+            the rows of the watched log for cycles completed since the last
+            call, in cycle order
+
+        Returns
+        -------
+
+        int or None
+            the cycle at which the condition is met, or None if it is not
+
+        """
+
+
+class steady_state(stop_condition):
+    """
+    stops once the total biomass of every species changed by no more than
+    tolerance over the last window cycles
+
+    Parameters
+    ----------
+
+    window : int, optional
+        the number of cycles over which biomass must not change. The default
+        is 50.
+    tolerance : float, optional
+        the largest change allowed. The default is 1e-3.
+    relative : bool, optional
+        Whether tolerance is relative to the largest biomass of the species
+        in the window, rather than an amount in grams. The default is True.
+    species : list(str), optional
+        the model ids to watch. The default is all.
+    min_cycle : int, optional
+        the earliest cycle at which to stop, e.g. to get past a lag phase.
+        The default is 0.
+
+    Examples
+    --------
+
+    >>> from cometspy.stopping import steady_state
+    >>> sim.run(stop_when = [steady_state(window = 100, tolerance = 1e-4)])
+    >>> sim.stopped_at, sim.stop_reason
+
+    """
+    log = 'total_biomass'
+
+    def __init__(self, window : int = 50, tolerance : float = 1e-3,
+                 relative : bool = True, species : list = None,
+                 min_cycle : int = 0):
+        self.window = window
+        self.tolerance = tolerance
+        self.relative = relative
+        self.species = species
+        self.min_cycle = min_cycle
+        self.reset()
+
+    def reset(self):
+        self.__history = None
+
+    def check(self, sim, new_rows):
+        species = [s for s in new_rows.columns if s != 'cycle'] \
+            if self.species is None else list(self.species)
+        rows = new_rows[['cycle'] + species]
+        history = rows if self.__history is None else \
+            pd.concat([self.__history, rows], ignore_index = True)
+        cycles = history['cycle'].to_numpy()
+        values = history[species].to_numpy()
+        stop = None
+        # the first new cycle whose window is flat
+        for i in range(len(history) - len(rows), len(history)):
+            if cycles[i] < self.min_cycle:
+                continue
+            start = np.searchsorted(cycles, cycles[i] - self.window)
+            if cycles[start] > cycles[i] - self.window:
+                continue  # the window is not logged yet
+            window = values[start:i + 1]
+            change = window.max(axis = 0) - window.min(axis = 0)
+            allowed = self.tolerance
+            if self.relative:
+                allowed = self.tolerance * np.abs(window).max(axis = 0)
+            if np.all(change <= allowed):
+                stop = int(cycles[i])
+                break
+        keep = np.searchsorted(cycles, cycles[-1] - self.window)
+        self.__history = history.iloc[keep:].reset_index(drop = True)
+        return(stop)
+
+    def __str__(self):
+        return("total biomass changed by at most " + str(self.tolerance) +
+               (" (relative)" if self.relative else "") + " over " +
+               str(self.window) + " cycles")
+
+
+class extinction(stop_condition):
+    """
+    stops once a species' total biomass falls below threshold, after having
+    been above it
+
+    Parameters
+    ----------
+
+    species : list(str), optional
+        the model ids to watch. The default is all.
+    threshold : float, optional
+        the biomass, in grams, below which a species is extinct. The default
+        is 1e-10.
+    all_species : bool, optional
+        Whether to wait until all watched species are extinct, rather than
+        any one. The default is False.
+
+    Examples
+    --------
+
+    >>> from cometspy.stopping import extinction
+    >>> sim.run(stop_when = [extinction(["cheater"])])
+
+    """
+    log = 'total_biomass'
+
+    def __init__(self, species : list = None, threshold : float = 1e-10,
+                 all_species : bool = False):
+        self.species = species
+        self.threshold = threshold
+        self.all_species = all_species
+        self.reset()
+
+    def reset(self):
+        self.__alive = set()
+        self.__extinct = set()
+
+    def check(self, sim, new_rows):
+        species = [s for s in new_rows.columns if s != 'cycle'] \
+            if self.species is None else list(self.species)
+        for cycle, values in zip(new_rows['cycle'].tolist(),
+                                 new_rows[species].to_numpy()):
+            for s, value in zip(species, values):
+                if value >= self.threshold:
+                    self.__alive.add(s)
+                    self.__extinct.discard(s)
+                elif s in self.__alive:
+                    self.__extinct.add(s)
+            if self.all_species:
+                if len(self.__extinct) == len(species):
+                    return(int(cycle))
+            elif len(self.__extinct) > 0:
+                return(int(cycle))
+        return(None)
+
+    def __str__(self):
+        watched = 'a species' if self.species is None else ', '.join(self.species)
+        return(('all of ' if self.all_species else '') + watched +
+               " fell below " + str(self.threshold))
+
+
+class depletion(stop_condition):
+    """
+    stops once the total amount of a metabolite over all locations falls
+    below threshold
+
+    Needs the media log (params.set_param("writeMediaLog", True)), and is
+    checked at the cycles at which it is written (MediaLogRate). The
+    metabolite must be in the media of the layout.
+
+    Parameters
+    ----------
+
+    metabolite : str
+        the metabolite to watch, e.g. "glc__D_e"
+    threshold : float, optional
+        the amount, in mmol, below which it is depleted. The default is
+        1e-9.
+
+    Examples
+    --------
+
+    >>> from cometspy.stopping import depletion
+    >>> sim.run(stop_when = [depletion("glc__D_e")])
+
+    """
+    log = 'media'
+
+    def __init__(self, metabolite : str, threshold : float = 1e-9):
+        self.metabolite = metabolite
+        self.threshold = threshold
+
+    def validate(self, sim):
+        # a metabolite which is not in the media is never logged, so it
+        # would be depleted from the first cycle on
+        if self.metabolite not in set(sim.layout.media['metabolite']):
+            raise ValueError("the metabolite " + self.metabolite +
+                             " is not in the media of the layout")
+
+    def check(self, sim, new_rows):
+        # locations without the metabolite are not logged, so cycles where
+        # it is absent everywhere have a total of 0
+        totals = new_rows.loc[new_rows['metabolite'] == self.metabolite]
+        totals = totals.groupby('cycle')['conc_mmol'].sum()
+        totals = totals.reindex(np.unique(new_rows['cycle']), fill_value = 0.)
+        depleted = totals.index[totals.to_numpy() < self.threshold]
+        return(None if len(depleted) == 0 else int(depleted[0]))
+
+    def __str__(self):
+        return(self.metabolite + " fell below " + str(self.threshold))
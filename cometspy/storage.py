@@ -0,0 +1,312 @@
+'''
+The storage module saves simulation results as Parquet files and loads them.
+
+Parquet is a compressed, columnar format, so archived results are much
+smaller than text logs or pickled comets objects, and reading them back can
+be restricted to the columns and rows that are needed. This module requires
+the optional dependency pyarrow (pip install pyarrow).
+
+Results are written into a directory:
+
+    path/
+        metadata.json
+        total_biomass.parquet
+        biomass/species=<model_id>/...
+        media/metabolite=<metabolite>/...
+        fluxes_by_species/<model_id>.parquet
+        velocity/species=<model_id>/...
+        specific_media.parquet
+        genotypes.parquet
+
+Spatial tables are partitioned by species or metabolite, so selecting one
+reads only its files. Within each file rows are sorted by cycle and split
+into row groups, whose cycle statistics let cycle filters skip row groups.
+Each row also stores its position in the saved table, so that tables are
+read back in their original row order.
+'''
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# table name -> partition column, for the spatial tables
+_PARTITIONED_TABLES = {'biomass': 'species',
+                       'media': 'metabolite',
+                       'velocity': 'species'}
+_SINGLE_FILE_TABLES = ['total_biomass', 'specific_media', 'genotypes']
+# the column of partitioned tables holding each row's original position
+_ROW_COLUMN = '_row'
+
+# rows per parquet row group. smaller groups let filters skip more data
+ROW_GROUP_SIZE = 262144
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("saving and loading results as Parquet requires "
+                          "pyarrow. install it with: pip install pyarrow")
+
+
+def save_results(sim, path : str, overwrite : bool = False):
+    """
+    writes the results of a finished simulation as Parquet files
+
+    Every result present on sim (total_biomass, biomass, media,
+    fluxes_by_species, velocity, specific_media, genotypes) is written.
+    Usually called as comets.save_results(path).
+
+    Parameters
+    ----------
+
+    sim : comets
+        a comets object which has finished running
+    path : str
+        the directory to write into. It must not exist unless overwrite.
+    overwrite : bool, optional
+        Whether to replace an existing directory at path. The default is
+        False.
+
+    Examples
+    --------
+
+    >>> sim.run()
+    >>> sim.save_results("./results/run_001")
+    >>> from cometspy.storage import load_results
+    >>> results = load_results("./results/run_001")
+    >>> results.read("media", filters = [("metabolite", "==", "ac_e")])
+
+    """
+    _require_pyarrow()
+    if os.path.exists(path):
+        if not overwrite:
+            raise FileExistsError(path + " already exists. use overwrite = True "
+                                  "to replace it")
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    tables = []
+    for table in _SINGLE_FILE_TABLES:
+        data = getattr(sim, table, None)
+        if data is None:
+            continue
+        data.to_parquet(os.path.join(path, table + '.parquet'), index = False)
+        tables.append(table)
+
+    for table, partition in _PARTITIONED_TABLES.items():
+        data = getattr(sim, table, None)
+        if data is None:
+            continue
+        data = data.assign(**{_ROW_COLUMN: np.arange(len(data))})
+        data = data.sort_values([partition, 'cycle'], kind = 'stable')
+        data.to_parquet(os.path.join(path, table), index = False,
+                        partition_cols = [partition],
+                        row_group_size = ROW_GROUP_SIZE)
+        tables.append(table)
+
+    fluxes_by_species = getattr(sim, 'fluxes_by_species', None)
+    if fluxes_by_species is not None:
+        os.makedirs(os.path.join(path, 'fluxes_by_species'))
+        for model_id, data in fluxes_by_species.items():
+            data.sort_values('cycle', kind = 'stable').to_parquet(
+                os.path.join(path, 'fluxes_by_species', model_id + '.parquet'),
+                index = False, row_group_size = ROW_GROUP_SIZE)
+        tables.append('fluxes_by_species')
+
+    metadata = {'tables': tables,
+                'model_ids': sim.layout.get_model_ids(),
+                'grid': list(sim.layout.grid),
+                'comets_version': getattr(sim, 'VERSION', ''),
+                'row_order': True}
+    with open(os.path.join(path, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent = 1)
+
+
+def load_results(path : str):
+    """
+    opens results written by save_results() without reading them yet
+
+    Parameters
+    ----------
+
+    path : str
+        the directory written by save_results()
+
+    Returns
+    -------
+
+    saved_results
+        an object whose tables are read on first access. Their rows are in
+        the order they had in the saved comets object.
+
+    """
+    return(saved_results(path))
+
+
+class saved_results:
+    """
+    results saved by save_results(), read lazily from Parquet
+
+    The attributes total_biomass, biomass, media, fluxes_by_species,
+    velocity, specific_media and genotypes mirror those of a finished
+    comets object. Each is read from disk the first time it is accessed and
+    then kept. To read only part of a table, use read() or read_fluxes(),
+    which pass columns and filters on to Parquet.
+
+    Parameters
+    ----------
+
+    path : str
+        the directory written by save_results()
+
+    Attributes
+    ----------
+
+    path : str
+        the directory the results are read from
+    tables : list(str)
+        the tables which were saved
+    model_ids : list(str)
+        the ids of the models of the simulation, in layout order
+    grid : list
+        the layout grid of the simulation
+
+    """
+    def __init__(self, path : str):
+        _require_pyarrow()
+        with open(os.path.join(path, 'metadata.json'), 'r') as f:
+            metadata = json.load(f)
+        self.path = path
+        self.tables = metadata['tables']
+        self.model_ids = metadata['model_ids']
+        self.grid = metadata['grid']
+        self.comets_version = metadata['comets_version']
+        # results saved before row positions were stored come back grouped
+        # by their partition column
+        self.__row_order = metadata.get('row_order', False)
+        self.__loaded = {}
+
+    def read(self, table : str, columns : list = None,
+             filters : list = None) -> pd.DataFrame:
+        """
+        reads (part of) a saved table
+
+        Parameters
+        ----------
+
+        table : str
+            one of total_biomass, biomass, media, velocity, specific_media
+            or genotypes
+        columns : list(str), optional
+            the columns to read. The default is all.
+        filters : list(tuple), optional
+            row filters in pyarrow form, e.g. [("cycle", ">=", 100),
+            ("metabolite", "in", ["ac_e", "glc__D_e"])]. Filters on the
+            partition column only open the matching files.
+
+        Returns
+        -------
+
+        pandas.DataFrame
+            the selected rows, in their order in the saved table
+
+        """
+        if table not in self.tables or table == 'fluxes_by_species':
+            raise KeyError(table + " was not saved in " + self.path)
+        if table in _PARTITIONED_TABLES:
+            if self.__row_order and columns is not None:
+                columns = list(columns) + [_ROW_COLUMN]
+            data = pd.read_parquet(os.path.join(self.path, table),
+                                   columns = columns, filters = filters)
+            if self.__row_order:
+                data = data.sort_values(_ROW_COLUMN, kind = 'stable')
+                data = data.drop(columns = _ROW_COLUMN).reset_index(drop = True)
+                if columns is not None:
+                    columns = columns[:-1]
+            partition = _PARTITIONED_TABLES[table]
+            if partition in data.columns:
+                # partition values come back as categories
+                data[partition] = data[partition].astype(str)
+                ordered = [c for c in (columns or self.__column_order(table))
+                           if c in data.columns]
+                data = data[ordered]
+            return(data)
+        return(pd.read_parquet(os.path.join(self.path, table + '.parquet'),
+                               columns = columns, filters = filters))
+
+    def read_fluxes(self, model_id : str, columns : list = None,
+                    filters : list = None) -> pd.DataFrame:
+        """
+        reads (part of) one species' fluxes
+
+        Parameters
+        ----------
+
+        model_id : str
+            the id of the model
+        columns : list(str), optional
+            the columns to read, e.g. ["cycle", "x", "y", "EX_ac_e"]. The
+            default is all.
+        filters : list(tuple), optional
+            row filters in pyarrow form, e.g. [("cycle", "==", 100)]
+
+        Returns
+        -------
+
+        pandas.DataFrame
+
+        """
+        if 'fluxes_by_species' not in self.tables:
+            raise KeyError("fluxes were not saved in " + self.path)
+        return(pd.read_parquet(os.path.join(self.path, 'fluxes_by_species',
+                                            model_id + '.parquet'),
+                               columns = columns, filters = filters))
+
+    def __column_order(self, table):
+        from cometspy import parsers
+        return({'biomass': parsers.BIOMASS_COLUMNS,
+                'media': parsers.MEDIA_COLUMNS,
+                'velocity': parsers.VELOCITY_COLUMNS}[table])
+
+    def __get(self, table):
+        if table not in self.__loaded:
+            if table == 'fluxes_by_species':
+                self.__loaded[table] = {model_id: self.read_fluxes(model_id)
+                                        for model_id in self.model_ids
+                                        if os.path.isfile(os.path.join(
+                                            self.path, 'fluxes_by_species',
+                                            model_id + '.parquet'))}
+            else:
+                self.__loaded[table] = self.read(table)
+        return(self.__loaded[table])
+
+    @property
+    def total_biomass(self) -> pd.DataFrame:
+        return(self.__get('total_biomass'))
+
+    @property
+    def biomass(self) -> pd.DataFrame:
+        return(self.__get('biomass'))
+
+    @property
+    def media(self) -> pd.DataFrame:
+        return(self.__get('media'))
+
+    @property
+    def fluxes_by_species(self) -> dict:
+        return(self.__get('fluxes_by_species'))
+
+    @property
+    def velocity(self) -> pd.DataFrame:
+        return(self.__get('velocity'))
+
+    @property
+    def specific_media(self) -> pd.DataFrame:
+        return(self.__get('specific_media'))
+
+    @property
+    def genotypes(self) -> pd.DataFrame:
+        return(self.__get('genotypes'))
@@ -0,0 +1,359 @@
+'''
+The sweep module runs a simulation over many values of its inputs.
+
+A sweep starts from a base layout and params. Each axis names one input to
+vary: a parameter (param_axis), the initial amount of a metabolite
+(metabolite_axis) or the Vmax or Km of a model's reaction (vmax_axis,
+km_axis). Combinations of values are chosen on a full grid, by Latin
+hypercube sampling or at random. Every combination is built as a copy of the
+base objects, the simulations are run in parallel with
+cometspy.comets.iter_run_many, and their results are collected in one
+DataFrame with a column per axis.
+'''
+
+import abc
+import copy
+import itertools
+import numpy as np
+import pandas as pd
+
+from cometspy.comets import comets, iter_run_many
+
+
+class sweep_axis(abc.ABC):
+    """
+    one input varied by a sweep
+
+    Values are either listed, or drawn from the range low to high when
+    sampling with method = "lhs" or "random". A full grid needs listed
+    values. This class is not used directly; see param_axis,
+    metabolite_axis, vmax_axis and km_axis. Subclasses must implement
+    apply().
+
+    Parameters
+    ----------
+
+    label : str
+        the name of the axis' column in the results
+    values : list, optional
+        the values to use
+    low : float, optional
+        the smallest value to sample, if values are not listed
+    high : float, optional
+        the largest value to sample, if values are not listed
+    log : bool, optional
+        Whether to sample uniformly on a log scale between low and high.
+        The default is False.
+
+    """
+    def __init__(self, label : str, values : list = None, low : float = None,
+                 high : float = None, log : bool = False):
+        if values is None and (low is None or high is None):
+            raise ValueError("axis " + label + " needs values or low and high")
+        if log and values is None and (low <= 0 or high <= 0):
+            raise ValueError("axis " + label + " needs positive low and high "
+                             "to be sampled on a log scale")
+        self.label = label
+        self.values = None if values is None else list(values)
+        self.low = low
+        self.high = high
+        self.log = log
+
+    def value_at(self, u : float):
+        """ returns the value at quantile u (0 <= u < 1) of the axis """
+        if self.values is not None:
+            return(self.values[min(int(u * len(self.values)),
+                                   len(self.values) - 1)])
+        if self.log:
+            return(float(np.exp(np.log(self.low) +
+                                u * (np.log(self.high) - np.log(self.low)))))
+        return(self.low + u * (self.high - self.low))
+
+    @abc.abstractmethod
+    def apply(self, layout, params, value):
+        """ sets the axis' input to value in layout or params, returning the
+        value actually set """
+
+
+class param_axis(sweep_axis):
+    """
+    varies a parameter of params.all_params
+
+    Parameters
+    ----------
+
+    name : str
+        the name of the parameter, e.g. "defaultDiffConst"
+    values, low, high, log
+        see sweep_axis
+
+    Examples
+    --------
+
+    >>> axis = param_axis("deathRate", [0., 0.01, 0.1])
+
+    """
+    def __init__(self, name : str, values : list = None, low : float = None,
+                 high : float = None, log : bool = False):
+        super().__init__(name, values, low, high, log)
+        self.name = name
+
+    def apply(self, layout, params, value):
+        current = params.all_params.get(self.name)
+        if isinstance(current, int) and not isinstance(current, bool):
+            value = int(round(value))
+        params.set_param(self.name, value)
+        return(value)
+
+
+class metabolite_axis(sweep_axis):
+    """
+    varies the initial amount of a metabolite in every location, as set by
+    layout.set_specific_metabolite
+
+    Parameters
+    ----------
+
+    met : str
+        the name of the metabolite, e.g. "glc__D_e"
+    values, low, high, log
+        see sweep_axis
+    static : bool, optional
+        Whether the amount is fixed during the simulation. The default is
+        False.
+
+    """
+    def __init__(self, met : str, values : list = None, low : float = None,
+                 high : float = None, log : bool = False,
+                 static : bool = False):
+        super().__init__(met, values, low, high, log)
+        self.met = met
+        self.static = static
+
+    def apply(self, layout, params, value):
+        layout.set_specific_metabolite(self.met, value, self.static)
+        return(value)
+
+
+class _kinetics_axis(sweep_axis):
+    """ varies a kinetic constant of one reaction of one model """
+    _kind = ''
+
+    def __init__(self, model_id : str, reaction : str, values : list = None,
+                 low : float = None, high : float = None, log : bool = False):
+        super().__init__(model_id + ':' + reaction + ':' + self._kind,
+                         values, low, high, log)
+        self.model_id = model_id
+        self.reaction = reaction
+
+    def _model(self, layout):
+        for m in layout.models:
+            if m.id == self.model_id:
+                return(m)
+        raise NameError("model " + self.model_id + " is not one of the model ids")
+
+
+class vmax_axis(_kinetics_axis):
+    """
+    varies the Vmax of a model's reaction, as set by model.change_vmax
+
+    The axis' column in the results is named "<model_id>:<reaction>:vmax".
+
+    Parameters
+    ----------
+
+    model_id : str
+        the id of the model, which must be in the base layout
+    reaction : str
+        the name of the reaction
+    values, low, high, log
+        see sweep_axis
+
+    """
+    _kind = 'vmax'
+
+    def apply(self, layout, params, value):
+        self._model(layout).change_vmax(self.reaction, value)
+        return(value)
+
+
+class km_axis(_kinetics_axis):
+    """
+    varies the Km of a model's reaction, as set by model.change_km
+
+    The axis' column in the results is named "<model_id>:<reaction>:km".
+
+    Parameters
+    ----------
+
+    model_id : str
+        the id of the model, which must be in the base layout
+    reaction : str
+        the name of the reaction
+    values, low, high, log
+        see sweep_axis
+
+    """
+    _kind = 'km'
+
+    def apply(self, layout, params, value):
+        self._model(layout).change_km(self.reaction, value)
+        return(value)
+
+
+def design(axes : list, method : str = 'grid', n : int = None,
+           seed : int = None) -> pd.DataFrame:
+    """
+    returns the combinations of axis values a sweep would run
+
+    Parameters
+    ----------
+
+    axes : list(sweep_axis)
+        the inputs to vary
+    method : str, optional
+        "grid" for every combination of the listed values, "lhs" for a
+        Latin hypercube sample of n combinations, or "random" for n
+        independent random combinations. The default is "grid".
+    n : int, optional
+        the number of combinations, required by "lhs" and "random"
+    seed : int, optional
+        seed of the random number generator, for reproducible samples
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        one row per combination, one column per axis label
+
+    """
+    labels = [axis.label for axis in axes]
+    if len(set(labels)) != len(labels):
+        raise ValueError("two axes vary the same input")
+    if method == 'grid':
+        for axis in axes:
+            if axis.values is None:
+                raise ValueError("a grid needs listed values for axis " + axis.label)
+        return(pd.DataFrame(list(itertools.product(*[axis.values for axis in axes])),
+                            columns = labels))
+    if method not in ('lhs', 'random'):
+        raise ValueError("method must be 'grid', 'lhs' or 'random'")
+    if n is None:
+        raise ValueError("n is required when method is " + method)
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for axis in axes:
+        if method == 'lhs':
+            # one sample in each of n equal strata, strata shuffled per axis
+            u = (rng.permutation(n) + rng.random(n)) / n
+        else:
+            u = rng.random(n)
+        columns[axis.label] = [axis.value_at(q) for q in u]
+    return(pd.DataFrame(columns, columns = labels))
+
+
+def _total_biomass(sim):
+    return(sim.total_biomass)
+
+
+def sweep(layout, params, axes : list, method : str = 'grid', n : int = None,
+          seed : int = None, output = None, max_workers : int = None,
+          relative_dir : str = '', delete_files : bool = True,
+          progress : bool = True, run_kwargs : dict = None) -> pd.DataFrame:
+    """
+    runs a simulation for each combination of values of the given axes
+
+    For each combination returned by design(), copies of layout and params
+    are made, the axis values are applied to the copies, and a comets
+    object is run. The base layout and params are not changed. Simulations
+    are run in parallel with iter_run_many, and each is discarded once its
+    output has been taken.
+
+    Parameters
+    ----------
+
+    layout : cometspy.layout
+        the base layout
+    params : cometspy.params
+        the base params
+    axes : list(sweep_axis)
+        the inputs to vary
+    method : str, optional
+        "grid", "lhs" or "random", see design(). The default is "grid".
+    n : int, optional
+        the number of combinations for "lhs" and "random"
+    seed : int, optional
+        seed of the random number generator, for reproducible samples
+    output : callable, optional
+        called as output(sim) on each finished comets object. It returns a
+        DataFrame, a dict of values or a single value, which becomes the
+        rows of that combination. The default returns sim.total_biomass.
+    max_workers : int, optional
+        number of worker processes. The default is os.cpu_count().
+    relative_dir : str, optional
+        the directory, relative to the current one, in which to run
+    delete_files : bool, optional
+        Whether to delete simulation and log files. The default is True.
+    progress : bool, optional
+        Whether to display a progress bar via tqdm. The default is True.
+    run_kwargs : dict, optional
+        further arguments of comets.run(), e.g. {"timeout": 3600}
+
+    Returns
+    -------
+
+    pandas.DataFrame
+        a column "run" numbering the combinations, one column per axis and
+        the columns of output, in the order of design()
+
+    Examples
+    --------
+
+    >>> from cometspy.sweep import sweep, metabolite_axis, vmax_axis
+    >>> axes = [metabolite_axis("glc__D_e", low = 1e-4, high = 1e-1, log = True),
+    >>>         vmax_axis("e_coli_core", "EX_glc__D_e", low = 5., high = 20.)]
+    >>> results = sweep(layout, params, axes, method = "lhs", n = 50, seed = 1)
+    >>> results.groupby("glc__D_e")["e_coli_core"].max()
+
+    """
+    if output is None:
+        output = _total_biomass
+    combinations = design(axes, method, n, seed)
+    applied = [None] * len(combinations)
+
+    def build():
+        for i, values in enumerate(combinations.itertuples(index = False)):
+            run_layout = copy.deepcopy(layout)
+            run_params = copy.deepcopy(params)
+            applied[i] = {axis.label: axis.apply(run_layout, run_params, value)
+                          for axis, value in zip(axes, values)}
+            yield(comets(run_layout, run_params, relative_dir))
+
+    if progress:
+        from tqdm.auto import tqdm
+        prog = tqdm(total = len(combinations), desc = "Sweep", unit = "sim")
+    results = [None] * len(combinations)
+    for i, sim in iter_run_many(build(), max_workers, delete_files,
+                                run_kwargs):
+        results[i] = _as_frame(output(sim))
+        if progress:
+            prog.update(1)
+    if progress:
+        prog.close()
+
+    tables = []
+    for i, result in enumerate(results):
+        keys = pd.DataFrame({'run': i, **applied[i]}, index = result.index)
+        tables.append(pd.concat([keys, result], axis = 1))
+    return(pd.concat(tables, ignore_index = True))
+
+
+def _as_frame(result) -> pd.DataFrame:
+    """ turns the return value of a sweep's output function into rows """
+    if isinstance(result, pd.DataFrame):
+        return(result.reset_index(drop = True))
+    if isinstance(result, pd.Series):
+        return(result.to_frame().T.reset_index(drop = True))
+    if isinstance(result, dict):
+        return(pd.DataFrame([result]))
+    return(pd.DataFrame({'value': [result]}))
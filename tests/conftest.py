@@ -0,0 +1,53 @@
+"""
+fixtures for the tests, which run simulations with the fake COMETS backend
+(cometspy/fake_comets.py) so that they need neither java nor COMETS
+"""
+
+import copy
+import pytest
+
+import cometspy as c
+
+
+@pytest.fixture(scope = 'session')
+def textbook_model():
+    """ the textbook E. coli core model, converted once per session """
+    from cobra.io import load_model
+    model = c.model(load_model('textbook'))
+    model.initial_pop = [0, 0, 1.e-4]
+    model.open_exchanges()
+    return(model)
+
+
+@pytest.fixture(autouse = True)
+def fake_backend(monkeypatch, tmp_path):
+    """ runs every test in its own directory, with the fake backend """
+    monkeypatch.setenv('COMETSPY_BACKEND', 'fake')
+    monkeypatch.chdir(tmp_path)
+    return(tmp_path)
+
+
+@pytest.fixture
+def make_sim(textbook_model):
+    """ returns a function making a comets object of grid, cycles and
+    number of models, which logs total biomass, biomass, media and fluxes
+    every cycle """
+    def make(grid = (1, 1), cycles = 20, n_models = 1, params = None):
+        models = []
+        for i in range(n_models):
+            model = copy.deepcopy(textbook_model)
+            model.id = 'model_' + str(i)
+            models.append(model)
+        layout = c.layout(models)
+        layout.grid = list(grid)
+        layout.set_specific_metabolite('glc__D_e', 0.011)
+        layout.set_specific_metabolite('o2_e', 10.)
+        parameters = c.params()
+        parameters.set_param('maxCycles', cycles)
+        for log in ('Biomass', 'Media', 'Flux'):
+            parameters.set_param('write' + log + 'Log', True)
+            parameters.set_param(log + 'LogRate', 1)
+        for name, value in (params or {}).items():
+            parameters.set_param(name, value)
+        return(c.comets(layout, parameters))
+    return(make)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cometspy import parsers
+
+
+@pytest.fixture
+def spatial(make_sim):
+    sim = make_sim(grid = (3, 3), cycles = 8, n_models = 2)
+    sim.run()
+    return(sim)
+
+
+def run_aggregated(make_sim, stat):
+    sim = make_sim(grid = (3, 3), cycles = 8, n_models = 2)
+    sim.run(aggregate = {'media': stat, 'fluxes': stat})
+    return(sim)
+
+
+def media_by_cycle(media, stat):
+    grouped = media.groupby(['metabolite', 'cycle'])['conc_mmol']
+    table = grouped.max() if stat == 'max' else grouped.sum()
+    if stat == 'mean':
+        table = table / 9
+    return(table.reset_index())
+
+
+def fluxes_by_cycle(fluxes, stat):
+    grouped = fluxes.drop(columns = ['x', 'y']).groupby('cycle')
+    table = grouped.max() if stat == 'max' else grouped.sum()
+    if stat == 'mean':
+        table = table / 9
+    return(table.reset_index())
+
+
+@pytest.mark.parametrize('stat', ['sum', 'mean', 'max'])
+def test_aggregates_equal_those_of_the_spatial_logs(make_sim, spatial, stat):
+    sim = run_aggregated(make_sim, stat)
+    assert sim.media is None
+    assert sim.fluxes is None
+    assert sim.fluxes_by_species is None
+    expected = media_by_cycle(spatial.media, stat)
+    actual = sim.media_by_cycle.sort_values(['metabolite', 'cycle'])
+    pd.testing.assert_frame_equal(actual.reset_index(drop = True), expected,
+                                  check_dtype = False)
+    for model_id, fluxes in spatial.fluxes_by_species.items():
+        expected = fluxes_by_cycle(fluxes, stat)
+        actual = sim.fluxes_by_cycle[model_id]
+        pd.testing.assert_frame_equal(actual.reset_index(drop = True),
+                                      expected[actual.columns],
+                                      check_dtype = False, obj = model_id)
+
+
+def test_the_biomass_log_is_still_spatial(make_sim, spatial):
+    sim = run_aggregated(make_sim, 'sum')
+    assert sim.biomass.equals(spatial.biomass)
+
+
+def test_chunks_are_combined(make_sim):
+    sim = make_sim(grid = (3, 3), cycles = 8, n_models = 2)
+    sim.run(delete_files = False)
+    path = sim.working_dir + sim.parameters.all_params['MediaLogName']
+    whole = parsers.read_media_totals(path, 'mean', n_locations = 9)
+    chunked = parsers.read_media_totals(path, 'mean', n_locations = 9,
+                                        chunksize = 7)
+    pd.testing.assert_frame_equal(chunked, whole)
+    assert np.isfinite(whole['conc_mmol']).all()
@@ -0,0 +1,32 @@
+import copy
+import json
+
+from benchmarks import suite
+
+
+def test_benchmarks_run_on_a_tiny_scale(monkeypatch, tmp_path):
+    monkeypatch.setitem(suite.SCALES, 'tiny',
+                        {'reactions': [20], 'species': [1], 'grids': [(2, 2)],
+                         'log_bytes': [10 ** 4], 'log_grid': (3, 3),
+                         'run_cycles': 3})
+    output = str(tmp_path / 'bench.json')
+    report = suite.run_benchmarks('tiny', repeat = 1, output = output)
+    names = {result['name'] for result in report['results']}
+    assert 'comets.run' in names
+    runs = [r for r in report['results'] if r['name'] == 'comets.run']
+    assert runs[0]['phases']['simulation'] > 0
+    with open(output) as f:
+        assert json.load(f)['results'] == report['results']
+
+
+def test_compare_flags_slower_benchmarks():
+    baseline = {'results': [
+        {'name': 'a', 'case': {'n': 1}, 'seconds': {'min': 1.}},
+        {'name': 'b', 'case': {'n': 1}, 'seconds': {'min': 1.}},
+        {'name': 'c', 'case': {'n': 1}, 'seconds': {'min': 0.001}}]}
+    current = copy.deepcopy(baseline)
+    current['results'][0]['seconds']['min'] = 2.
+    current['results'][2]['seconds']['min'] = 0.005
+    table = suite.compare(baseline, current)
+    assert list(table['name']) == ['c', 'a', 'b']
+    assert list(table['regression']) == [False, True, False]
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cometspy.parsers import log_filter
+
+GRID = (5, 5)
+KEYS = ['metabolite', 'cycle', 'x', 'y']
+
+
+@pytest.fixture
+def unfiltered(make_sim):
+    sim = make_sim(grid = GRID, cycles = 6)
+    sim.run()
+    return(sim)
+
+
+def run_filtered(make_sim, where, **kwargs):
+    sim = make_sim(grid = GRID, cycles = 6)
+    sim.run(where = where, **kwargs)
+    return(sim)
+
+
+def sorted_media(media):
+    return(media.sort_values(KEYS).reset_index(drop = True))
+
+
+def manual_blocks(media, block, x = (1, GRID[0]), y = (1, GRID[1]),
+                  mean = False):
+    media = media[media['x'].between(*x) & media['y'].between(*y)].copy()
+    media['x'] = (media['x'] - 1) // block + 1
+    media['y'] = (media['y'] - 1) // block + 1
+    blocks = media.groupby(KEYS, as_index = False)['conc_mmol'].sum()
+    if mean:
+        # the selected locations of each block
+        areas = []
+        for numbers, (low, high) in ((blocks['x'], x), (blocks['y'], y)):
+            first = np.maximum((numbers - 1) * block + 1, low)
+            last = np.minimum(numbers * block, high)
+            areas.append(last - first + 1)
+        blocks['conc_mmol'] = blocks['conc_mmol'] / (areas[0] * areas[1])
+    return(sorted_media(blocks))
+
+
+def test_block_sums(make_sim, unfiltered):
+    sim = run_filtered(make_sim, log_filter(block = 2))
+    pd.testing.assert_frame_equal(sorted_media(sim.media),
+                                  manual_blocks(unfiltered.media, 2),
+                                  check_dtype = False)
+    biomass = unfiltered.biomass.copy()
+    biomass['x'] = (biomass['x'] - 1) // 2 + 1
+    biomass['y'] = (biomass['y'] - 1) // 2 + 1
+    expected = biomass.groupby(['cycle', 'x', 'y', 'species'],
+                               as_index = False)['biomass'].sum()
+    keys = ['cycle', 'x', 'y', 'species']
+    pd.testing.assert_frame_equal(
+        sim.biomass.sort_values(keys).reset_index(drop = True),
+        expected.sort_values(keys).reset_index(drop = True),
+        check_dtype = False)
+
+
+def test_edge_block_means_use_their_area(make_sim, unfiltered):
+    sim = run_filtered(make_sim, log_filter(block = 2, block_agg = 'mean'))
+    pd.testing.assert_frame_equal(sorted_media(sim.media),
+                                  manual_blocks(unfiltered.media, 2,
+                                                mean = True),
+                                  check_dtype = False)
+    # the media is uniform at the start, so every block has the same mean
+    start = sim.media[(sim.media['cycle'] == 0) &
+                      (sim.media['metabolite'] == 'o2_e')]
+    assert np.allclose(start['conc_mmol'], 10.)
+
+
+def test_block_means_within_a_window(make_sim, unfiltered):
+    x, y = (2, 5), (1, 3)
+    sim = run_filtered(make_sim, log_filter(x = x, y = y, block = 2,
+                                            block_agg = 'mean'))
+    pd.testing.assert_frame_equal(sorted_media(sim.media),
+                                  manual_blocks(unfiltered.media, 2, x, y,
+                                                mean = True),
+                                  check_dtype = False)
+
+
+def test_aggregate_means_within_a_window(make_sim, unfiltered):
+    x, y = (2, 4), (2, 5)
+    sim = run_filtered(make_sim, log_filter(x = x, y = y, block = 2),
+                       aggregate = {'media': 'mean'})
+    media = unfiltered.media
+    media = media[media['x'].between(*x) & media['y'].between(*y)]
+    expected = media.groupby(['metabolite', 'cycle'],
+                             as_index = False)['conc_mmol'].sum()
+    expected['conc_mmol'] /= 3 * 4
+    actual = sim.media_by_cycle.sort_values(['metabolite', 'cycle'])
+    pd.testing.assert_frame_equal(actual.reset_index(drop = True), expected,
+                                  check_dtype = False)
@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cometspy.cache import result_cache
+from cometspy.parsers import log_filter
+
+RESULTS = ['total_biomass', 'biomass', 'media', 'fluxes']
+
+
+def test_a_cache_hit_gives_the_results_of_a_miss(make_sim, fake_backend):
+    cache = result_cache('cache')
+    missed = make_sim(grid = (2, 2), cycles = 10)
+    missed.run(cache = cache)
+    hit = make_sim(grid = (2, 2), cycles = 10)
+    hit.run(cache = cache)
+    assert (cache.misses, cache.hits) == (1, 1)
+    for name in RESULTS:
+        pd.testing.assert_frame_equal(getattr(hit, name), getattr(missed, name),
+                                      obj = name)
+    for model_id, fluxes in missed.fluxes_by_species.items():
+        pd.testing.assert_frame_equal(hit.fluxes_by_species[model_id], fluxes)
+    assert os.listdir(str(fake_backend)) == ['cache']
+
+
+@pytest.mark.parametrize('options', [
+    {'where': log_filter(cycles = (0, 5))},
+    {'raw_fluxes': False},
+    {'aggregate': {'media': 'sum'}}])
+def test_read_options_are_part_of_the_key(make_sim, options):
+    cache = result_cache('cache')
+    make_sim(cycles = 10).run(cache = cache)
+    sim = make_sim(cycles = 10)
+    sim.run(cache = cache, **options)
+    again = make_sim(cycles = 10)
+    again.run(cache = cache, **options)
+    assert (cache.misses, cache.hits) == (2, 1)
+    pd.testing.assert_frame_equal(again.total_biomass, sim.total_biomass)
+
+
+def test_changed_inputs_miss(make_sim):
+    cache = result_cache('cache')
+    make_sim(cycles = 10).run(cache = cache)
+    sim = make_sim(cycles = 10)
+    sim.layout.set_specific_metabolite('glc__D_e', 0.02)
+    sim.run(cache = cache)
+    make_sim(cycles = 11).run(cache = cache)
+    assert (cache.misses, cache.hits) == (3, 0)
+
+
+def test_the_least_recently_used_entries_are_evicted(make_sim):
+    cache = result_cache('cache')
+    make_sim(cycles = 10).run(cache = cache)
+    size = sum(os.path.getsize(os.path.join('cache', name))
+               for name in os.listdir('cache'))
+    cache.max_size = int(1.5 * size)  # room for one entry only
+    make_sim(cycles = 11).run(cache = cache)
+    assert len(os.listdir('cache')) == 1
+    make_sim(cycles = 11).run(cache = cache)
+    assert cache.hits == 1
+    cache.clear()
+    assert os.listdir('cache') == []
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cometspy.checkpoint import layout_from_results, run_in_segments
+
+
+def make_restartable(make_sim, cycles = 20):
+    """ a sim every metabolite of which is in the media from the start. The
+    fake backend secretes only metabolites absent at the start, so
+    otherwise a restart would change its dynamics. """
+    sim = make_sim(grid = (3, 3), cycles = cycles)
+    for met in sim.layout.media['metabolite']:
+        if met not in ('glc__D_e', 'o2_e'):
+            sim.layout.set_specific_metabolite(met, 1e-3)
+    return(sim)
+
+
+def assert_same_results(sim, expected):
+    # logs hold 7 significant digits, from which each segment restarts
+    pd.testing.assert_frame_equal(sim.total_biomass, expected.total_biomass,
+                                  check_exact = False, rtol = 1e-5)
+    for log in ('biomass', 'media'):
+        pd.testing.assert_frame_equal(getattr(sim, log), getattr(expected, log),
+                                      check_exact = False, rtol = 1e-5,
+                                      atol = 1e-12, obj = log)
+
+
+@pytest.fixture
+def full_run(make_sim):
+    sim = make_restartable(make_sim)
+    sim.run()
+    return(sim)
+
+
+def test_a_segmented_run_equals_a_full_run(make_sim, full_run, fake_backend):
+    base = make_restartable(make_sim)
+    sim = run_in_segments(base.layout, base.parameters, 5, 4)
+    assert_same_results(sim, full_run)
+    assert base.parameters.all_params['maxCycles'] == 20
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_a_killed_run_resumes_from_its_checkpoint(make_sim, full_run):
+    base = make_restartable(make_sim)
+
+    def crash(segment, sim, next_layout, next_params):
+        if segment == 1:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        run_in_segments(base.layout, base.parameters, 5, 4,
+                        checkpoint_dir = 'checkpoints', between_segments = crash)
+    started = []
+    sim = run_in_segments(base.layout, base.parameters, 5, 4,
+                          checkpoint_dir = 'checkpoints',
+                          between_segments = lambda segment, *args:
+                              started.append(segment))
+    assert started == [1, 2]
+    assert_same_results(sim, full_run)
+
+
+def test_resuming_with_other_segments_is_an_error(make_sim):
+    base = make_restartable(make_sim)
+    run_in_segments(base.layout, base.parameters, 5, 2,
+                    checkpoint_dir = 'checkpoints')
+    with pytest.raises(ValueError):
+        run_in_segments(base.layout, base.parameters, 4, 2,
+                        checkpoint_dir = 'checkpoints')
+
+
+def test_layout_from_results_restarts_from_the_logged_state(make_sim):
+    sim = make_restartable(make_sim, cycles = 5)
+    sim.run()
+    layout = layout_from_results(sim)
+    pop = {(x, y): amounts for x, y, *amounts in layout.initial_pop}
+    final = sim.biomass.loc[sim.biomass['cycle'] == 5]
+    for row in final.itertuples():
+        assert pop[(row.x - 1, row.y - 1)][0] == row.biomass
+    media = sim.media.loc[(sim.media['cycle'] == 5) &
+                          (sim.media['metabolite'] == 'glc__D_e')]
+    for row in media.itertuples():
+        assert layout.local_media[(row.x - 1, row.y - 1)]['glc__D_e'] == \
+            row.conc_mmol
+    assert np.allclose(sim.total_biomass['model_0'].iloc[-1],
+                       sum(amounts[0] for amounts in pop.values()), rtol = 1e-5)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from cometspy.cube import load_cube
+
+
+@pytest.fixture
+def sim(make_sim):
+    sim = make_sim(grid = (4, 3), cycles = 6, n_models = 2)
+    sim.run()
+    return(sim)
+
+
+def assert_cube_holds(cube, log, key_column, value_column):
+    """ every row of log is in the cube, and the rest of the cube is 0 """
+    cycles = [cube.cycle_index(cycle) for cycle in log['cycle']]
+    keys = [cube.key_index(key) for key in log[key_column]]
+    values = cube.data[cycles, keys, log['x'] - 1, log['y'] - 1]
+    np.testing.assert_array_equal(values, log[value_column].to_numpy())
+    assert np.count_nonzero(cube.data) == np.count_nonzero(log[value_column])
+
+
+def test_biomass_and_media_cubes(sim):
+    cube = sim.get_biomass_cube()
+    assert cube.shape == (7, 2, 4, 3)
+    assert cube.keys == ['model_0', 'model_1']
+    assert_cube_holds(cube, sim.biomass, 'species', 'biomass')
+    cube = sim.get_media_cube(['glc__D_e', 'o2_e'])
+    assert cube.keys == ['glc__D_e', 'o2_e']
+    media = sim.media.loc[sim.media['metabolite'].isin(cube.keys)]
+    assert_cube_holds(cube, media, 'metabolite', 'conc_mmol')
+
+
+def test_flux_cube(sim):
+    cube = sim.get_flux_cube('model_1', ['EX_glc__D_e', 'EX_o2_e'])
+    fluxes = sim.fluxes_by_species['model_1']
+    for reaction in cube.keys:
+        image = cube.sel(cycle = 3, key = reaction)
+        rows = fluxes.loc[fluxes['cycle'] == 3]
+        np.testing.assert_array_equal(image[rows['x'] - 1, rows['y'] - 1],
+                                      rows[reaction].to_numpy())
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_saved_cubes_load_equal(sim, compressed):
+    cube = sim.get_biomass_cube()
+    path = 'biomass.npz' if compressed else 'biomass.npy'
+    cube.save(path, compressed = compressed)
+    loaded = load_cube(path)
+    np.testing.assert_array_equal(loaded.data, cube.data)
+    np.testing.assert_array_equal(loaded.cycles, cube.cycles)
+    assert loaded.keys == cube.keys
+
+
+def test_cubes_built_in_a_memory_map(sim):
+    in_memory = sim.get_biomass_cube()
+    mapped = sim.get_biomass_cube(path = 'biomass.npy')
+    assert isinstance(mapped.data, np.memmap)
+    np.testing.assert_array_equal(mapped.data, in_memory.data)
+    np.testing.assert_array_equal(load_cube('biomass.npy').data, in_memory.data)
+
+
+def test_missing_cycles_and_keys_are_errors(sim):
+    cube = sim.get_biomass_cube()
+    with pytest.raises(ValueError):
+        cube.sel(cycle = 100)
+    with pytest.raises(NameError):
+        cube.sel(key = 'model_2')
@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+import cometspy  # noqa: F401
+
+# cometspy.comets is the comets class, which the package re-exports
+comets_module = sys.modules['cometspy.comets']
+
+LIBRARIES = ['junit/junit-4.12.jar', 'hamcrest-core-1.3.jar', 'jogl/jogl-all.jar',
+             'jogl/gluegen-rt.jar', 'jogl/gluegen.jar',
+             'jogl/gluegen-rt-natives-linux-amd64.jar',
+             'jogl/jogl-all-natives-linux-amd64.jar', 'JMatIO/jmatio.jar',
+             'colt/concurrent.jar', 'colt/colt.jar',
+             'commons-lang3-3.9/commons-lang3-3.9.jar',
+             'commons-math3-3.6.1/commons-math3-3.6.1.jar',
+             'jdistlib/jdistlib-0.4.5-bin.jar']
+
+
+@pytest.fixture
+def comets_home(monkeypatch):
+    """ an empty-files COMETS installation, with the caches cleared. Not in
+    tmp_path, whose name contains "test", which excludes libraries. """
+    home = tempfile.mkdtemp(prefix = 'comets_')
+    os.makedirs(home + '/bin')
+    open(home + '/bin/comets_2.12.4.jar', 'w').close()
+    for library in LIBRARIES:
+        os.makedirs(os.path.dirname(home + '/lib/' + library), exist_ok = True)
+        open(home + '/lib/' + library, 'w').close()
+    monkeypatch.setattr(comets_module, '_COMETS_INSTALLS', {})
+    yield(home)
+    shutil.rmtree(home)
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """ counts the searches of COMETS_HOME/lib """
+    calls = []
+    find = comets_module._find_classpath_pieces
+
+    def counting_find(*args):
+        calls.append(args)
+        return(find(*args))
+    monkeypatch.setattr(comets_module, '_find_classpath_pieces', counting_find)
+    return(calls)
+
+
+def test_discovery_finds_the_version_and_libraries(comets_home):
+    version, pieces = comets_module._discover_comets(comets_home)
+    assert version == 'comets_2.12.4'
+    assert pieces['bin'] == comets_home + '/bin/comets_2.12.4.jar'
+    assert pieces['colt'] == comets_home + '/lib/colt/colt.jar'
+    assert pieces['junit'] == comets_home + '/lib/junit/junit-4.12.jar'
+
+
+def test_discovery_searches_once_per_process(comets_home, searches):
+    first = comets_module._discover_comets(comets_home)
+    assert comets_module._discover_comets(comets_home) == first
+    assert len(searches) == 1
+
+
+def test_discovery_is_cached_on_disk(comets_home, searches, tmp_path,
+                                     monkeypatch):
+    monkeypatch.setenv('COMETSPY_CLASSPATH_CACHE', str(tmp_path / 'cache.json'))
+    first = comets_module._discover_comets(comets_home)
+    monkeypatch.setattr(comets_module, '_COMETS_INSTALLS', {})
+    assert comets_module._discover_comets(comets_home) == first
+    assert len(searches) == 1
+
+
+def test_an_upgrade_is_discovered(comets_home, searches):
+    comets_module._discover_comets(comets_home)
+    os.remove(comets_home + '/bin/comets_2.12.4.jar')
+    open(comets_home + '/bin/comets_2.13.0.jar', 'w').close()
+    os.utime(comets_home + '/bin', (0, 0))
+    version, pieces = comets_module._discover_comets(comets_home)
+    assert version == 'comets_2.13.0'
+    assert len(searches) == 2
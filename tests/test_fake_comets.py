@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+
+def test_fake_backend_writes_every_log(make_sim):
+    sim = make_sim(grid = (3, 3), cycles = 10)
+    sim.run()
+    assert sim.VERSION == 'fake'
+    assert 'End of simulation' in sim.run_output
+    assert list(sim.total_biomass['cycle']) == list(range(11))
+    assert set(sim.biomass['species']) == {'model_0'}
+    assert set(sim.media['metabolite']) >= {'glc__D_e', 'o2_e'}
+    assert set(sim.fluxes_by_species) == {'model_0'}
+    assert np.all(sim.total_biomass['model_0'] > 0)
+
+
+def test_fake_backend_grows_on_glucose(make_sim):
+    sim = make_sim(cycles = 10)
+    sim.run()
+    assert sim.total_biomass['model_0'].iloc[-1] > \
+        sim.total_biomass['model_0'].iloc[0]
+    glucose = sim.media[sim.media['metabolite'] == 'glc__D_e']
+    assert glucose['conc_mmol'].iloc[-1] < glucose['conc_mmol'].iloc[0]
+
+
+def test_run_deletes_its_files(make_sim, fake_backend):
+    sim = make_sim(cycles = 5)
+    sim.run(delete_files = True)
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_fake_backend_is_deterministic_for_a_seed(make_sim):
+    runs = []
+    for seed in (1, 1, 2):
+        sim = make_sim(cycles = 5, params = {'randomSeed': seed})
+        sim.run()
+        runs.append(sim.total_biomass)
+    assert runs[0].equals(runs[1])
+    assert not runs[0].equals(runs[2])
+
+
+def test_fill_seeds_more_locations(make_sim):
+    sparse = make_sim(grid = (5, 5), cycles = 1)
+    sparse.run()
+    dense = make_sim(grid = (5, 5), cycles = 1)
+    dense.set_backend('fake', fill = 0.5)
+    dense.run()
+
+    def occupied(sim):
+        start = sim.biomass[sim.biomass['cycle'] == 0]
+        return(len(start[start['biomass'] > 0]))
+    assert occupied(sparse) == 1
+    assert occupied(dense) > 1
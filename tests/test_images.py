@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def sim(make_sim):
+    sim = make_sim(grid = (4, 3), cycles = 6, n_models = 2)
+    sim.run()
+    return(sim)
+
+
+def image_by_loop(sim, log, key_column, key, cycle, value_column):
+    """ the image built one row at a time """
+    im = np.zeros(sim.layout.grid)
+    rows = log.loc[(log['cycle'] == cycle) & (log[key_column] == key)]
+    for _, row in rows.iterrows():
+        im[int(row['x']) - 1, int(row['y']) - 1] = row[value_column]
+    return(im)
+
+
+def test_images_equal_images_built_row_by_row(sim):
+    for cycle in (0, 3, 6):
+        np.testing.assert_array_equal(
+            sim.get_metabolite_image('glc__D_e', cycle),
+            image_by_loop(sim, sim.media, 'metabolite', 'glc__D_e', cycle,
+                          'conc_mmol'))
+        np.testing.assert_array_equal(
+            sim.get_biomass_image('model_1', cycle),
+            image_by_loop(sim, sim.biomass, 'species', 'model_1', cycle,
+                          'biomass'))
+        fluxes = sim.fluxes_by_species['model_0'].assign(model = 'model_0')
+        np.testing.assert_array_equal(
+            sim.get_flux_image('model_0', 'EX_glc__D_e', cycle),
+            image_by_loop(sim, fluxes, 'model', 'model_0', cycle, 'EX_glc__D_e'))
+
+
+def test_batch_images_stack_the_images_of_each_cycle(sim):
+    cycles = sorted(set(sim.media['cycle']))
+    np.testing.assert_array_equal(
+        sim.get_metabolite_images('o2_e'),
+        np.stack([sim.get_metabolite_image('o2_e', c) for c in cycles]))
+    np.testing.assert_array_equal(
+        sim.get_biomass_images('model_0'),
+        np.stack([sim.get_biomass_image('model_0', c) for c in cycles]))
+    np.testing.assert_array_equal(
+        sim.get_flux_images('model_1', 'EX_o2_e'),
+        np.stack([sim.get_flux_image('model_1', 'EX_o2_e', c) for c in cycles]))
+
+
+def test_images_follow_a_replaced_log(sim):
+    before = sim.get_metabolite_image('glc__D_e', 6)
+    assert before.any()
+    sim.media = sim.media.loc[sim.media['cycle'] < 6].reset_index(drop = True)
+    with pytest.raises(ValueError):
+        sim.get_metabolite_image('glc__D_e', 6)
+
+
+def test_unknown_keys_and_cycles_are_errors(sim):
+    with pytest.raises(NameError):
+        sim.get_biomass_image('model_2', 0)
+    with pytest.raises(NameError):
+        sim.get_flux_image('model_0', 'not_a_reaction', 0)
+    with pytest.raises(ValueError):
+        sim.get_metabolite_image('glc__D_e', 7)
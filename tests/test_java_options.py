@@ -0,0 +1,74 @@
+import os
+import platform
+
+import pytest
+
+pytestmark = pytest.mark.skipif(platform.system() == 'Windows',
+                                reason = 'java options are ignored on Windows')
+
+
+@pytest.fixture
+def sim(make_sim):
+    sim = make_sim()
+    # only the options are built; java is never started
+    sim.backend = 'java'
+    return(sim)
+
+
+def test_java_options(sim):
+    sim.set_java_options(heap = '2g', gc = 'serial', tiered_stop_at_level = 1,
+                         options = ['-XX:+UseStringDeduplication'])
+    options, lock = sim._java_options(['-Xss1m'])
+    assert options == ['-Xmx2g', '-XX:+UseSerialGC', '-XX:TieredStopAtLevel=1',
+                       '-XX:+UseStringDeduplication', '-Xss1m']
+    assert lock is None
+    with pytest.raises(ValueError):
+        sim.set_java_options(gc = 'fast')
+
+
+def test_the_first_run_creates_the_cds_archive(sim, make_sim):
+    sim.set_java_options(cds_archive = 'comets.jsa')
+    options, lock = sim._java_options()
+    assert '-XX:ArchiveClassesAtExit=comets.jsa' in options
+    assert os.path.isfile(lock)
+    # meanwhile, other runs go without the archive
+    other = make_sim()
+    other.backend = 'java'
+    other.set_java_options(cds_archive = 'comets.jsa')
+    options, other_lock = other._java_options()
+    assert other_lock is None
+    assert not any('Archive' in option for option in options)
+    sim._release_cds_lock(lock)
+    assert not os.path.isfile(lock)
+
+
+def test_later_runs_share_the_cds_archive(sim):
+    open('comets.jsa', 'w').close()
+    sim.set_java_options(cds_archive = 'comets.jsa')
+    options, lock = sim._java_options()
+    assert '-XX:SharedArchiveFile=comets.jsa' in options
+    assert options[0] == '-XX:+IgnoreUnrecognizedVMOptions'
+    assert lock is None
+
+
+def test_a_stale_lock_is_taken_over(sim):
+    open('comets.jsa.lock', 'w').close()
+    os.utime('comets.jsa.lock', (0, 0))
+    sim.set_java_options(cds_archive = 'comets.jsa')
+    options, lock = sim._java_options()
+    assert lock == 'comets.jsa.lock'
+    assert '-XX:ArchiveClassesAtExit=comets.jsa' in options
+
+
+def test_java_options_go_before_the_classpath(sim):
+    cmd = sim._build_command_args('script', ['-Xmx1g'])
+    assert cmd[:3] == ['java', '-Xmx1g', '-classpath']
+    assert cmd[-2:] == ['-script', 'script']
+
+
+def test_the_fake_backend_ignores_java_options(make_sim):
+    sim = make_sim(cycles = 3)
+    sim.set_java_options(heap = '1g', cds_archive = 'comets.jsa')
+    sim.run(max_heap = '1g')
+    assert not os.path.exists('comets.jsa.lock')
+    assert sim.total_biomass['cycle'].max() == 3
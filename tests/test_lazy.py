@@ -0,0 +1,59 @@
+import gc
+import os
+import pickle
+
+import pandas as pd
+
+
+def _files(directory):
+    return(sorted(os.listdir(str(directory))))
+
+
+def test_lazy_results_equal_eager_ones(make_sim):
+    eager = make_sim(grid = (2, 2), cycles = 5)
+    eager.run()
+    lazy = make_sim(grid = (2, 2), cycles = 5)
+    lazy.run(lazy = True)
+    assert lazy.total_biomass.equals(eager.total_biomass)
+    assert lazy.biomass.equals(eager.biomass)
+    assert lazy.media.equals(eager.media)
+    for species, table in eager.fluxes_by_species.items():
+        pd.testing.assert_frame_equal(lazy.fluxes_by_species[species], table)
+
+
+def test_lazy_logs_are_deleted_once_read(make_sim, fake_backend):
+    sim = make_sim(cycles = 5)
+    sim.run(lazy = True, delete_files = True)
+    unread = _files(fake_backend)
+    assert len(unread) == 3  # biomass, media and flux logs
+    assert len(sim.media) > 0
+    assert len(_files(fake_backend)) == 2
+    sim.read_logs()
+    assert _files(fake_backend) == []
+
+
+def test_unread_logs_are_deleted_with_the_object(make_sim, fake_backend):
+    sim = make_sim(cycles = 5)
+    sim.run(lazy = True, delete_files = True)
+    assert _files(fake_backend) != []
+    del sim
+    gc.collect()
+    assert _files(fake_backend) == []
+
+
+def test_results_set_before_reading_are_kept(make_sim):
+    sim = make_sim(cycles = 5)
+    sim.run(lazy = True)
+    sim.biomass = 'replaced'
+    sim.read_logs()
+    assert sim.biomass == 'replaced'
+    assert len(sim.media) > 0
+
+
+def test_pickles_of_lazy_runs_hold_every_log(make_sim, fake_backend):
+    sim = make_sim(cycles = 5)
+    sim.run(lazy = True, delete_files = True)
+    copied = pickle.loads(pickle.dumps(sim))
+    assert _files(fake_backend) == []
+    assert copied.media.equals(sim.media)
+    assert copied.biomass.equals(sim.biomass)
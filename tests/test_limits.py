@@ -0,0 +1,50 @@
+import os
+import pickle
+import time
+
+import pytest
+
+from cometspy.comets import RunLimitExceeded, run_many
+
+
+def slow_sim(make_sim):
+    sim = make_sim(grid = (5, 5), cycles = 1000)
+    sim.set_backend('fake', cycle_delay = 0.02)
+    return(sim)
+
+
+def test_timeout_kills_comets_and_cleans_up(make_sim, fake_backend):
+    sim = slow_sim(make_sim)
+    started = time.monotonic()
+    with pytest.raises(RunLimitExceeded) as raised:
+        sim.run(timeout = 1.)
+    assert time.monotonic() - started < 10.
+    assert raised.value.limit == 'timeout'
+    assert raised.value.observed >= 1.
+    assert 'Cycle' in raised.value.run_output
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_max_log_size(make_sim, fake_backend):
+    sim = slow_sim(make_sim)
+    with pytest.raises(RunLimitExceeded) as raised:
+        sim.run(max_log_size = 100000)
+    assert raised.value.limit == 'max_log_size'
+    assert raised.value.observed > 100000
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_runs_within_their_limits_are_not_stopped(make_sim):
+    sim = make_sim(cycles = 5)
+    sim.run(timeout = 600., max_log_size = 2**30)
+    assert sim.total_biomass['cycle'].max() == 5
+
+
+def test_limits_reach_run_many_callers(make_sim):
+    error = RunLimitExceeded('timeout', 1., 1.2, 'Cycle 1')
+    copied = pickle.loads(pickle.dumps(error))
+    assert (copied.limit, copied.value, copied.observed, copied.run_output) == \
+        ('timeout', 1., 1.2, 'Cycle 1')
+    with pytest.raises(RunLimitExceeded):
+        run_many([slow_sim(make_sim)], max_workers = 1, progress = False,
+                 run_kwargs = {'timeout': 1.})
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from cometspy.parsers import log_filter
+
+
+@pytest.fixture
+def unfiltered(make_sim):
+    sim = make_sim(grid = (4, 3), cycles = 12, n_models = 2)
+    sim.run()
+    return(sim)
+
+
+def run_filtered(make_sim, where, **kwargs):
+    sim = make_sim(grid = (4, 3), cycles = 12, n_models = 2)
+    sim.run(where = where, **kwargs)
+    return(sim)
+
+
+def in_ranges(log, cycles = None, x = None, y = None):
+    keep = pd.Series(True, index = log.index)
+    for column, bounds in (('cycle', cycles), ('x', x), ('y', y)):
+        if bounds is not None:
+            keep &= log[column].between(*bounds)
+    return(log.loc[keep].reset_index(drop = True))
+
+
+def test_cycles_and_locations(make_sim, unfiltered):
+    ranges = {'cycles': (3, 9), 'x': (2, 3), 'y': (1, 2)}
+    sim = run_filtered(make_sim, log_filter(**ranges))
+    pd.testing.assert_frame_equal(
+        sim.total_biomass, in_ranges(unfiltered.total_biomass, ranges['cycles']))
+    for log in ('biomass', 'media'):
+        pd.testing.assert_frame_equal(getattr(sim, log),
+                                      in_ranges(getattr(unfiltered, log), **ranges),
+                                      obj = log)
+    for model_id, fluxes in unfiltered.fluxes_by_species.items():
+        pd.testing.assert_frame_equal(
+            sim.fluxes_by_species[model_id].reset_index(drop = True),
+            in_ranges(fluxes, **ranges), obj = model_id)
+
+
+def test_metabolites_species_and_reactions(make_sim, unfiltered):
+    where = log_filter(metabolites = ['glc__D_e', 'ac_e'], species = ['model_1'],
+                       reactions = ['EX_glc__D_e', 'Biomass_Ecoli_core'])
+    sim = run_filtered(make_sim, where)
+    media = unfiltered.media
+    pd.testing.assert_frame_equal(
+        sim.media, media.loc[media['metabolite'].isin(where.metabolites)]
+        .reset_index(drop = True))
+    biomass = unfiltered.biomass
+    pd.testing.assert_frame_equal(
+        sim.biomass, biomass.loc[biomass['species'] == 'model_1']
+        .reset_index(drop = True))
+    pd.testing.assert_frame_equal(
+        sim.total_biomass, unfiltered.total_biomass[['cycle', 'model_1']])
+    assert list(sim.fluxes_by_species) == ['model_1']
+    columns = ['cycle', 'x', 'y'] + where.reactions
+    pd.testing.assert_frame_equal(
+        sim.fluxes_by_species['model_1'][columns].reset_index(drop = True),
+        unfiltered.fluxes_by_species['model_1'][columns].reset_index(drop = True))
+
+
+def test_cycle_step(make_sim, unfiltered):
+    sim = run_filtered(make_sim, log_filter(cycles = (2, 12), cycle_step = 4))
+    assert sorted(set(sim.media['cycle'])) == [2, 6, 10]
+    media = unfiltered.media
+    pd.testing.assert_frame_equal(
+        sim.media, media.loc[media['cycle'].isin([2, 6, 10])]
+        .reset_index(drop = True))
+
+
+def test_the_padded_flux_table_is_filtered_too(make_sim, unfiltered):
+    sim = run_filtered(make_sim, log_filter(cycles = (0, 5), species = ['model_0']))
+    fluxes = unfiltered.fluxes
+    expected = fluxes.loc[(fluxes[0] <= 5) & (fluxes[3] == 1)]
+    pd.testing.assert_frame_equal(sim.fluxes.reset_index(drop = True),
+                                  expected.reset_index(drop = True))
@@ -0,0 +1,47 @@
+import os
+import socket
+
+import pytest
+
+from cometspy.model_store import model_store, owner_name
+
+
+def test_model_store_directories_with_spaces_are_rejected():
+    with pytest.raises(ValueError, match = 'whitespace'):
+        model_store('model store')
+    assert not os.path.exists('model store')
+
+
+def test_stored_models_give_the_same_results(make_sim, fake_backend):
+    plain = make_sim(cycles = 5)
+    plain.run()
+    store = model_store('store')
+    sim = make_sim(cycles = 5)
+    sim.run(model_store = store)
+    assert sim.total_biomass.equals(plain.total_biomass)
+    assert store.writes == 1
+    # the file is deleted once the run is done
+    assert os.listdir(store.directory) == []
+    assert os.listdir(str(fake_backend)) == ['store']
+
+
+def test_kept_models_are_reused(make_sim):
+    store = model_store('store', keep = True)
+    make_sim(cycles = 2).run(model_store = store)
+    make_sim(cycles = 2).run(model_store = store)
+    assert (store.writes, store.reuses) == (1, 1)
+    [folder] = os.listdir(store.directory)
+    assert os.listdir(os.path.join(store.directory, folder)) == ['model_0.cmd']
+    store.clear()
+    assert os.listdir(store.directory) == []
+
+
+def test_prune_releases_files_of_ended_processes(textbook_model):
+    store = model_store('store')
+    path = store.acquire(textbook_model, owner_name(store))
+    dead = socket.gethostname() + '-999999999-0x0'
+    store.acquire(textbook_model, dead)
+    store.release(path, owner_name(store))
+    assert os.path.isfile(path)
+    store.prune()
+    assert not os.path.exists(path)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cometspy import parsers
+
+TOTAL_BIOMASS = """0 1.0E-4 2.0E-4
+1 1.5E-4 2.5E-4
+2 2.0E-4 3.0E-4
+"""
+
+BIOMASS = """0 1 1 model_a.cmd 1.0E-4
+0 2 1 model_b.cmd 2.0E-4
+1 1 1 model_a.cmd 1.5E-4
+1 2 1 model_b.cmd 2.5E-4
+"""
+
+MEDIA = """glc__D_e 0 1 1 1.0E-2
+glc__D_e 0 2 1 2.0E-2
+o2_e 0 1 1 10
+glc__D_e 1 1 1 0.5E-2
+o2_e 1 1 1 9.5
+"""
+
+# model 1 has three reactions, model 2 has two
+FLUXES = """1 1 1 1 -1.0 2.0 3.0
+1 2 1 2 -4.0 5.0
+2 1 1 1 -1.5 2.5 3.5
+2 2 1 2 -4.5 5.5
+"""
+
+
+def write(name, text):
+    with open(name, 'w') as f:
+        f.write(text)
+    return(name)
+
+
+def test_detect_decimal():
+    assert parsers.detect_decimal(write('points', TOTAL_BIOMASS)) == '.'
+    assert parsers.detect_decimal(write('commas',
+                                        TOTAL_BIOMASS.replace('.', ','))) == ','
+
+
+def test_read_total_biomass():
+    log = parsers.read_total_biomass(write('log', TOTAL_BIOMASS), ['a', 'b'])
+    assert list(log.columns) == ['cycle', 'a', 'b']
+    assert log['cycle'].dtype == np.int64
+    assert list(log['b']) == [2.0e-4, 2.5e-4, 3.0e-4]
+
+
+def test_read_total_biomass_with_decimal_commas():
+    log = parsers.read_total_biomass(write('log', TOTAL_BIOMASS.replace('.', ',')),
+                                     ['a', 'b'])
+    assert list(log['a']) == [1.0e-4, 1.5e-4, 2.0e-4]
+
+
+def test_read_biomass_strips_the_model_file_extension():
+    log = parsers.read_biomass(write('log', BIOMASS))
+    assert list(log.columns) == parsers.BIOMASS_COLUMNS
+    assert list(log['species']) == ['model_a', 'model_b'] * 2
+    assert log['biomass'].sum() == pytest.approx(7.0e-4)
+
+
+def test_read_media():
+    log = parsers.read_media(write('log', MEDIA))
+    assert list(log.columns) == parsers.MEDIA_COLUMNS
+    assert len(log) == 5
+    assert log.loc[log['metabolite'] == 'o2_e', 'conc_mmol'].tolist() == [10., 9.5]
+
+
+def test_read_fluxes_pads_smaller_models():
+    log = parsers.read_fluxes(write('log', FLUXES), 7)
+    assert log.shape == (4, 7)
+    assert log.iloc[1, 6] != log.iloc[1, 6]  # NaN
+    assert log.iloc[2].tolist() == [2, 1, 1, 1, -1.5, 2.5, 3.5]
+
+
+def test_readers_equal_a_plain_read_of_the_logs_of_a_run(make_sim):
+    sim = make_sim(grid = (2, 2), cycles = 5, n_models = 2)
+    sim.run(delete_files = False)
+    params = sim.parameters.all_params
+    media = pd.read_csv(sim.working_dir + params['MediaLogName'], sep = r'\s+',
+                        header = None, names = parsers.MEDIA_COLUMNS)
+    pd.testing.assert_frame_equal(
+        parsers.read_media(sim.working_dir + params['MediaLogName']), media)
+    biomass = pd.read_csv(sim.working_dir + params['BiomassLogName'],
+                          sep = r'\s+', header = None,
+                          names = parsers.BIOMASS_COLUMNS)
+    biomass['species'] = biomass['species'].str.replace('.cmd', '',
+                                                        regex = False)
+    pd.testing.assert_frame_equal(
+        parsers.read_biomass(sim.working_dir + params['BiomassLogName']),
+        biomass)
+
+
+def test_read_fluxes_by_species_sizes_tables_to_each_model():
+    models = [('a', ['r1', 'r2', 'r3']), ('b', ['s1', 's2'])]
+    fluxes = parsers.read_fluxes_by_species(write('log', FLUXES), models,
+                                            chunksize = 1)
+    assert list(fluxes['a'].columns) == ['cycle', 'x', 'y', 'r1', 'r2', 'r3']
+    assert list(fluxes['b'].columns) == ['cycle', 'x', 'y', 's1', 's2']
+    assert fluxes['a']['r3'].tolist() == [3.0, 3.5]
+    assert fluxes['b']['s1'].tolist() == [-4.0, -4.5]
+
+
+def test_raw_fluxes_false_gives_the_same_tables(make_sim):
+    raw = make_sim(grid = (2, 2), cycles = 5, n_models = 2)
+    raw.run()
+    sim = make_sim(grid = (2, 2), cycles = 5, n_models = 2)
+    sim.run(raw_fluxes = False)
+    assert sim.fluxes is None
+    for model_id, fluxes in raw.fluxes_by_species.items():
+        pd.testing.assert_frame_equal(sim.fluxes_by_species[model_id],
+                                      fluxes.reset_index(drop = True))
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from cometspy.replicates import run_replicates, running_stats, \
+    quantile_reservoir
+
+
+def test_running_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.random((50, 4, 3))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    stats = running_stats((4, 3))
+    for array in values:
+        stats.add(array)
+    assert np.array_equal(stats.count, (~np.isnan(values)).sum(axis = 0))
+    assert np.allclose(stats.mean, np.nanmean(values, axis = 0))
+    assert np.allclose(stats.variance, np.nanvar(values, axis = 0, ddof = 1))
+    assert np.allclose(stats.min, np.nanmin(values, axis = 0))
+    assert np.allclose(stats.max, np.nanmax(values, axis = 0))
+
+
+def test_reservoir_quantiles_are_exact_up_to_its_size():
+    values = np.random.default_rng(0).random((20, 5))
+    reservoir = quantile_reservoir((5,), size = 20, seed = 0)
+    for array in values:
+        reservoir.add(array)
+    assert reservoir.exact
+    assert np.allclose(reservoir.quantiles([0.1, 0.5]),
+                       np.quantile(values, [0.1, 0.5], axis = 0))
+    reservoir.add(values[0])
+    assert not reservoir.exact
+
+
+def test_replicates_summarize_the_runs_of_each_seed(make_sim):
+    seeds = [1, 2, 3]
+    sim = make_sim(grid = (2, 2), cycles = 5)
+    reps = run_replicates(sim.layout, sim.parameters, seeds = seeds,
+                          spatial = ['biomass'], max_workers = 2,
+                          progress = False)
+    assert reps.n == 3
+
+    singles = []
+    for seed in seeds:
+        single = make_sim(grid = (2, 2), cycles = 5,
+                          params = {'randomSeed': seed})
+        single.run()
+        singles.append(single.total_biomass.set_index('cycle')['model_0'])
+    singles = pd.concat(singles, axis = 1)
+    summary = reps.total_biomass.set_index('cycle')
+    assert (summary['n'] == 3).all()
+    assert np.allclose(summary['mean'], singles.mean(axis = 1))
+    assert np.allclose(summary['std'], singles.std(axis = 1))
+    assert np.allclose(summary['min'], singles.min(axis = 1))
+    assert np.allclose(summary['q0.5'], singles.median(axis = 1))
+
+    mean = reps.cube('biomass', 'mean')
+    assert np.allclose(np.nansum(mean.data, axis = (1, 2, 3)),
+                       singles.mean(axis = 1).loc[list(mean.cycles)])
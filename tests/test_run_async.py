@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+
+
+def test_run_async_gives_the_results_of_run(make_sim):
+    expected = make_sim(cycles = 10)
+    expected.run()
+    sim = asyncio.run(make_sim(cycles = 10).run_async())
+    pd.testing.assert_frame_equal(sim.total_biomass, expected.total_biomass)
+    pd.testing.assert_frame_equal(sim.media, expected.media)
+    assert sim.timings['total'] > 0
+
+
+def test_run_async_resets_the_state_of_a_previous_run(make_sim):
+    sim = make_sim(cycles = 10)
+    sim.run(lazy = True, aggregate = {'media': 'sum'})
+    asyncio.run(sim.run_async())
+    assert sim.aggregated == {}
+    assert sim.media is not None
+    assert sim.stopped_at is None
+    assert 'cache' not in sim.timings
+
+
+def spawned_processes(monkeypatch):
+    """ records the processes started by run_async() """
+    processes = []
+    create = asyncio.create_subprocess_exec
+
+    async def recording_create(*args, **kwargs):
+        processes.append(await create(*args, **kwargs))
+        return(processes[-1])
+    monkeypatch.setattr(asyncio, 'create_subprocess_exec', recording_create)
+    return(processes)
+
+
+def test_cancelling_run_async_kills_comets(make_sim, monkeypatch):
+    processes = spawned_processes(monkeypatch)
+    sim = make_sim(cycles = 1000)
+    sim.set_backend('fake', cycle_delay = 0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(sim.run_async(), 1.))
+    assert processes[0].returncode is not None
+    assert processes[0].returncode != 0
+
+
+def test_a_failure_while_comets_runs_kills_it(make_sim, monkeypatch):
+    processes = spawned_processes(monkeypatch)
+    readline = asyncio.StreamReader.readline
+
+    async def failing_readline(self):
+        await readline(self)
+        raise RuntimeError('lost the output')
+    monkeypatch.setattr(asyncio.StreamReader, 'readline', failing_readline)
+    sim = make_sim(cycles = 1000)
+    sim.set_backend('fake', cycle_delay = 0.05)
+    with pytest.raises(RuntimeError, match = 'lost the output'):
+        asyncio.run(sim.run_async())
+    assert processes[0].returncode is not None
+    assert processes[0].returncode != 0
+
+
+def test_run_async_runs_sims_concurrently(make_sim, fake_backend):
+    sims = []
+    for i, amount in enumerate([0.005, 0.011, 0.02]):
+        sim = make_sim(cycles = 10)
+        sim.layout.set_specific_metabolite('glc__D_e', amount)
+        os.mkdir(str(i))
+        sim.working_dir = os.path.join(str(fake_backend), str(i)) + '/'
+        sims.append(sim)
+
+    async def main():
+        return(await asyncio.gather(*[sim.run_async() for sim in sims]))
+    finished = asyncio.run(main())
+    assert finished == sims
+    final = [sim.total_biomass['model_0'].iloc[-1] for sim in sims]
+    assert final == sorted(final)
+    assert all(os.listdir(str(i)) == [] for i in range(3))
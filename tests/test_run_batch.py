@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cometspy.comets import BatchRunError, run_batch
+
+
+def make_sims(make_sim, glucose):
+    sims = []
+    for amount in glucose:
+        sim = make_sim(cycles = 10)
+        sim.layout.set_specific_metabolite('glc__D_e', amount)
+        sims.append(sim)
+    return(sims)
+
+
+def test_run_batch_equals_running_each_sim(make_sim, fake_backend):
+    glucose = [0.005, 0.011, 0.02]
+    sims = run_batch(make_sims(make_sim, glucose))
+    for sim, expected in zip(sims, make_sims(make_sim, glucose)):
+        expected.run()
+        pd.testing.assert_frame_equal(sim.total_biomass, expected.total_biomass)
+        pd.testing.assert_frame_equal(sim.media, expected.media)
+        assert sim.working_dir == expected.working_dir
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_a_failed_sim_does_not_stop_the_others(make_sim, fake_backend,
+                                               monkeypatch):
+    sims = make_sims(make_sim, [0.005, 0.011, 0.02])
+    working_dir = sims[0].working_dir
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('unreadable logs')
+    monkeypatch.setattr(sims[1], '_read_output', fail)
+    with pytest.raises(BatchRunError) as raised:
+        run_batch(sims)
+    assert [i for i, _ in raised.value.errors] == [1]
+    assert sims[0].total_biomass is not None
+    assert sims[2].total_biomass is not None
+    assert all(sim.working_dir == working_dir for sim in sims)
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_models_sharing_an_id_must_be_identical(make_sim, fake_backend):
+    sims = make_sims(make_sim, [0.011, 0.011])
+    sims[1].layout.models[0].change_bounds('EX_glc__D_e', -5., 1000.)
+    with pytest.raises(ValueError, match = 'model_0'):
+        run_batch(sims)
+    assert os.listdir(str(fake_backend)) == []
@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+
+from cometspy.comets import iter_run_many, run_many
+from cometspy.parsers import log_filter
+
+
+def make_sims(make_sim, glucose):
+    sims = []
+    for amount in glucose:
+        sim = make_sim(cycles = 10)
+        sim.layout.set_specific_metabolite('glc__D_e', amount)
+        sims.append(sim)
+    return(sims)
+
+
+def test_run_many_equals_running_each_sim(make_sim, fake_backend):
+    glucose = [0.005, 0.011, 0.02]
+    sims = run_many(make_sims(make_sim, glucose), max_workers = 2,
+                    progress = False)
+    for sim, expected in zip(sims, make_sims(make_sim, glucose)):
+        expected.run()
+        pd.testing.assert_frame_equal(sim.total_biomass, expected.total_biomass)
+        pd.testing.assert_frame_equal(sim.media, expected.media)
+        assert sim.working_dir == expected.working_dir
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_run_many_passes_run_kwargs(make_sim):
+    sims = run_many(make_sims(make_sim, [0.011]), max_workers = 1,
+                    progress = False,
+                    run_kwargs = {'where': log_filter(cycles = (0, 4))})
+    assert sims[0].total_biomass['cycle'].max() == 4
+
+
+def test_iter_run_many_yields_the_position_of_each_sim(make_sim):
+    glucose = [0.005, 0.011, 0.02, 0.03]
+    finished = dict(iter_run_many(iter(make_sims(make_sim, glucose)),
+                                  max_workers = 2))
+    assert sorted(finished) == [0, 1, 2, 3]
+    initial = [finished[i].media.loc[(finished[i].media['cycle'] == 0) &
+                                     (finished[i].media['metabolite'] == 'glc__D_e'),
+                                     'conc_mmol'].iloc[0] for i in range(4)]
+    assert initial == glucose
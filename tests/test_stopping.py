@@ -0,0 +1,95 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cometspy.cache import result_cache
+from cometspy.stopping import depletion, extinction, steady_state, \
+    stop_condition
+
+
+def test_stop_when_is_checked_after_a_cached_run(make_sim):
+    cache = result_cache('cache')
+    make_sim(cycles = 20).run(cache = cache)
+    sim = make_sim(cycles = 20)
+    sim.run(cache = cache, stop_when = [depletion('glc__D_e', threshold = 10.)])
+    assert sim.stopped_at == 0
+    assert list(sim.total_biomass['cycle']) == [0]
+    assert cache.hits == 0
+
+
+def test_depletion_of_a_metabolite_not_in_the_media_is_an_error(make_sim,
+                                                                 fake_backend):
+    sim = make_sim()
+    with pytest.raises(ValueError, match = 'glc_D_e'):
+        sim.run(stop_when = [depletion('glc_D_e')])
+    assert os.listdir(str(fake_backend)) == []
+
+
+def test_stop_conditions_must_implement_check():
+    class incomplete(stop_condition):
+        log = 'total_biomass'
+
+    with pytest.raises(TypeError):
+        incomplete()
+
+
+def test_depletion_stops_at_the_first_depleted_cycle(make_sim):
+    full = make_sim(cycles = 60)
+    full.run()
+    glucose = full.media[full.media['metabolite'] == 'glc__D_e']
+    expected = int(glucose.loc[glucose['conc_mmol'] < 0.005, 'cycle'].min())
+
+    sim = make_sim(cycles = 60)
+    sim.run(stop_when = [depletion('glc__D_e', threshold = 0.005)])
+    assert sim.stopped_at == expected
+    assert sim.stop_reason == 'glc__D_e fell below 0.005'
+    assert sim.total_biomass.equals(
+        full.total_biomass[full.total_biomass['cycle'] <= expected])
+    assert sim.media['cycle'].max() == expected
+    kept = full.media[full.media['cycle'] <= expected]
+    pd.testing.assert_frame_equal(sim.media.reset_index(drop = True),
+                                  kept.reset_index(drop = True))
+
+
+def test_steady_state_stops_once_biomass_is_flat(make_sim):
+    def limited():
+        # growth stops once oxygen runs out
+        sim = make_sim(cycles = 150)
+        sim.layout.set_specific_metabolite('o2_e', 0.005)
+        return(sim)
+
+    full = limited()
+    full.run()
+    biomass = full.total_biomass.set_index('cycle')['model_0']
+    window = 10
+    rolling = biomass.rolling(window + 1)
+    flat = rolling.max() - rolling.min() <= 1e-2 * rolling.max()
+    expected = int(biomass.index[flat.to_numpy()][0])
+    assert expected < 150
+
+    sim = limited()
+    sim.run(stop_when = [steady_state(window = window, tolerance = 1e-2)])
+    assert sim.stopped_at == expected
+    assert list(sim.total_biomass['cycle']) == list(range(expected + 1))
+
+
+def test_unmet_conditions_run_to_the_end(make_sim):
+    sim = make_sim(cycles = 10)
+    sim.run(stop_when = [depletion('glc__D_e', threshold = 1e-9),
+                         extinction()])
+    assert sim.stopped_at is None
+    assert sim.stop_reason is None
+    assert sim.total_biomass['cycle'].max() == 10
+
+
+def test_extinction_needs_a_species_to_have_been_alive():
+    rows = pd.DataFrame({'cycle': [0, 1, 2, 3],
+                         'a': [0., 1., 1., 0.],
+                         'b': [1., 1., 0., 0.]})
+    assert extinction(['a']).check(None, rows) == 3
+    assert extinction().check(None, rows) == 2
+    assert extinction(all_species = True).check(None, rows) == 3
+    condition = extinction(['a'])
+    assert condition.check(None, rows.iloc[:1]) is None
+    assert condition.check(None, rows.iloc[1:]) == 3
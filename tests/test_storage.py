@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from cometspy.storage import load_results
+
+
+def test_saved_results_equal_the_in_memory_results(make_sim):
+    sim = make_sim(grid = (3, 3), cycles = 10, n_models = 2)
+    sim.run()
+    sim.save_results('results')
+    results = load_results('results')
+    for table in ('total_biomass', 'biomass', 'media'):
+        assert getattr(results, table).equals(getattr(sim, table)), table
+    for model_id, fluxes in sim.fluxes_by_species.items():
+        pd.testing.assert_frame_equal(results.fluxes_by_species[model_id],
+                                      fluxes.reset_index(drop = True))
+
+
+def test_read_keeps_the_row_order_of_a_selection(make_sim):
+    sim = make_sim(grid = (3, 3), cycles = 10)
+    sim.run()
+    sim.save_results('results')
+    media = load_results('results').read(
+        'media', columns = ['metabolite', 'cycle', 'conc_mmol'],
+        filters = [('cycle', '>=', 5)])
+    expected = sim.media.loc[sim.media['cycle'] >= 5,
+                             ['metabolite', 'cycle', 'conc_mmol']]
+    assert media.equals(expected.reset_index(drop = True))
+
+
+def test_partition_filters_and_flux_columns(make_sim):
+    sim = make_sim(grid = (2, 2), cycles = 5, n_models = 2)
+    sim.run()
+    sim.save_results('results')
+    results = load_results('results')
+    media = results.read('media', filters = [('metabolite', '==', 'o2_e')])
+    expected = sim.media.loc[sim.media['metabolite'] == 'o2_e']
+    assert media.equals(expected.reset_index(drop = True))
+    fluxes = results.read_fluxes('model_1', columns = ['cycle', 'EX_glc__D_e'])
+    assert list(fluxes.columns) == ['cycle', 'EX_glc__D_e']
+    assert fluxes['EX_glc__D_e'].tolist() == \
+        sim.fluxes_by_species['model_1']['EX_glc__D_e'].tolist()
+
+
+def test_saving_over_results_needs_overwrite(make_sim):
+    sim = make_sim(cycles = 3)
+    sim.parameters.set_param('writeMediaLog', False)
+    sim.run()
+    sim.save_results('results')
+    with pytest.raises(FileExistsError):
+        sim.save_results('results')
+    sim.save_results('results', overwrite = True)
+    results = load_results('results')
+    assert 'media' not in results.tables
+    with pytest.raises(KeyError):
+        results.read('media')
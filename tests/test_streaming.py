@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from cometspy.parsers import log_filter
+
+
+def slow_sim(make_sim):
+    sim = make_sim(grid = (3, 3), cycles = 30)
+    sim.set_backend('fake', cycle_delay = 0.02)
+    return(sim)
+
+
+@pytest.mark.parametrize('where', [None, log_filter(cycles = (5, 25),
+                                                    x = (1, 2))])
+def test_streamed_results_equal_results_read_at_the_end(make_sim, where):
+    expected = make_sim(grid = (3, 3), cycles = 30)
+    expected.run(where = where)
+    sim = slow_sim(make_sim)
+    sim.run(stream = True, poll_interval = 0.05, where = where)
+    for log in ('total_biomass', 'biomass', 'media'):
+        pd.testing.assert_frame_equal(getattr(sim, log),
+                                      getattr(expected, log), obj = log)
+
+
+def test_callbacks_get_each_cycle_once_in_order(make_sim):
+    seen = {}
+
+    def record(sim, log, new_rows):
+        seen.setdefault(log, []).append(new_rows)
+    sim = slow_sim(make_sim)
+    sim.run(callbacks = [record], poll_interval = 0.05)
+    assert len(seen['total_biomass']) > 1
+    for log in ('total_biomass', 'biomass', 'media'):
+        rows = pd.concat(seen[log], ignore_index = True)
+        pd.testing.assert_frame_equal(rows, getattr(sim, log), obj = log)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cometspy.sweep import (design, metabolite_axis, param_axis, sweep,
+                            sweep_axis, vmax_axis)
+
+
+def test_sweep_axes_must_implement_apply():
+    class incomplete(sweep_axis):
+        pass
+
+    with pytest.raises(TypeError):
+        incomplete('label', [1., 2.])
+
+
+def test_a_grid_design_has_every_combination():
+    axes = [param_axis('maxCycles', [5, 10]),
+            metabolite_axis('glc__D_e', [0.01, 0.02, 0.03])]
+    combinations = design(axes)
+    assert list(combinations.columns) == ['maxCycles', 'glc__D_e']
+    assert len(combinations) == 6
+    assert len(combinations.drop_duplicates()) == 6
+
+
+def test_latin_hypercube_samples_every_stratum():
+    axes = [metabolite_axis('glc__D_e', low = 0., high = 1.),
+            param_axis('deathRate', low = 1e-4, high = 1e-1, log = True)]
+    combinations = design(axes, 'lhs', n = 10, seed = 1)
+    strata = np.floor(combinations['glc__D_e'] * 10)
+    assert sorted(strata) == list(range(10))
+    decades = np.log10(combinations['deathRate'])
+    assert decades.min() >= -4 and decades.max() <= -1
+    pd.testing.assert_frame_equal(design(axes, 'lhs', n = 10, seed = 1),
+                                  combinations)
+
+
+def test_sweep_runs_each_combination(make_sim):
+    base = make_sim(cycles = 5)
+    layout, params = base.layout, base.parameters
+    axes = [param_axis('maxCycles', [3, 6]),
+            metabolite_axis('glc__D_e', [0.005, 0.02]),
+            vmax_axis('model_0', 'EX_glc__D_e', [10.])]
+    results = sweep(layout, params, axes, max_workers = 2, progress = False)
+    assert params.all_params['maxCycles'] == 5
+    assert list(results.columns[:4]) == ['run', 'maxCycles', 'glc__D_e',
+                                         'model_0:EX_glc__D_e:vmax']
+    for run, rows in results.groupby('run'):
+        assert rows['cycle'].max() == rows['maxCycles'].iloc[0]
+    final = results.loc[(results['maxCycles'] == 3) & (results['cycle'] == 3)]
+    final = final.set_index('glc__D_e')['model_0']
+    assert final[0.02] > final[0.005]
+
+
+def test_sweep_output_functions(make_sim):
+    base = make_sim(cycles = 5)
+    results = sweep(base.layout, base.parameters,
+                    [metabolite_axis('glc__D_e', [0.005, 0.02])],
+                    output = lambda sim: {'final': sim.total_biomass['model_0'].iloc[-1]},
+                    max_workers = 1, progress = False)
+    assert list(results.columns) == ['run', 'glc__D_e', 'final']
+    assert results['final'].is_monotonic_increasing
@@ -0,0 +1,42 @@
+import tracemalloc
+
+import pytest
+
+
+@pytest.mark.parametrize('reset_peak', [True, False])
+def test_profile_reports_the_peak_memory(make_sim, monkeypatch, reset_peak):
+    if not reset_peak:
+        # as on python before 3.9
+        monkeypatch.delattr(tracemalloc, 'reset_peak', raising = False)
+    tracemalloc.start()
+    try:
+        sim = make_sim(cycles = 5)
+        sim.run(profile = ['cprofile', 'tracemalloc'])
+    finally:
+        tracemalloc.stop()
+    assert sim.profile['tracemalloc']['peak'] > 0
+    assert sim.profile['cprofile'].total_calls > 0
+
+
+def test_run_records_its_timings(make_sim):
+    sim = make_sim(cycles = 5)
+    sim.run()
+    assert {'write_input_files', 'startup', 'simulation', 'parse',
+            'total'} <= set(sim.timings)
+    assert set(sim.timings['parse']) >= {'total_biomass', 'media'}
+    assert sim.timings['total'] >= sim.timings['simulation'] > 0
+
+
+def test_cycle_times_hold_the_reported_time(make_sim):
+    sim = make_sim(cycles = 5, params = {'showCycleTime': True})
+    sim.run()
+    assert list(sim.cycle_times['cycle']) == list(range(1, 6))
+    assert (sim.cycle_times['wall_time'] >= 0).all()
+    assert sim.cycle_times['reported_time'].notna().all()
+
+
+def test_cycle_times_without_show_cycle_time(make_sim):
+    sim = make_sim(cycles = 5)
+    sim.run()
+    assert len(sim.cycle_times) == 5
+    assert sim.cycle_times['reported_time'].isna().all()